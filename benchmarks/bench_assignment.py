@@ -0,0 +1,125 @@
+"""
+Compara a vazão de carregamento da rede quando todos os carros de uma rajada são
+enviados ao posto de menor fila com a atribuição que considera as reservas
+
+    Uso:
+        python benchmarks/bench_assignment.py --stations 20 --burst 200
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "central server"))
+
+from batch_router import BatchRouter
+from reservations import ReservationBook
+from station import StationTable
+
+
+def simulate(policy, stations, chargers, charge_time, burst, period, ticks, limit, seed):
+    """
+    Simula a rede de postos em passos de tempo discretos
+        Parâmetros:
+            policy (str): "menor-fila" ou "reservas"
+            stations (int): quantidade de postos, um por localização
+            chargers (int): carregadores de cada posto
+            charge_time (int): passos que uma recarga leva
+            burst (int): carros que pedem posto em cada rajada
+            period (int): passos entre as rajadas
+            ticks (int): duração da simulação
+            limit (int): tamanho de fila a partir do qual o carro não é atendido
+            seed (int): semente do gerador aleatório
+        Retornos:
+            result (dict): recargas concluídas, carros recusados e maior fila observada
+    """
+    rng = random.Random(seed)
+    router = BatchRouter()
+    table = StationTable()
+    book = ReservationBook(ttl=4 * stations)
+    queues = [0] * stations
+    waiting = [0] * stations
+    charging = [[] for _ in range(stations)]
+    transit = []
+    completed = overflow = max_queue = 0
+
+    def publish(station):
+        # Como no sistema real, a fila só muda quando o carro chega ao posto
+        table.upsert(str(station), station, queues[station])
+
+    for station in range(stations):
+        publish(station)
+
+    car_id = 0
+    for tick in range(ticks):
+        while transit and transit[0][0] <= tick:
+            _, station = heapq.heappop(transit)
+            if queues[station] >= limit:
+                overflow += 1
+                continue
+            queues[station] += 1
+            waiting[station] += 1
+            book.confirm(str(station), 1)
+            max_queue = max(max_queue, queues[station])
+            publish(station)
+
+        for station in range(stations):
+            finished = [end for end in charging[station] if end <= tick]
+            if finished:
+                charging[station] = [end for end in charging[station] if end > tick]
+                completed += len(finished)
+                queues[station] -= len(finished)
+            while waiting[station] and len(charging[station]) < chargers:
+                waiting[station] -= 1
+                charging[station].append(tick + charge_time)
+            if finished:
+                publish(station)
+
+        book.expire(now=tick)
+
+        if tick % period:
+            continue
+        locations = [rng.randrange(stations) for _ in range(burst)]
+        times_left = [rng.randint(5 * stations // 4, 5 * stations) for _ in range(burst)]
+        if policy == "reservas":
+            codes = router.assign(table, book.counts(), locations, times_left, max_queue=limit)
+        else:
+            # Cada carro é atribuído sozinho, sem reservas: todos vão ao posto de menor fila
+            codes = [router.assign(table, {}, [location], [time_left], max_queue=limit)[0]
+                     for location, time_left in zip(locations, times_left)]
+
+        for location, code in zip(locations, codes):
+            car_id += 1
+            if code is None:
+                continue
+            station = int(code)
+            if policy == "reservas":
+                book.reserve(code, str(car_id), now=tick)
+            heapq.heappush(transit, (tick + abs(station - location), station))
+
+    return {"completed": completed, "overflow": overflow, "max_queue": max_queue}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=20)
+    parser.add_argument("--chargers", type=int, default=4)
+    parser.add_argument("--charge-time", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--period", type=int, default=25)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for policy in ("menor-fila", "reservas"):
+        result = simulate(policy, args.stations, args.chargers, args.charge_time, args.burst,
+                          args.period, args.ticks, args.limit, args.seed)
+        throughput = result["completed"] / args.ticks
+        print(f"{policy:>10}: {result['completed']} recargas ({throughput:.2f}/passo), "
+              f"{result['overflow']} carros recusados, maior fila {result['max_queue']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Mede quantas "requests" por segundo o sistema de informações do carro atende em uma
+única conexão TCP, enviando uma "request" por vez (keep-alive) ou várias em sequência
+sem esperar as respostas (pipelining)
+
+    Uso:
+        python benchmarks/bench_car_http.py --requests 20000 --depths 1 8 32
+"""
+import argparse
+import contextlib
+import os
+import socket
+import sys
+import threading
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client car"))
+
+from car import Car
+
+REQUEST = b"GET /nivel-bateria HTTP/1.1\r\nHost: carro\r\n\r\n"
+
+
+def startCar():
+    """
+    Inicia o sistema de informações de um carro em uma porta livre do localhost
+        Retornos:
+            address (tuple): endereço e porta do sistema de informações
+    """
+    car = Car(1)
+    car.tcp_host = "127.0.0.1"
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    car.tcp_port = probe.getsockname()[1]
+    probe.close()
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    threading.Thread(target=car.conexaoTCP, args=[server], daemon=True).start()
+    for _ in range(100):
+        try:
+            socket.create_connection((car.tcp_host, car.tcp_port)).close()
+            break
+        except OSError:
+            threading.Event().wait(0.01)
+    return car.tcp_host, car.tcp_port
+
+
+def measure(address, total, depth):
+    """
+    Envia as "requests" em lotes de "depth" e espera as respostas de cada lote
+        Parâmetros:
+            address (tuple): endereço do sistema de informações
+            total (int): quantidade de "requests"
+            depth (int): "requests" enviadas antes de ler as respostas
+        Retornos:
+            rate (float): "requests" atendidas por segundo
+    """
+    connection = socket.create_connection(address)
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    responses = HttpResponseCounter()
+    started = perf_counter()
+    sent = 0
+    while sent < total:
+        batch = min(depth, total - sent)
+        connection.sendall(REQUEST * batch)
+        sent += batch
+        while responses.count < sent:
+            responses.feed(connection.recv(65536))
+    elapsed = perf_counter() - started
+    connection.close()
+    return total / elapsed
+
+
+class HttpResponseCounter:
+    """
+    Conta as respostas completas recebidas, usando o Content-Length de cada uma
+        Atributos:
+            buffer (bytearray): bytes recebidos que ainda não formam uma resposta completa
+            count (int): quantidade de respostas completas
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.count = 0
+
+    def feed(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                return
+            head = bytes(self.buffer[:end]).lower()
+            start = head.index(b"content-length:") + len(b"content-length:")
+            size = int(head[start:].split(b"\r\n", 1)[0])
+            if len(self.buffer) < end + 4 + size:
+                return
+            del self.buffer[:end + 4 + size]
+            self.count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    address = startCar()
+    for depth in args.depths:
+        # O carro exibe cada "request" recebida, o que dominaria a medição
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            rate = measure(address, args.requests, depth)
+        print(f"profundidade {depth:>3}: {rate:>10.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
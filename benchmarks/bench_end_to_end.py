@@ -0,0 +1,311 @@
+"""
+Teste de carga de ponta a ponta: inicia localmente o servidor central, um servidor
+local por localidade, os postos e a frota de carros simulada, cada componente em
+um processo, sobre o broker mínimo de mqtt_broker.py (um broker por localidade).
+Mede a latência entre o pedido de um carro com bateria baixa e a resposta com o
+posto, as mensagens por segundo de cada componente e o uso de CPU e memória de
+cada processo, e grava o resultado em JSON para comparação entre versões
+
+    Uso:
+        python benchmarks/bench_end_to_end.py --localities 2 --stations 50 --cars 500 --duration 30 --output e2e.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+from time import process_time, sleep, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mqtt_broker import MqttBroker
+from trace_report import hopBreakdown, loadSpans
+
+
+def useComponent(directory):
+    """
+    Torna importáveis os módulos de um componente. Cada processo importa apenas um
+    componente, já que módulos como station.py têm o mesmo nome em vários diretórios
+    """
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+
+def waitUntil(instant):
+    sleep(max(0.0, instant - time()))
+
+
+def memoryUsage():
+    """
+    Retorna a memória residente atual e a máxima do processo, em MB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except OSError:
+        current = peak
+    return round(current, 1), round(peak, 1)
+
+
+def dumpTraces(name, workdir):
+    """
+    Grava as etapas dos pedidos registradas pelo processo, caso o componente use o rastreamento
+    """
+    tracing = sys.modules.get("tracing")
+    if tracing is not None:
+        tracing.tracer.dump(os.path.join(workdir, "traces", f"{name}.jsonl"))
+
+
+def runComponent(name, start, start_args, window, workdir, results):
+    """
+    Executa um componente em um processo próprio e mede o uso de CPU e as mensagens
+    tratadas durante a janela de medição
+        Parâmetros:
+            name (str): nome do componente no relatório
+            start (function): inicia o componente e retorna uma função que lê os seus contadores,
+                              com os valores que não são contadores no campo "state"
+            start_args (tuple): argumentos de start
+            window (tuple): instantes de início e fim da medição
+            workdir (str): diretório de trabalho, onde ficam os registros em disco
+            results (multiprocessing.Queue): fila em que o relatório é entregue
+    """
+    os.chdir(workdir)
+    # As mensagens exibidas pelos componentes dominariam a medição
+    sys.stdout = open(os.devnull, "w")
+    try:
+        counters = start(*start_args)
+        waitUntil(window[0])
+        before, cpu_before = counters(), process_time()
+        waitUntil(window[1])
+        after, cpu_after = counters(), process_time()
+    except Exception as e:
+        results.put({"name": name, "error": repr(e)})
+        return
+
+    dumpTraces(name, workdir)
+    elapsed = window[1] - window[0]
+    cpu = cpu_after - cpu_before
+    rss, max_rss = memoryUsage()
+    report = {
+        "name": name,
+        "cpu_s": round(cpu, 2),
+        "cpu_percent": round(100 * cpu / elapsed, 1),
+        "rss_mb": rss,
+        "max_rss_mb": max_rss,
+        "state": after.pop("state", {}),
+        "messages_per_s": {
+            kind: round((count - before.get(kind, 0)) / elapsed, 1) for kind, count in after.items()}}
+    results.put(report)
+
+
+def startBroker(ports):
+    brokers = [MqttBroker("127.0.0.1", port) for port in ports]
+
+    async def serve():
+        for broker in brokers:
+            await broker.start()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=[serve()], daemon=True).start()
+
+    def counters():
+        totals = {"delivered": sum(broker.delivered for broker in brokers)}
+        for broker in brokers:
+            for category, count in broker.received.items():
+                totals[category] = totals.get(category, 0) + count
+        return totals
+    return counters
+
+
+def startCentral(port):
+    useComponent("central server")
+    from central_server import CentralServer
+
+    central = CentralServer("127.0.0.1", port)
+    central.metrics_port = None
+    handled = {"messages": 0}
+    process_message = central.processMessage
+
+    def countedMessage(msg, send=None):
+        handled["messages"] += 1
+        return process_message(msg, send)
+
+    central.processMessage = countedMessage
+    threading.Thread(target=central.main, daemon=True).start()
+
+    def counters():
+        stats = central.getStats()["stats"]
+        return {"messages": handled["messages"],
+                "state": {"stations": stats["stations"], "route_cache": stats["route_cache"]}}
+    return counters
+
+
+def startLocal(location, broker_port, cloud_port):
+    useComponent("local server")
+    from local_server import LocalServer
+
+    server = LocalServer(location, "127.0.0.1", broker_port, "127.0.0.1", cloud_port)
+    # Os servidores locais do teste compartilham a máquina, então o endpoint de métricas fica desligado
+    server.metrics_port = None
+    threading.Thread(target=server.main, daemon=True).start()
+
+    def counters():
+        metrics = server.getMetrics()
+        handled = {kind: latency["count"] for kind, latency in metrics["latency"].items()}
+        handled["state"] = {
+            "stations": metrics["stations"],
+            "avg_ms": {kind: latency["avg_ms"] for kind, latency in metrics["latency"].items()}}
+        return handled
+    return counters
+
+
+def startStations(location, broker_port, count):
+    useComponent("client power station")
+    from power_station import PowerStation
+    from station_host import StationHost
+
+    first_code = location * 100000
+    stations = [PowerStation("127.0.0.1", 10, code) for code in range(first_code, first_code + count)]
+    host = StationHost("127.0.0.1", stations, broker_port=broker_port)
+    threading.Thread(target=host.main, daemon=True).start()
+
+    def counters():
+        stats = host.publisher.stats() if host.publisher else {}
+        return {"published": stats.get("published", 0)}
+    return counters
+
+
+def runCars(location, broker_port, args, window, workdir, results):
+    """
+    Executa a frota de uma localidade durante a janela de medição e entrega as
+    latências medidas, para que os percentis sejam calculados sobre todas as frotas
+    """
+    useComponent("client car")
+    from fleet_simulator import FleetSimulator
+
+    os.chdir(workdir)
+    sys.stdout = open(os.devnull, "w")
+    simulator = FleetSimulator("127.0.0.1", broker_port, args.cars, args.connections, args.tick,
+                               args.localities, seed=location)
+    waitUntil(window[0])
+    cpu_before = process_time()
+    report = asyncio.run(simulator.run(window[1] - window[0]))
+    cpu = process_time() - cpu_before
+    dumpTraces(f"cars-{location}", workdir)
+    rss, max_rss = memoryUsage()
+    results.put({
+        "name": f"cars-{location}",
+        "cpu_s": round(cpu, 2),
+        "cpu_percent": round(100 * cpu / report["seconds"], 1),
+        "rss_mb": rss,
+        "max_rss_mb": max_rss,
+        "messages_per_s": {
+            "battery": report["battery_per_s"],
+            "traffic": report["traffic_per_s"],
+            "replies": report["replies_per_s"]},
+        "state": {"not_found": report["not_found"], "dropped": report["dropped"]},
+        "latencies": simulator.latencies})
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"count": 0}
+
+    def percentile(p):
+        return round(1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+    return {
+        "count": len(latencies),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(1000 * latencies[-1], 2)}
+
+
+def gitRevision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--localities", type=int, default=2)
+    parser.add_argument("--stations", type=int, default=50, help="postos por localidade")
+    parser.add_argument("--cars", type=int, default=500, help="carros por localidade")
+    parser.add_argument("--connections", type=int, default=4, help="conexões MQTT de cada frota")
+    parser.add_argument("--tick", type=float, default=0.5, help="duração do passo de bateria dos carros")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3, help="tempo para os postos se registrarem")
+    parser.add_argument("--base-port", type=int, default=18830)
+    parser.add_argument("--output", default="bench_end_to_end.json")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    cloud_port = args.base_port
+    broker_ports = [args.base_port + location for location in range(1, args.localities + 1)]
+
+    # Todos os processos medem a mesma janela, que começa após o registro dos postos
+    start = time() + args.warmup + 2
+    window = (start, start + args.duration)
+    processes = [context.Process(target=runComponent, args=(
+        "broker", startBroker, (broker_ports,), window, workdir, results))]
+    processes.append(context.Process(target=runComponent, args=(
+        "central", startCentral, (cloud_port,), window, workdir, results)))
+    for location, port in enumerate(broker_ports, 1):
+        processes.append(context.Process(target=runComponent, args=(
+            f"local-{location}", startLocal, (location, port, cloud_port), window, workdir, results)))
+    for location, port in enumerate(broker_ports, 1):
+        processes.append(context.Process(target=runComponent, args=(
+            f"stations-{location}", startStations, (location, port, args.stations), window, workdir, results)))
+    for location, port in enumerate(broker_ports, 1):
+        processes.append(context.Process(target=runCars, args=(location, port, args, window, workdir, results)))
+
+    # Os servidores precisam estar escutando antes dos clientes se conectarem
+    for process in processes:
+        process.start()
+        sleep(0.3)
+
+    reports = [results.get(timeout=args.duration + args.warmup + 60) for _ in processes]
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+    latencies = [latency for report in reports for latency in report.pop("latencies", [])]
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": gitRevision(),
+        "config": vars(args),
+        "latency_ms": percentiles(latencies),
+        "hops_ms": hopBreakdown(loadSpans([os.path.join(workdir, "traces")])),
+        "components": {report.pop("name"): report for report in sorted(reports, key=lambda r: r["name"])}}
+    with open(args.output, "w") as output:
+        json.dump(result, output, indent=2)
+
+    print(f"latência (ms): {result['latency_ms']}")
+    for hop, stats in result["hops_ms"].items():
+        print(f"  {hop:<18} p50 {stats['p50']:>8} ms  p95 {stats['p95']:>8} ms  ({stats['count']} pedidos)")
+    for name, report in result["components"].items():
+        if "error" in report:
+            print(f"{name:<12} erro: {report['error']}")
+            continue
+        rates = ", ".join(f"{kind} {rate}/s" for kind, rate in report["messages_per_s"].items())
+        print(f"{name:<12} CPU {report['cpu_percent']:>6}%  RSS {report['rss_mb']:>7} MB  {rates}")
+    print(f"resultado gravado em {args.output}")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Mede o tempo de escolha do posto de menor fila no servidor local, comparando a
+varredura de todos os postos com o heap indexado, conforme cresce a quantidade de postos
+
+    Uso:
+        python benchmarks/bench_local_selection.py --sizes 10 100 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "local server"))
+
+from station import StationTable
+from station_heap import StationHeap
+
+
+def scan(table, reserved, limit):
+    best_queue = limit
+    best_code = None
+    for code, location, queue in table.items():
+        queue += reserved.get(code, 0)
+        if queue < best_queue:
+            best_code = code
+            best_queue = queue
+    return best_code
+
+
+def lookup(heap, limit):
+    best = heap.top()
+    if best is None or best[0] >= limit:
+        return None
+    return best[1]
+
+
+def measure(size, operations, limit, seed):
+    """
+    Executa a mesma sequência de atualizações de fila e escolhas com as duas estruturas
+        Parâmetros:
+            size (int): quantidade de postos
+            operations (int): quantidade de pares (atualização, escolha)
+            limit (int): tamanho de fila a partir do qual o posto é descartado
+            seed (int): semente do gerador aleatório
+        Retornos:
+            result (dict): tempo médio, em microssegundos, de cada estrutura
+    """
+    rng = random.Random(seed)
+    table = StationTable()
+    heap = StationHeap()
+    reserved = {}
+    for i in range(size):
+        queue = rng.randrange(limit)
+        table.upsert(str(i), 0, queue)
+        heap.update(str(i), queue)
+
+    updates = [(str(rng.randrange(size)), rng.randrange(limit)) for _ in range(operations)]
+
+    started = perf_counter()
+    for code, queue in updates:
+        table.setQueue(code, queue)
+        scan(table, reserved, limit)
+    scan_time = perf_counter() - started
+
+    started = perf_counter()
+    for code, queue in updates:
+        table.setQueue(code, queue)
+        heap.update(code, queue)
+        lookup(heap, limit)
+    heap_time = perf_counter() - started
+
+    # As duas estruturas precisam chegar à mesma menor fila
+    best = lookup(heap, limit)
+    assert best is None or table.queue(best) == table.queue(scan(table, reserved, limit))
+    return {"scan_us": 1e6 * scan_time / operations, "heap_us": 1e6 * heap_time / operations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'postos':>8} {'varredura (us)':>15} {'heap (us)':>10}")
+    for size in args.sizes:
+        result = measure(size, args.operations, args.limit, args.seed)
+        print(f"{size:>8} {result['scan_us']:>15.2f} {result['heap_us']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
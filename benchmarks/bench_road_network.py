@@ -0,0 +1,116 @@
+"""
+Mede o tempo de escolha do posto no servidor central sobre uma malha viária em
+grade, conforme a malha cresce: um Dijkstra completo por pedido seguido da
+varredura dos postos, contra as árvores de caminhos mínimos da RoadNetwork
+(calculadas na carga em malhas pequenas, guardadas sob demanda nas grandes)
+consultadas pelo índice de postos
+
+    Uso:
+        python benchmarks/bench_road_network.py --sides 10 20 50 100
+"""
+import argparse
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "central server"))
+
+from road_network import RoadNetwork
+from station_index import StationIndex
+
+
+def grid(side, rng):
+    """
+    Retorna as vias de uma grade side x side, com tempos de viagem entre 3 e 7
+        Parâmetros:
+            side (int): quantidade de localizações em cada lado da grade
+            rng (random.Random): gerador aleatório
+    """
+    edges = []
+    for row in range(side):
+        for column in range(side):
+            node = row * side + column
+            if column + 1 < side:
+                edges.append((node, node + 1, rng.randint(3, 7)))
+            if row + 1 < side:
+                edges.append((node, node + side, rng.randint(3, 7)))
+    return edges
+
+
+def scan(network, stations, location, time_left, limit):
+    distances = network.shortestPaths(location)[2]
+    best = None
+    for code, (station_location, queue) in stations.items():
+        if station_location != location and distances.get(station_location, time_left) < time_left and queue < limit:
+            best = min(best or (queue, code), (queue, code))
+    return best
+
+
+def measure(side, station_count, queries, limit, seed):
+    """
+    Responde os mesmos pedidos com as duas abordagens
+        Parâmetros:
+            side (int): quantidade de localizações em cada lado da grade
+            station_count (int): quantidade de postos
+            queries (int): quantidade de pedidos
+            limit (int): tamanho de fila a partir do qual o posto é descartado
+            seed (int): semente do gerador aleatório
+        Retornos:
+            result (dict): tempo de carga, em ms, e tempo médio por pedido, em microssegundos
+    """
+    rng = random.Random(seed)
+    nodes = side * side
+    edges = grid(side, rng)
+
+    started = perf_counter()
+    network = RoadNetwork(edges)
+    load_time = perf_counter() - started
+
+    index = StationIndex()
+    stations = {}
+    for i in range(station_count):
+        location, queue = rng.randrange(nodes), rng.randrange(limit)
+        stations[str(i)] = (location, queue)
+        index.update(str(i), location, queue)
+
+    # Os carros se concentram em algumas localizações, como nos bairros atendidos
+    origins = [rng.randrange(nodes) for _ in range(64)]
+    requests = [(rng.choice(origins), rng.randint(20, 100)) for _ in range(queries)]
+
+    started = perf_counter()
+    expected = [scan(network, stations, location, time_left, limit) for location, time_left in requests]
+    scan_time = perf_counter() - started
+
+    started = perf_counter()
+    found = [index.bestWithin(location, network, time_left, limit) for location, time_left in requests]
+    network_time = perf_counter() - started
+
+    # As duas abordagens precisam chegar à mesma menor fila
+    assert [entry and entry[0] for entry in found] == [entry and entry[0] for entry in expected]
+    return {
+        "nodes": nodes,
+        "load_ms": 1000 * load_time,
+        "precomputed": network.precomputed,
+        "dijkstra_us": 1e6 * scan_time / queries,
+        "network_us": 1e6 * network_time / queries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sides", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'localizações':>12} {'carga (ms)':>11} {'pré-calculada':>14} {'dijkstra (us)':>14} {'malha (us)':>11}")
+    for side in args.sides:
+        result = measure(side, args.stations, args.queries, args.limit, args.seed)
+        print(f"{result['nodes']:>12} {result['load_ms']:>11.1f} {str(result['precomputed']):>14} "
+              f"{result['dijkstra_us']:>14.2f} {result['network_us']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
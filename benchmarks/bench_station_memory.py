@@ -0,0 +1,63 @@
+"""
+Mede a memória ocupada por posto no dicionário de objetos Station e na StationTable
+
+    Uso:
+        python benchmarks/bench_station_memory.py --stations 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "central server"))
+
+from station import Station, StationTable
+
+
+def measure(build, count):
+    """
+    Retorna a memória alocada e o tempo gasto para montar um registro de postos
+        Parâmetros:
+            build (function): função que monta o registro
+            count (int): quantidade de postos
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = perf_counter()
+    registry = build(count)
+    elapsed = perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del registry
+    return size, elapsed
+
+
+def buildDict(count):
+    station_dict = {}
+    for i in range(count):
+        code = str(i)
+        station_dict[code] = Station(i % 1000, code, i % 25)
+    return station_dict
+
+
+def buildTable(count):
+    station_table = StationTable()
+    station_table.upsertMany((str(i), i % 1000, i % 25) for i in range(count))
+    return station_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=200000)
+    args = parser.parse_args()
+
+    for name, build in (("dict de Station", buildDict), ("StationTable", buildTable)):
+        size, elapsed = measure(build, args.stations)
+        print(f"{name:>16}: {size / args.stations:7.1f} bytes/posto, "
+              f"{size / 2 ** 20:8.1f} MiB, montado em {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
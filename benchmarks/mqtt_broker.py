@@ -0,0 +1,228 @@
+"""
+Broker MQTT 3.1.1 mínimo, em asyncio, usado pelos testes de carga no lugar do
+Mosquitto. Atende apenas o que os clientes do sistema usam: conexão, assinaturas
+com os curingas "+" e "#", publicações com QoS 0 e 1, ping e última mensagem.
+As mensagens são entregues com QoS 0 e não há mensagens retidas nem sessões persistentes
+
+    Uso:
+        python benchmarks/mqtt_broker.py --ports 1883 1884
+"""
+import argparse
+import asyncio
+import struct
+
+# Tipos de pacote tratados pelo broker
+CONNECT, PUBLISH, PUBREL, SUBSCRIBE, SUBACK, UNSUBSCRIBE, PINGREQ, DISCONNECT = 1, 3, 6, 8, 9, 10, 12, 14
+
+
+def topicMatches(topic_filter, topic):
+    """
+    Indica se um tópico corresponde a um filtro de assinatura
+        Parâmetros:
+            topic_filter (str): filtro, com os curingas "+" (um nível) e "#" (os demais níveis)
+            topic (str): tópico da publicação
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def encodeLength(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def readString(data, offset):
+    size = struct.unpack_from("!H", data, offset)[0]
+    return data[offset + 2:offset + 2 + size], offset + 2 + size
+
+
+class MqttBroker:
+    """
+    Broker de uma única porta. Cada instância é independente, então um processo
+    pode simular o broker de várias localidades
+        Atributos:
+            host (str): endereço de escuta
+            port (int): porta de escuta
+            subscriptions (dict): filtros assinados por cada conexão
+            routes (dict): conexões que recebem cada tópico, calculadas na primeira publicação
+            received (dict): publicações recebidas por categoria de tópico
+            delivered (int): publicações entregues aos assinantes
+    """
+
+    def __init__(self, host="127.0.0.1", port=1883):
+        """
+        Método construtor da classe
+            Parâmetros:
+                host (str): endereço de escuta
+                port (int): porta de escuta
+        """
+        self.host = host
+        self.port = port
+        self.subscriptions = {}
+        self.routes = {}
+        self.received = {}
+        self.delivered = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handleClient, self.host, self.port)
+
+    def stats(self):
+        """
+        Retorna as publicações recebidas por categoria de tópico e as entregas feitas
+        """
+        return {"received": dict(self.received), "delivered": self.delivered}
+
+    async def readPacket(self, reader):
+        """
+        Lê um pacote MQTT
+            Retornos:
+                packet (tuple): tipo, flags e corpo do pacote
+        """
+        first = (await reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        body = await reader.readexactly(length) if length else b""
+        return first >> 4, first & 0x0F, body
+
+    async def handleClient(self, reader, writer):
+        """
+        Atende uma conexão até o cliente desconectar, publicando a última mensagem
+        caso a conexão caia sem um DISCONNECT
+        """
+        will = None
+        try:
+            packet_type, flags, body = await self.readPacket(reader)
+            if packet_type != CONNECT:
+                return
+            will = self.parseConnect(body)
+            writer.write(b"\x20\x02\x00\x00")
+            self.subscriptions[writer] = []
+
+            while True:
+                packet_type, flags, body = await self.readPacket(reader)
+                if packet_type == PUBLISH:
+                    qos = (flags >> 1) & 3
+                    topic, offset = readString(body, 0)
+                    if qos:
+                        packet_id = body[offset:offset + 2]
+                        offset += 2
+                        writer.write((b"\x40\x02" if qos == 1 else b"\x50\x02") + packet_id)
+                    self.publish(topic.decode("utf-8"), body[offset:])
+                elif packet_type == PUBREL:
+                    writer.write(b"\x70\x02" + body[:2])
+                elif packet_type == SUBSCRIBE:
+                    self.subscribe(writer, body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.unsubscribe(writer, body)
+                elif packet_type == PINGREQ:
+                    writer.write(b"\xd0\x00")
+                elif packet_type == DISCONNECT:
+                    will = None
+                    return
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.subscriptions.pop(writer, None) is not None:
+                self.routes.clear()
+            writer.close()
+            if will is not None:
+                self.publish(*will)
+
+    def parseConnect(self, body):
+        """
+        Lê o pacote CONNECT
+            Retornos:
+                will (tuple): tópico e conteúdo da última mensagem, ou None caso o cliente não tenha definido uma
+        """
+        _, offset = readString(body, 0)
+        connect_flags = body[offset + 1]
+        offset += 4
+        _, offset = readString(body, offset)
+        if not connect_flags & 0x04:
+            return None
+        will_topic, offset = readString(body, offset)
+        will_message, offset = readString(body, offset)
+        return will_topic.decode("utf-8"), will_message
+
+    def subscribe(self, writer, body):
+        packet_id = body[:2]
+        offset = 2
+        codes = bytearray()
+        while offset < len(body):
+            topic_filter, offset = readString(body, offset)
+            offset += 1
+            self.subscriptions[writer].append(topic_filter.decode("utf-8"))
+            codes.append(0)
+        self.routes.clear()
+        writer.write(bytes([SUBACK << 4]) + encodeLength(2 + len(codes)) + packet_id + codes)
+
+    def unsubscribe(self, writer, body):
+        packet_id = body[:2]
+        offset = 2
+        while offset < len(body):
+            topic_filter, offset = readString(body, offset)
+            filters = self.subscriptions[writer]
+            if topic_filter.decode("utf-8") in filters:
+                filters.remove(topic_filter.decode("utf-8"))
+        self.routes.clear()
+        writer.write(b"\xb0\x02" + packet_id)
+
+    def publish(self, topic, payload):
+        """
+        Entrega uma publicação, com QoS 0, a todas as conexões com um filtro correspondente
+            Parâmetros:
+                topic (str): tópico da publicação
+                payload (bytes): conteúdo da publicação
+        """
+        # As respostas aos carros e as métricas têm um nível por carro ou localidade
+        category = "/".join(topic.split("/")[:3])
+        self.received[category] = self.received.get(category, 0) + 1
+
+        writers = self.routes.get(topic)
+        if writers is None:
+            writers = [writer for writer, filters in self.subscriptions.items()
+                       if any(topicMatches(topic_filter, topic) for topic_filter in filters)]
+            self.routes[topic] = writers
+
+        encoded_topic = topic.encode("utf-8")
+        variable = struct.pack("!H", len(encoded_topic)) + encoded_topic + payload
+        packet = bytes([PUBLISH << 4]) + encodeLength(len(variable)) + variable
+        for writer in writers:
+            if not writer.is_closing():
+                writer.write(packet)
+                self.delivered += 1
+
+
+async def serve(brokers):
+    for broker in brokers:
+        await broker.start()
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ports", type=int, nargs="+", default=[1883])
+    args = parser.parse_args()
+    asyncio.run(serve([MqttBroker(args.host, port) for port in args.ports]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Resume as etapas dos pedidos de posto gravadas pelos processos (SIGUSR2 ou o teste
+de ponta a ponta): a latência de cada etapa e o caminho completo dos pedidos mais
+lentos ou de um pedido específico
+
+    Uso:
+        kill -USR2 <pid do carro> <pid do servidor local> <pid do servidor central>
+        python benchmarks/trace_report.py traces/
+        python benchmarks/trace_report.py traces/ --slowest 5
+        python benchmarks/trace_report.py traces/ --trace 3f9a1c0d2b7e4f61
+"""
+import argparse
+import json
+import os
+
+# Ordem das etapas no caminho de um pedido
+HOPS = ("car.roundtrip", "local.total", "local.batch_wait", "local.select", "local.replica", "local.cloud",
+        "central.lock_wait", "central.route")
+
+
+def loadSpans(paths):
+    """
+    Lê as etapas gravadas, de arquivos ou de diretórios com arquivos .jsonl
+        Parâmetros:
+            paths (list): arquivos ou diretórios
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".jsonl")]
+        else:
+            files.append(path)
+    spans = []
+    for name in files:
+        with open(name) as lines:
+            spans += [json.loads(line) for line in lines if line.strip()]
+    return spans
+
+
+def hopBreakdown(spans):
+    """
+    Retorna a quantidade e os percentis de duração, em ms, de cada etapa
+        Parâmetros:
+            spans (list): etapas gravadas
+    """
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["hop"], []).append(span["duration"])
+
+    breakdown = {}
+    for hop in sorted(durations, key=lambda hop: HOPS.index(hop) if hop in HOPS else len(HOPS)):
+        values = sorted(durations[hop])
+
+        def percentile(p):
+            return round(1000 * values[min(len(values) - 1, int(p * len(values)))], 2)
+        breakdown[hop] = {
+            "count": len(values),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": round(1000 * values[-1], 2)}
+    return breakdown
+
+
+def timeline(spans, trace):
+    """
+    Retorna as etapas de um pedido em ordem de início, com o início relativo ao primeiro
+        Parâmetros:
+            spans (list): etapas gravadas
+            trace (str): id de rastreamento do pedido
+    """
+    steps = sorted((span for span in spans if span["trace"] == trace), key=lambda span: span["start"])
+    if not steps:
+        return []
+    origin = steps[0]["start"]
+    return [
+        {"component": span["component"], "hop": span["hop"],
+         "offset_ms": round(1000 * (span["start"] - origin), 2), "duration_ms": round(1000 * span["duration"], 2)}
+        for span in steps]
+
+
+def slowest(spans, count):
+    """
+    Retorna os ids dos pedidos com o maior tempo total, medido pelo carro ou, na
+    falta dele, pelo servidor local
+    """
+    totals = {}
+    for span in spans:
+        if span["hop"] in ("car.roundtrip", "local.total"):
+            totals[span["trace"]] = max(totals.get(span["trace"], 0), span["duration"])
+    return sorted(totals, key=totals.get, reverse=True)[:count]
+
+
+def printTimeline(spans, trace):
+    print(f"\npedido {trace}")
+    for step in timeline(spans, trace):
+        print(f"  +{step['offset_ms']:>9.2f} ms  {step['duration_ms']:>9.2f} ms  {step['component']:<10} {step['hop']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="arquivos .jsonl ou diretórios com eles")
+    parser.add_argument("--trace", help="mostra o caminho de um pedido")
+    parser.add_argument("--slowest", type=int, default=0, help="mostra o caminho dos N pedidos mais lentos")
+    parser.add_argument("--json", action="store_true", help="exibe o resumo em JSON")
+    args = parser.parse_args()
+
+    spans = loadSpans(args.paths)
+    if args.trace:
+        printTimeline(spans, args.trace)
+        return
+
+    breakdown = hopBreakdown(spans)
+    if args.json:
+        print(json.dumps(breakdown, indent=2))
+    else:
+        print(f"{'etapa':<20}{'qtd':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+        for hop, stats in breakdown.items():
+            print(f"{hop:<20}{stats['count']:>8}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}{stats['max']:>10}")
+    for trace in slowest(spans, args.slowest):
+        printTimeline(spans, trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+NOT_FOUND = np.iinfo(np.int64).max
+
+
+class BatchRouter:
+    """
+    Escolhe o melhor posto para vários carros de uma só vez, comparando os vetores de
+    localização e fila da tabela de postos com os vetores de localização e tempo
+    restante dos carros
+        Atributos:
+            chunk_size (int): quantidade de carros avaliados por vez, limitando o tamanho da matriz de distâncias
+            network (RoadNetwork): malha viária, ou None para distâncias em linha reta
+    """
+
+    def __init__(self, chunk_size=256, network=None):
+        """
+        Método construtor da classe
+            Parâmetros:
+                chunk_size (int): quantidade de carros avaliados por vez
+                network (RoadNetwork): malha viária, ou None para distâncias em linha reta
+        """
+        self.chunk_size = chunk_size
+        self.network = network
+
+    def vectors(self, table, reserved):
+        """
+        Copia as colunas da tabela de postos para vetores NumPy
+            Parâmetros:
+                table (StationTable): tabela de postos
+                reserved (dict): quantidade de reservas ativas de cada posto
+            Retornos:
+                locations (np.ndarray): localização de cada posto
+                queues (np.ndarray): fila de cada posto somada às suas reservas
+        """
+        # A cópia libera o buffer da tabela logo em seguida, permitindo
+        # que ela continue crescendo
+        locations = np.frombuffer(table.locations, dtype=np.int32).astype(np.int64)
+        queues = np.frombuffer(table.queues, dtype=np.int32).astype(np.int64)
+        for code, count in reserved.items():
+            row = table.rows.get(code)
+            if row is not None:
+                queues[row] += count
+        return locations, queues
+
+    def travelTimes(self, locations, car_locations):
+        """
+        Retorna a matriz de tempos de viagem de cada carro (linhas) até cada posto (colunas)
+            Parâmetros:
+                locations (np.ndarray): localização de cada posto
+                car_locations (np.ndarray): localização de cada carro
+        """
+        if self.network is None:
+            return np.abs(locations[None, :] - car_locations[:, None]) * 5
+
+        # Carros na mesma localização compartilham a mesma linha da matriz
+        origins, inverse = np.unique(car_locations, return_inverse=True)
+        rows = np.empty((len(origins), len(locations)), dtype=np.float64)
+        for index, origin in enumerate(origins.tolist()):
+            times = self.network.tree(origin)[2]
+            rows[index] = [times.get(location, np.inf) for location in locations.tolist()]
+        return rows[inverse]
+
+    def assign(self, table, reserved, car_locations, times_left, max_queue=25):
+        """
+        Distribui um lote de carros entre os postos, somando à fila de cada posto os
+        carros do próprio lote já encaminhados a ele, para não enviar todos ao mesmo posto
+            Parâmetros:
+                table (StationTable): tabela de postos
+                reserved (dict): quantidade de reservas ativas de cada posto
+                car_locations (list): localização de cada carro
+                times_left (list): tempo restante da bateria de cada carro
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+            Retornos:
+                codes (list): código do posto atribuído a cada carro, ou None caso nenhum seja alcançável
+        """
+        car_locations = np.asarray(car_locations, dtype=np.int64)
+        times_left = np.asarray(times_left, dtype=np.int64)
+        codes = [None] * len(car_locations)
+        if not len(table):
+            return codes
+
+        locations, queues = self.vectors(table, reserved)
+
+        # Os carros com menos tempo restante têm menos opções e escolhem primeiro;
+        # cada escolha aumenta em um o custo marginal do posto escolhido
+        order = np.argsort(times_left, kind="stable")
+        for start in range(0, len(order), self.chunk_size):
+            cars = order[start:start + self.chunk_size]
+            times = self.travelTimes(locations, car_locations[cars])
+            # Mesmo critério de chooseBestStation: outro bairro, alcançável
+            # antes da bateria acabar (tempo de viagem < tempo restante)
+            reachable = (locations[None, :] != car_locations[cars, None]) & (times < times_left[cars, None])
+
+            for car, car_reachable in zip(cars.tolist(), reachable):
+                scores = np.where(car_reachable & (queues < max_queue), queues, NOT_FOUND)
+                row = int(scores.argmin())
+                if scores[row] != NOT_FOUND:
+                    codes[car] = table.codes[row]
+                    queues[row] += 1
+        return codes
@@ -1,7 +1,39 @@
 import threading
+import asyncio
+import logging
+import os
 import socket
-import json
-from station import Station
+from time import time
+from station import StationTable
+from station_index import StationIndex
+from route_cache import RouteCache
+from batch_router import BatchRouter
+from road_network import RoadNetwork
+from reservations import ReservationBook
+from registry_store import RegistryStore
+from protocol import ProtocolSession
+from outbox import Outbox
+from timing_wheel import TimingWheel
+from tracing import tracer
+from metrics import MetricsRegistry
+from profiler import SamplingProfiler
+
+log = logging.getLogger("central_server")
+
+# Faixa das localizações e filas guardadas na tabela de postos (array "i") e no registro em disco
+INT32 = range(-2 ** 31, 2 ** 31)
+
+
+def int32(value):
+    """
+    Converte um campo numérico de um posto, recusando valores fora da faixa de INT32
+        Parâmetros:
+            value (str | int): valor recebido do servidor local
+    """
+    number = int(value)
+    if number not in INT32:
+        raise ValueError(f"Valor fora da faixa: {number}")
+    return number
 
 class CentralServer:
     """
@@ -10,23 +42,79 @@ class CentralServer:
             cloud_host (str): endereço de conexão do socket TCP
             cloud_port (int): porta de conexão do socket TCP
             socket_tcp (socket): inicialização do socket TCP para comunicação com o servidor central
-            station_dict (dict): lista de postos de carregamento associados ao serviço
+            station_table (StationTable): tabela colunar dos postos de carregamento associados ao serviço
+            station_index (StationIndex): índice dos postos por localização e tamanho da fila
+            network (RoadNetwork): malha viária com os tempos de viagem entre as localizações; None usa a distância em linha reta
+            route_cache (RouteCache): respostas já calculadas por localização e alcance do carro
+            batch_router (BatchRouter): atende lotes de requisições com operações vetorizadas sobre a tabela de postos
+            reservations (ReservationBook): vagas reservadas para os carros encaminhados que ainda não chegaram
+            registry (RegistryStore): cópia em disco do registro de postos, usada para reiniciar o servidor já com os postos conhecidos
             format (str): formato da codificação de caracteres
+            async_mode (bool): atende os servidores locais em um único loop asyncio em vez de uma thread por conexão
+            lock (threading.RLock): faz com que cada mensagem, inclusive um lote de atualizações, seja aplicada por inteiro antes da próxima
+            subscribers (set): funções de envio das conexões inscritas para receber as alterações dos postos
+            max_outbound (int): bytes aguardando envio em uma conexão a partir dos quais as alterações dos postos são descartadas
+            sequence (int): número da última alteração enviada aos inscritos
+            changes (dict): postos alterados pela mensagem em tratamento ((localização, fila) ou None, caso removido)
+            station_ttl (float): tempo, em segundos, sem notícias de um posto após o qual ele é removido
+            liveness (TimingWheel): prazo de expiração de cada posto, renovado pelas atualizações e pelas listas de postos ativos
+            evicted (int): quantidade de postos removidos por falta de notícias
+            metrics (MetricsRegistry): contadores, latências por tipo de mensagem e medidores do servidor
+            metrics_port (int): porta local do endpoint de métricas; None desliga o endpoint
+            connections (int): quantidade de servidores locais conectados
+            profiler (SamplingProfiler): perfil por amostragem, ligado e desligado pelo sinal SIGUSR1
     """
 
-    def __init__(self):
+    def __init__(self, cloud_host=None, cloud_port=1917, network_path="road_network.json"):
         """
         Método construtor da classe
+            Parâmetros:
+                cloud_host (str): endereço do socket TCP; o endereço da máquina caso não seja informado
+                cloud_port (int): porta do socket TCP
+                network_path (str): arquivo da malha viária; sem ele, vale a distância em linha reta
         """
-        self.cloud_host = socket.gethostbyname(socket.gethostname())  # 172.16.103.9
-        self.cloud_port = 1917
+        self.cloud_host = cloud_host or socket.gethostbyname(socket.gethostname())  # 172.16.103.9
+        self.cloud_port = cloud_port
 
         self.socket_tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-        self.station_dict = {}
+        self.station_table = StationTable()
+        self.station_index = StationIndex()
+        self.network = None
+        if network_path and os.path.exists(network_path):
+            self.network = RoadNetwork.load(network_path)
+            log.info("Malha viária carregada de %s: %s", network_path, self.network.stats())
+        self.route_cache = RouteCache(network=self.network)
+        self.batch_router = BatchRouter(network=self.network)
+        self.reservations = ReservationBook()
+        self.registry = RegistryStore("registry/central")
 
         self.format = 'utf-8'
 
+        self.async_mode = True
+        self.lock = threading.RLock()
+        self.subscribers = set()
+        self.max_outbound = 1 << 20
+        self.sequence = 0
+        self.changes = {}
+
+        self.station_ttl = 45
+        self.liveness = TimingWheel(self.station_ttl)
+        self.evicted = 0
+        tracer.component = "central"
+
+        self.connections = 0
+        self.metrics = MetricsRegistry("central")
+        self.metrics_port = 9917
+        self.metrics.gauge("stations", lambda: len(self.station_table))
+        self.metrics.gauge("connections", lambda: self.connections)
+        self.metrics.gauge("subscribers", lambda: len(self.subscribers))
+        self.metrics.gauge("reservations", lambda: sum(self.reservations.counts().values()))
+        self.metrics.gauge("route_cache_size", lambda: self.route_cache.stats()["size"])
+        self.metrics.gauge("sequence", lambda: self.sequence)
+        self.metrics.gauge("evicted", lambda: self.evicted)
+        self.profiler = SamplingProfiler("central")
+
     def conexaoTCP(self):
         """
         Faz conexão com clientes TCP e executa uma thread para receber as mensagens
@@ -34,19 +122,19 @@ class CentralServer:
                 socket_tcp (socket): socket para conexão TCP
         """
 
-        print(self.cloud_host)
+        log.info("Escutando em %s:%s", self.cloud_host, self.cloud_port)
         try:
             # Fornece o endereço e as portas para "escutar" as conexões
             # com os sockets dos clientes
             self.socket_tcp.bind((self.cloud_host, self.cloud_port))
             self.socket_tcp.listen()
         except:
-            return print("Não foi possível iniciar o sistema de informações")
+            return log.error("Não foi possível iniciar o sistema de informações")
 
         while True:
             # Aceita a conexão com os sockets dos clientes
             conn_client_tcp, addr_client_tcp = self.socket_tcp.accept()
-            print("Conectado com um cliente TCP em: ", addr_client_tcp)
+            log.info("Conectado com um cliente TCP em: %s", addr_client_tcp)
 
             # Recebe mensagens dos clientes através da conexão TCP
             thread_tcp = threading.Thread(target=self.tratarServer, args=(conn_client_tcp, addr_client_tcp))
@@ -59,30 +147,165 @@ class CentralServer:
                 client (): cliente TCP
                 addr (str): endereço para envio da resposta
         """
-        connected = True
-        print(f"\n===CONEXÃO COM {addr} ESTABELECIDA.===\n")
+        session = ProtocolSession(self.format)
+        # As alterações dos postos são enviadas pelas threads das outras conexões, com
+        # self.lock adquirido, então nenhuma delas escreve direto no socket
+        outbox = Outbox(client.sendall, self.max_outbound)
+        outbox.start()
+
+        def send(message, force=False):
+            return outbox.put(session.encode(message), force)
+
+        log.info("Conexão com %s estabelecida", addr)
+        with self.lock:
+            self.connections += 1
         try:
-            while connected:
-                msg = client.recv(1024).decode(self.format)
-                msg = str(msg)
-                if msg:
-                    msg = json.loads(msg)
-                    print("===MENSAGEM RECEBIDA===")
-                    print(msg)
-                    response = None
-
-                    if msg.get("time left"):
-                        response = self.chooseBestStation(msg)
-                    elif msg.get("queue"):
-                        response = self.updateStation(msg)
+            while True:
+                data = client.recv(65536)
+                if not data:
+                    break
+                messages, reply = session.receive(data)
+                if reply:
+                    outbox.put(reply, block=True)
+                for msg in messages:
+                    response = self.processMessage(msg, send)
+                    if response and "id" in msg:
+                        # Devolve o id para que o servidor local associe a resposta à requisição
+                        response["id"] = msg["id"]
+                    if response:
+                        # As respostas esperam por espaço, o que só atrasa a leitura desta conexão
+                        outbox.put(session.encode(response), block=True)
+
+        except Exception as e:
+            log.warning("Erro na comunicação com %s: %s", addr, e)
+        finally:
+            with self.lock:
+                self.connections -= 1
+            self.unsubscribe(send)
+            outbox.close()
+            client.close()
+
+    async def conexaoAsync(self):
+        """
+        Atende todas as conexões dos servidores locais em um único loop asyncio
+        """
+        log.info("Escutando em %s:%s", self.cloud_host, self.cloud_port)
+        try:
+            server = await asyncio.start_server(self.tratarServerAsync, self.cloud_host, self.cloud_port)
+        except OSError:
+            return log.error("Não foi possível iniciar o sistema de informações")
+
+        async with server:
+            await server.serve_forever()
+
+    async def tratarServerAsync(self, reader, writer):
+        """
+        Trata mensagens recebidas de um servidor local no loop asyncio
+            Parâmetros:
+                reader (asyncio.StreamReader): leitura da conexão TCP
+                writer (asyncio.StreamWriter): escrita da conexão TCP
+        """
+        addr = writer.get_extra_info("peername")
+        session = ProtocolSession(self.format)
+
+        def send(message, force=False):
+            # O buffer de escrita só é esvaziado pelo drain desta conexão; um servidor
+            # local lento perde as alterações dos postos em vez de acumulá-las sem limite
+            if not force and writer.transport.get_write_buffer_size() >= self.max_outbound:
+                return False
+            writer.write(session.encode(message))
+            return True
 
+        log.info("Conexão com %s estabelecida", addr)
+        self.connections += 1
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                messages, reply = session.receive(data)
+                if reply:
+                    writer.write(reply)
+                for msg in messages:
+                    response = self.processMessage(msg, send)
+                    if response and "id" in msg:
+                        # Devolve o id para que o servidor local associe a resposta à requisição
+                        response["id"] = msg["id"]
                     if response:
-                        print(f"\n===ENVIANDO RESPOSTA:=== \n{response}")
-                        client.send(response.encode(self.format))
+                        send(response, True)
+                await writer.drain()
 
         except Exception as e:
-            print(f"\n===OCORREU UM ERRO NA COMUNICAÇÃO COM {addr}.===")
-            print(e)
+            log.warning("Erro na comunicação com %s: %s", addr, e)
+        finally:
+            self.connections -= 1
+            self.unsubscribe(send)
+            writer.close()
+
+    def processMessage(self, msg, send=None):
+        """
+        Direciona uma mensagem recebida para o tratamento adequado
+            Parâmetros:
+                msg (dict): mensagem recebida de um servidor local
+                send (function): envia mensagens pela conexão de origem, usada nas inscrições
+            Retornos:
+                response (dict): resposta a ser enviada para o servidor local
+        """
+        log.debug("Mensagem recebida: %s", msg)
+        response = None
+        kind = "unknown"
+        received = time()
+
+        # No modo com uma thread por conexão, as mensagens de servidores locais
+        # diferentes chegam ao mesmo tempo
+        with self.lock:
+            locked = time()
+            for code in self.reservations.expire():
+                self.refreshStation(code)
+            self.evictStale()
+
+            # Os campos são verificados pela presença, pois no protocolo binário
+            # os números chegam como inteiros e uma fila 0 seria descartada
+            if "batch" in msg:
+                kind, response = "batch", self.routeBatch(msg.get("batch"))
+            elif "updates" in msg:
+                kind, response = "updates", self.applyUpdates(msg.get("updates"))
+            elif "time left" in msg:
+                kind, response = "route", self.chooseBestStation(msg)
+            elif "alive" in msg:
+                kind, response = "alive", self.markAlive(msg.get("alive"))
+            elif "removed" in msg:
+                kind, response = "removed", self.removeStation(msg.get("code"))
+            elif "queue" in msg:
+                kind, response = "queue", self.updateStation(msg)
+            elif "reserve" in msg:
+                kind, response = "reserve", self.reserveRemote(msg)
+            elif "subscribe" in msg:
+                kind, response = "subscribe", self.subscribe(send)
+            elif "stats" in msg:
+                kind, response = "stats", self.getStats()
+            else:
+                # Toda mensagem é respondida, para que a requisição do servidor local não
+                # fique aguardando até o fim do prazo
+                log.warning("Mensagem desconhecida recusada: %s", sorted(msg))
+                response = {"result": "0"}
+
+            self.publishChanges()
+
+        finished = time()
+        self.metrics.increment("messages_total", kind=kind)
+        self.metrics.observe("lock_wait_seconds", locked - received)
+        self.metrics.observe("message_seconds", finished - locked, kind=kind)
+
+        # Os pedidos de posto trazem o id de rastreamento atribuído pelo carro
+        if "batch" in msg or "time left" in msg:
+            for car_info in msg.get("batch", [msg]):
+                tracer.record(car_info.get("trace"), "central.lock_wait", received, locked)
+                tracer.record(car_info.get("trace"), "central.route", locked, finished)
+
+        if response:
+            log.debug("Enviando resposta: %s", response)
+        return response
 
     def updateStation(self, station_info):
         """
@@ -90,58 +313,310 @@ class CentralServer:
             Parâmetros:
                 station_info (dict): informações de um posto de carregamento
         """
-        print(self.station_dict)
-
-        new_location = int(station_info.get("location"))
+        try:
+            new_location = int32(station_info.get("location"))
+            new_queue = int32(station_info.get("queue"))
+        except (TypeError, ValueError):
+            log.warning("Atualização recusada: posto inválido")
+            return {"result": "0"}
         new_code = station_info.get("code")
-        new_queue = int(station_info.get("queue"))
-        new_station = Station(new_location, new_code, new_queue)
-        self.station_dict[new_code] = new_station
-        print(self.station_dict)
+        self.applyStation(new_code, new_location, new_queue)
+        log.debug("%d postos registrados", len(self.station_table))
 
-        response = "{\"result\": \"1\"}"
+        response = {"result": "1"}
         return response
 
+    def applyUpdates(self, updates):
+        """
+        Aplica um lote de atualizações de postos enviado por um servidor local. O lote
+        é validado antes de qualquer alteração, então ele é aplicado por inteiro ou recusado
+            Parâmetros:
+                updates (list): informações de cada posto atualizado
+            Retornos:
+                response (dict): "1" caso o lote tenha sido aplicado, "0" caso tenha sido recusado
+        """
+        try:
+            stations = [
+                (station_info["code"], None, None) if "removed" in station_info else
+                (station_info["code"], int32(station_info["location"]), int32(station_info["queue"]))
+                for station_info in updates]
+        except (KeyError, TypeError, ValueError):
+            log.warning("Lote de atualizações recusado: posto inválido")
+            return {"result": "0"}
+
+        for code, location, queue in stations:
+            if location is None:
+                self.removeStation(code)
+            else:
+                self.applyStation(code, location, queue)
+        log.debug("%d atualizações aplicadas, %d postos registrados", len(stations), len(self.station_table))
+        return {"result": "1"}
+
+    def applyStation(self, code, location, queue):
+        """
+        Registra o estado de um posto na tabela, no índice e em disco
+            Parâmetros:
+                code (str): código do posto
+                location (int): localização do posto
+                queue (int): tamanho da fila de carros do posto
+        """
+        if code in self.station_table:
+            # O aumento da fila indica a chegada de carros que tinham reserva
+            self.reservations.confirm(code, queue - self.station_table.queue(code))
+            old_location = self.station_table.location(code)
+            if old_location != location:
+                self.route_cache.invalidate(old_location, None, code)
+        self.station_table.upsert(code, location, queue)
+        self.liveness.touch(code)
+        self.refreshStation(code)
+        self.saveStation(code)
+
+    def removeStation(self, code):
+        """
+        Remove um posto desligado ou sem notícias da tabela, do índice, do cache e do disco
+            Parâmetros:
+                code (str): código do posto
+        """
+        if code not in self.station_table:
+            return {"result": "0"}
+        location = self.station_table.location(code)
+        self.station_table.remove(code)
+        self.station_index.remove(code)
+        self.liveness.discard(code)
+        self.route_cache.invalidate(location, None, code)
+        self.registry.appendRemoval(code)
+        self.changes[code] = None
+        log.info("Posto %s removido, %d postos registrados", code, len(self.station_table))
+        return {"result": "1"}
+
+    def markAlive(self, codes):
+        """
+        Renova o prazo dos postos que um servidor local informa estarem ativos
+            Parâmetros:
+                codes (list): códigos dos postos ativos
+            Retornos:
+                response (dict): confirmação com os códigos desconhecidos, que o servidor
+                    local deve reenviar, como os de postos removidos por falta de notícias
+        """
+        unknown = []
+        for code in codes or []:
+            if code in self.station_table:
+                self.liveness.touch(code)
+            else:
+                unknown.append(code)
+        if unknown:
+            return {"result": "1", "unknown": unknown}
+        return {"result": "1"}
+
+    def evictStale(self):
+        """
+        Remove os postos cujo prazo venceu, examinando apenas os prazos vencidos
+        """
+        for code in self.liveness.expire():
+            self.evicted += 1
+            self.removeStation(code)
+
     def chooseBestStation(self, car_info):
         """
         Escolhe o melhor posto entre as opções disponíveis para o carro recarregar
             Parâmetros:
                 car_info (): informações do carro (bateria e modo de autonomia)
         """
-        best_queue = 25
-        best_station = None
+        log.debug("Calculando melhor posto para %s", car_info.get("car"))
+        location = int(car_info.get("location"))
+        time_left = int(car_info.get("time left"))
 
-        print("Calculando melhor posto...")
-        print(car_info.get("location"))
+        if self.network is None:
+            # O carro leva 5 unidades de tempo por unidade de distância, então alcança
+            # os postos a uma distância d tal que d * 5 < time_left
+            reach = (time_left - 1) // 5
+            found, best = self.route_cache.get(location, reach)
+            if not found:
+                candidates, bound = self.station_index.bestEntries(location, reach, self.route_cache.keep)
+                self.route_cache.put(location, reach, candidates, bound)
+                best = candidates[0] if candidates else None
+        else:
+            # Na malha viária, alcança os postos com tempo de viagem menor que time_left
+            found, best = self.route_cache.get(location, time_left)
+            if not found:
+                candidates, bound = self.station_index.bestEntriesWithin(
+                    location, self.network, time_left, self.route_cache.keep)
+                self.route_cache.put(location, time_left, candidates, bound)
+                best = candidates[0] if candidates else None
+        best_code = best[1] if best else None
+        best_station = self.station_table.get(best_code)
+        if best_station:
+            self.reserve(best_code, car_info.get("car"))
 
-        for station in self.station_dict.values():
-            print(station.location)
-            if station.location != int(car_info.get("location")):
-                current_distance = station.distance(int(car_info.get("location")))
-                current_time = current_distance * 5
+        if best_station:
+            return {
+                "car": car_info.get("car"),
+                "location": str(best_station.location),
+                "code": str(best_station.code),
+                "queue": str(best_station.queue)}
+        else:
+            return {"result": "posto não encontrado"}
 
-                print(current_distance)
-                print(current_time)
+    def routeBatch(self, cars_info):
+        """
+        Escolhe o melhor posto para um lote de carros enviado por um servidor local
+            Parâmetros:
+                cars_info (list): informações de cada carro (localização e tempo restante da bateria)
+            Retornos:
+                response (dict): lote com a resposta de cada carro, na mesma ordem do pedido
+        """
+        log.debug("Calculando melhor posto para %d carros", len(cars_info))
+        codes = self.batch_router.assign(
+            self.station_table,
+            self.reservations.counts(),
+            [int(car_info.get("location")) for car_info in cars_info],
+            [int(car_info.get("time left")) for car_info in cars_info])
 
-                if int(car_info.get("time left")) > current_time:
-                    if int(station.queue) < best_queue:
-                        best_queue = station.queue
-                        best_station = station
+        responses = []
+        for car_info, code in zip(cars_info, codes):
+            best_station = self.station_table.get(code)
+            if best_station:
+                self.reserve(code, car_info.get("car"))
+                responses.append({
+                    "car": car_info.get("car"),
+                    "location": str(best_station.location),
+                    "code": str(best_station.code),
+                    "queue": str(best_station.queue)})
+            else:
+                responses.append({"car": car_info.get("car"), "result": "posto não encontrado"})
+        return {"batch": responses}
 
-        if best_station:
-            response_car = "{\"car\": \"" + car_info.get("car") + "\", "
-            response_location = "\"location\": \"" + str(best_station.location) + "\", "
-            response_station_code = "\"code\": \"" + str(best_station.code) + "\", "
-            response_station_queue = "\"queue\": \"" + str(best_station.queue) + "\"}"
-            response = response_car + response_location + response_station_code + response_station_queue
-            return response
-        else:
-            return "{\"result\": \"posto não encontrado\"}"
+    def reserve(self, code, car):
+        """
+        Reserva uma vaga no posto escolhido para um carro
+            Parâmetros:
+                code (str): código do posto
+                car (str): código do carro
+        """
+        for changed in self.reservations.reserve(code, car):
+            self.refreshStation(changed)
+
+    def reserveRemote(self, reservation):
+        """
+        Registra a reserva de um carro que um servidor local encaminhou a um posto de
+        outra localidade usando a sua cópia dos postos
+            Parâmetros:
+                reservation (dict): código do posto ("reserve") e código do carro ("car")
+        """
+        code = reservation.get("reserve")
+        if code not in self.station_table:
+            return {"result": "0"}
+        self.reserve(code, reservation.get("car"))
+        return {"result": "1"}
+
+    def refreshStation(self, code):
+        """
+        Atualiza o índice de um posto com a sua fila somada às reservas ativas e
+        descarta as respostas guardadas que a mudança pode afetar
+            Parâmetros:
+                code (str): código do posto
+        """
+        if code in self.station_table:
+            location = self.station_table.location(code)
+            queue = self.station_table.queue(code) + self.reservations.count(code)
+            self.station_index.update(code, location, queue)
+            self.route_cache.invalidate(location, queue, code)
+            self.changes[code] = (location, queue)
+
+    def subscribe(self, send):
+        """
+        Inscreve uma conexão para receber as alterações dos postos, enviando antes um
+        retrato de todos os postos. Uma nova inscrição da mesma conexão reenvia o retrato
+            Parâmetros:
+                send (function): envia mensagens pela conexão inscrita
+        """
+        if send is None:
+            return {"result": "0"}
+        stations = [[code, location, queue] for code, (location, queue) in self.station_index.entries.items()]
+        # O retrato é enviado antes de qualquer alteração posterior a ele, mesmo com a fila cheia
+        send({"snapshot": {"seq": self.sequence, "stations": stations}}, True)
+        self.subscribers.add(send)
+        log.info("%d servidores locais inscritos", len(self.subscribers))
+        return {"result": "1"}
+
+    def unsubscribe(self, send):
+        with self.lock:
+            self.subscribers.discard(send)
+
+    def publishChanges(self):
+        """
+        Envia aos inscritos, como uma única alteração numerada, os postos alterados pela
+        mensagem que acabou de ser tratada. O envio nunca espera pelo socket: um inscrito
+        atrasado perde a alteração, e a falha na sequência faz a sua cópia pedir um novo retrato
+        """
+        if not self.changes:
+            return
+        changes, self.changes = self.changes, {}
+        if not self.subscribers:
+            return
+        self.sequence += 1
+        delta = {"delta": {
+            "seq": self.sequence,
+            "stations": [[code, *entry] for code, entry in changes.items() if entry is not None],
+            "removed": [code for code, entry in changes.items() if entry is None]}}
+        for send in list(self.subscribers):
+            try:
+                sent = send(delta)
+            except OSError:
+                self.subscribers.discard(send)
+                continue
+            if not sent:
+                self.metrics.increment("deltas_dropped_total")
+
+    def getStats(self):
+        """
+        Retorna os contadores do servidor, para consulta pelos servidores locais ou ferramentas de monitoramento
+        """
+        return {"stats": {
+            "stations": len(self.station_table),
+            "subscribers": len(self.subscribers),
+            "sequence": self.sequence,
+            "evicted": self.evicted,
+            "route_cache": self.route_cache.stats(),
+            "network": self.network.stats() if self.network else None,
+            "reservations": self.reservations.stats()}}
+
+    def loadRegistry(self):
+        """
+        Carrega os postos salvos em disco antes de começar a atender os servidores locais
+        """
+        self.station_table.upsertMany(
+            (code, location, queue) for code, (location, queue) in self.registry.load().items())
+        for code in self.station_table.codes:
+            self.liveness.touch(code)
+            self.refreshStation(code)
+        log.info("%d postos carregados do registro", len(self.station_table))
+
+    def saveStation(self, code):
+        """
+        Registra em disco a atualização de um posto
+            Parâmetros:
+                code (str): código do posto atualizado
+        """
+        self.registry.append(code, self.station_table.location(code), self.station_table.queue(code))
+        if self.registry.needsCompaction():
+            self.registry.compact(self.station_table.items())
 
     def main(self):
         # Cria um socket com conexão TCP
-        print("Começando servidor central...")
-        self.conexaoTCP()
+        log.info("Começando servidor central...")
+        self.loadRegistry()
+        self.metrics.serve(self.metrics_port)
+        if self.async_mode:
+            asyncio.run(self.conexaoAsync())
+        else:
+            self.conexaoTCP()
 
-central = CentralServer()
-central.main()
+if __name__ == "__main__":
+    # LOG_LEVEL=DEBUG exibe cada mensagem recebida e enviada
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    tracer.dumpOnSignal()
+    central = CentralServer()
+    central.profiler.installSignal()
+    central.main()
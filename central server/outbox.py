@@ -0,0 +1,96 @@
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Fila de envio de uma conexão, escrita por uma thread própria, para que quem envia
+    nunca espere pelo socket de um servidor local lento. As alterações dos postos são
+    descartadas quando a fila passa do limite; as respostas esperam por espaço
+        Atributos:
+            write (function): envia bytes pela conexão, podendo bloquear
+            max_bytes (int): quantidade de bytes aguardando envio a partir da qual a fila está cheia
+            pending (deque): mensagens codificadas aguardando envio, em ordem
+            size (int): quantidade de bytes aguardando envio
+            closed (bool): indica se a conexão foi encerrada
+            dropped (int): mensagens descartadas com a fila cheia
+            condition (threading.Condition): protege a fila e acorda a thread de escrita
+    """
+
+    def __init__(self, write, max_bytes=1 << 20):
+        """
+        Método construtor da classe
+            Parâmetros:
+                write (function): envia bytes pela conexão, podendo bloquear
+                max_bytes (int): quantidade de bytes aguardando envio a partir da qual a fila está cheia
+        """
+        self.write = write
+        self.max_bytes = max_bytes
+        self.pending = deque()
+        self.size = 0
+        self.closed = False
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def start(self):
+        thread = threading.Thread(target=self.writeLoop, daemon=True)
+        thread.start()
+
+    def put(self, data, force=False, block=False):
+        """
+        Agenda o envio de uma mensagem já codificada
+            Parâmetros:
+                data (bytes): mensagem codificada
+                force (bool): envia mesmo com a fila cheia, como o retrato pedido pela inscrição
+                block (bool): espera por espaço na fila em vez de descartar a mensagem
+            Retornos:
+                queued (bool): indica se a mensagem foi agendada
+        """
+        with self.condition:
+            if block:
+                while self.size >= self.max_bytes and not self.closed:
+                    self.condition.wait()
+            if self.closed:
+                return False
+            if self.size >= self.max_bytes and not force and not block:
+                self.dropped += 1
+                return False
+            self.pending.append(data)
+            self.size += len(data)
+            self.condition.notify_all()
+            return True
+
+    def writeLoop(self):
+        """
+        Escreve as mensagens na ordem em que foram agendadas, até a conexão ser encerrada
+        """
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                data = self.pending.popleft()
+            try:
+                self.write(data)
+            except OSError as e:
+                log.warning("Falha ao enviar para o servidor local: %s", e)
+                self.close()
+                return
+            with self.condition:
+                if not self.closed:
+                    self.size -= len(data)
+                self.condition.notify_all()
+
+    def close(self):
+        """
+        Encerra a fila, descartando as mensagens pendentes e liberando quem espera por espaço
+        """
+        with self.condition:
+            self.closed = True
+            self.pending.clear()
+            self.size = 0
+            self.condition.notify_all()
@@ -0,0 +1,141 @@
+import heapq
+import json
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+INF = float("inf")
+
+
+class RoadNetwork:
+    """
+    Malha viária entre as localizações, com o tempo de viagem de cada via, na mesma
+    unidade do tempo restante da bateria dos carros. Os menores tempos a partir de
+    cada origem (árvores de caminhos mínimos) são calculados com Dijkstra: todas de
+    uma vez em malhas pequenas e, em malhas grandes, sob demanda e guardadas das
+    origens mais consultadas
+        Atributos:
+            adjacency (dict): vias que saem de cada localização, como (destino, tempo)
+            trees (OrderedDict): árvore de cada origem, como (tempos em ordem, localizações na mesma ordem, tempo por localização)
+            max_trees (int): quantidade máxima de árvores guardadas nas malhas grandes
+            precomputed (bool): indica se as árvores de todas as origens foram calculadas na carga
+            hits (int): consultas respondidas por uma árvore guardada
+            misses (int): árvores calculadas sob demanda
+            lock (threading.Lock): protege as árvores guardadas
+    """
+
+    def __init__(self, edges, nodes=(), precompute_limit=512, max_trees=1024):
+        """
+        Método construtor da classe
+            Parâmetros:
+                edges (iterable): vias como (localização, localização, tempo de viagem), percorridas nos dois sentidos
+                nodes (iterable): localizações, incluindo as que não têm vias
+                precompute_limit (int): quantidade de localizações até a qual todas as árvores são calculadas na carga
+                max_trees (int): quantidade máxima de árvores guardadas nas malhas grandes
+        """
+        self.adjacency = {int(node): [] for node in nodes}
+        for start, end, travel_time in edges:
+            start, end, travel_time = int(start), int(end), float(travel_time)
+            if travel_time < 0:
+                raise ValueError("Tempo de viagem negativo")
+            self.adjacency.setdefault(start, []).append((end, travel_time))
+            self.adjacency.setdefault(end, []).append((start, travel_time))
+
+        self.trees = OrderedDict()
+        self.max_trees = max_trees
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.precomputed = len(self.adjacency) <= precompute_limit
+        if self.precomputed:
+            for node in self.adjacency:
+                self.trees[node] = self.shortestPaths(node)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Carrega a malha de um arquivo JSON no formato
+        {"nodes": [1, 2, ...], "edges": [[1, 2, 5], [2, 3, 7.5], ...]}
+            Parâmetros:
+                path (str): caminho do arquivo
+        """
+        with open(path) as source:
+            data = json.load(source)
+        return cls(data.get("edges", []), data.get("nodes", []), **kwargs)
+
+    def __len__(self):
+        return len(self.adjacency)
+
+    def shortestPaths(self, source):
+        """
+        Calcula o menor tempo de viagem de uma origem até cada localização alcançável
+            Parâmetros:
+                source (int): localização de origem
+        """
+        distances = {}
+        heap = [(0.0, source)] if source in self.adjacency else []
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if node in distances:
+                continue
+            distances[node] = distance
+            for neighbor, travel_time in self.adjacency[node]:
+                if neighbor not in distances:
+                    heapq.heappush(heap, (distance + travel_time, neighbor))
+        # Dijkstra fixa as localizações em ordem crescente de tempo
+        return list(distances.values()), list(distances), distances
+
+    def tree(self, source):
+        """
+        Retorna a árvore de caminhos mínimos de uma origem, calculando-a caso não esteja guardada
+            Parâmetros:
+                source (int): localização de origem
+        """
+        with self.lock:
+            tree = self.trees.get(source)
+            if tree is not None:
+                self.hits += 1
+                if not self.precomputed:
+                    self.trees.move_to_end(source)
+                return tree
+            self.misses += 1
+
+        tree = self.shortestPaths(source)
+        with self.lock:
+            self.trees[source] = tree
+            while len(self.trees) > self.max_trees:
+                self.trees.popitem(last=False)
+        return tree
+
+    def distance(self, source, target):
+        """
+        Retorna o menor tempo de viagem entre duas localizações, ou infinito caso não haja caminho
+            Parâmetros:
+                source (int): localização de origem
+                target (int): localização de destino
+        """
+        return self.tree(int(source))[2].get(int(target), INF)
+
+    def within(self, source, limit):
+        """
+        Retorna as localizações alcançáveis a partir de uma origem em menos de "limit"
+        de tempo, em ordem crescente de tempo, incluindo a própria origem
+            Parâmetros:
+                source (int): localização de origem
+                limit (float): tempo máximo de viagem, exclusivo
+        """
+        times, nodes, _ = self.tree(int(source))
+        return nodes[:bisect_left(times, limit)]
+
+    def stats(self):
+        """
+        Retorna o tamanho da malha e os contadores das árvores guardadas
+        """
+        with self.lock:
+            return {
+                "nodes": len(self.adjacency),
+                "edges": sum(len(edges) for edges in self.adjacency.values()) // 2,
+                "precomputed": self.precomputed,
+                "trees": len(self.trees),
+                "hits": self.hits,
+                "misses": self.misses}
@@ -0,0 +1,200 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+
+
+class RouteCache:
+    """
+    Guarda o melhor posto já calculado para cada par (localização, alcance), descartando
+    apenas as respostas que uma atualização de posto pode ter mudado. Sem malha viária,
+    o alcance é a maior distância em linha reta percorrível; com malha, é o tempo
+    restante da bateria, e um posto é alcançável quando o tempo de viagem é menor que ele.
+    Cada resposta guarda os melhores postos alcançáveis e um limite inferior da fila dos
+    demais, então as reservas e as mudanças de fila apenas reordenam esses postos, e a
+    resposta só é descartada quando nenhum deles pode mais ser o melhor
+        Atributos:
+            max_size (int): quantidade máxima de respostas guardadas
+            max_queue (int): tamanho de fila a partir do qual o posto é descartado
+            keep (int): quantidade máxima de postos guardados em cada resposta
+            entries (OrderedDict): [melhores (fila, código) em ordem crescente, limite dos demais postos]
+                de cada (localização, alcance), em ordem de uso
+            reaches (dict): alcances guardados de cada localização de origem
+            origins (list): localizações de origem com respostas guardadas, em ordem crescente
+            max_reach (int): maior alcance já guardado
+            hits (int): consultas respondidas pelo cache
+            misses (int): consultas que precisaram ser calculadas
+            invalidations (int): respostas descartadas por atualizações de postos
+            updates (int): respostas ajustadas no lugar por atualizações de postos
+            evictions (int): respostas descartadas por falta de espaço
+            network (RoadNetwork): malha viária, ou None para distâncias em linha reta
+    """
+
+    def __init__(self, max_size=4096, max_queue=25, keep=8, network=None):
+        """
+        Método construtor da classe
+            Parâmetros:
+                max_size (int): quantidade máxima de respostas guardadas
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+                keep (int): quantidade máxima de postos guardados em cada resposta
+                network (RoadNetwork): malha viária, ou None para distâncias em linha reta
+        """
+        self.max_size = max_size
+        self.max_queue = max_queue
+        self.keep = keep
+        self.network = network
+        self.entries = OrderedDict()
+        self.reaches = {}
+        self.origins = []
+        self.max_reach = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.updates = 0
+        self.evictions = 0
+
+    def get(self, location, reach):
+        """
+        Busca a resposta guardada para uma consulta
+            Parâmetros:
+                location (int): localização do carro
+                reach (int): maior distância que o carro consegue percorrer
+            Retornos:
+                found (bool): indica se a consulta estava no cache
+                best (tuple): (fila, código) do melhor posto, ou None caso nenhum seja alcançável
+        """
+        key = (location, reach)
+        if key not in self.entries:
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        candidates = self.entries[key][0]
+        return True, candidates[0] if candidates else None
+
+    def put(self, location, reach, candidates, bound):
+        """
+        Guarda a resposta de uma consulta
+            Parâmetros:
+                location (int): localização do carro
+                reach (int): maior distância que o carro consegue percorrer
+                candidates (list): (fila, código) dos melhores postos alcançáveis, em ordem crescente
+                bound (tuple): menor (fila, código) possível entre os demais postos alcançáveis
+        """
+        key = (location, reach)
+        if key not in self.entries:
+            if location not in self.reaches:
+                self.reaches[location] = set()
+                insort(self.origins, location)
+            self.reaches[location].add(reach)
+            self.max_reach = max(self.max_reach, reach)
+        self.entries[key] = [list(candidates), bound]
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            old_key, _ = self.entries.popitem(last=False)
+            self.forget(old_key)
+            self.evictions += 1
+
+    def invalidate(self, location, queue, code):
+        """
+        Ajusta as respostas que alcançam um posto atualizado: a nova fila dele substitui a
+        anterior entre os melhores postos guardados, ou o inclui neles caso fique abaixo do
+        limite dos demais. Descarta apenas as respostas que ficam sem nenhum posto guardado
+        enquanto outro posto ainda pode ser alcançado
+            Parâmetros:
+                location (int): localização do posto
+                queue (int): nova fila do posto somada às reservas, ou None caso ele tenha saído da localização
+                code (str): código do posto
+        """
+        candidate = (queue, code) if queue is not None and queue < self.max_queue else None
+
+        stale = []
+        for origin, distance in self.nearbyOrigins(location):
+            if distance == 0:
+                continue
+            for reach in self.reaches[origin]:
+                if not self.reachable(distance, reach):
+                    continue
+                entry = self.entries[(origin, reach)]
+                if self.adjust(entry, candidate, code):
+                    self.updates += 1
+                if not entry[0] and entry[1][0] < self.max_queue:
+                    stale.append((origin, reach))
+
+        for key in stale:
+            del self.entries[key]
+            self.forget(key)
+        self.invalidations += len(stale)
+
+    def adjust(self, entry, candidate, code):
+        """
+        Aplica a nova fila de um posto a uma resposta guardada
+            Parâmetros:
+                entry (list): [melhores postos, limite dos demais] da resposta
+                candidate (tuple): novo (fila, código) do posto, ou None caso ele não seja mais uma opção
+                code (str): código do posto
+            Retornos:
+                changed (bool): indica se os melhores postos da resposta mudaram
+        """
+        candidates, bound = entry
+        for position, (queue, other) in enumerate(candidates):
+            if other == code:
+                del candidates[position]
+                break
+        else:
+            if candidate is None or not candidate < bound:
+                return False
+        # Um posto acima do limite passa a ser um dos demais, que o limite continua cobrindo
+        if candidate is not None and candidate < bound:
+            insort(candidates, candidate)
+            if len(candidates) > self.keep:
+                entry[1] = candidates.pop()
+        return True
+
+    def reachable(self, distance, reach):
+        if self.network is None:
+            return distance <= reach
+        return distance < reach
+
+    def nearbyOrigins(self, location):
+        """
+        Retorna as localizações de origem guardadas que podem alcançar um posto, com a
+        distância até ele. Com malha viária, percorre as localizações alcançáveis a partir
+        do posto ou as origens guardadas, o que for menor; as vias valem nos dois sentidos
+            Parâmetros:
+                location (int): localização do posto
+        """
+        if self.network is None:
+            start = bisect_left(self.origins, location - self.max_reach)
+            end = bisect_right(self.origins, location + self.max_reach)
+            return [(origin, abs(origin - location)) for origin in self.origins[start:end]]
+
+        nearby = self.network.within(location, self.max_reach)
+        if len(nearby) <= len(self.origins):
+            times = self.network.tree(location)[2]
+            return [(origin, times[origin]) for origin in nearby if origin in self.reaches]
+        return [(origin, self.network.distance(location, origin)) for origin in self.origins]
+
+    def forget(self, key):
+        """
+        Remove uma resposta descartada dos índices por localização
+            Parâmetros:
+                key (tuple): (localização, alcance) da resposta
+        """
+        location, reach = key
+        reaches = self.reaches[location]
+        reaches.discard(reach)
+        if not reaches:
+            del self.reaches[location]
+            del self.origins[bisect_left(self.origins, location)]
+
+    def stats(self):
+        """
+        Retorna os contadores do cache
+        """
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "updates": self.updates,
+            "evictions": self.evictions}
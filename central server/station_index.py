@@ -0,0 +1,291 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+
+EMPTY = (float("inf"), "")
+
+
+class StationIndex:
+    """
+    Índice dos postos de carregamento ordenado por localização, que guarda o menor
+    tamanho de fila de cada faixa de localizações em uma árvore de segmentos
+        Atributos:
+            locations (list): localizações conhecidas, em ordem crescente
+            positions (dict): posição de cada localização na lista ordenada
+            heaps (dict): heap com (fila, código) dos postos de cada localização
+            entries (dict): localização e fila atuais de cada posto, indexados pelo código
+            counts (dict): quantidade de postos em cada localização
+            size (int): quantidade de folhas da árvore de segmentos
+            tree (list): árvore de segmentos com o menor (fila, código) de cada faixa
+    """
+
+    def __init__(self):
+        """
+        Método construtor da classe
+        """
+        self.locations = []
+        self.positions = {}
+        self.heaps = {}
+        self.entries = {}
+        self.counts = {}
+        self.size = 1
+        self.tree = [EMPTY, EMPTY]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, code, location, queue):
+        """
+        Insere ou atualiza um posto no índice
+            Parâmetros:
+                code (str): código do posto
+                location (int): localização do posto
+                queue (int): tamanho da fila de carros do posto
+        """
+        old = self.entries.get(code)
+        self.entries[code] = (location, queue)
+        if not old or old[0] != location:
+            self.counts[location] = self.counts.get(location, 0) + 1
+            if old:
+                self.counts[old[0]] -= 1
+
+        if location not in self.positions:
+            insort(self.locations, location)
+            self.heaps[location] = []
+            heapq.heappush(self.heaps[location], (queue, code))
+            self.rebuild()
+        else:
+            heapq.heappush(self.heaps[location], (queue, code))
+            self.refresh(location)
+
+        if old and old[0] != location:
+            self.refresh(old[0])
+
+    def remove(self, code):
+        """
+        Remove um posto do índice
+            Parâmetros:
+                code (str): código do posto
+        """
+        old = self.entries.pop(code, None)
+        if old:
+            self.counts[old[0]] -= 1
+            self.refresh(old[0])
+
+    def best(self, location, reach, max_queue=25):
+        """
+        Retorna o posto com a menor fila em outra localização a até "reach" de distância
+            Parâmetros:
+                location (int): localização do carro
+                reach (int): maior distância que o carro consegue percorrer
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+            Retornos:
+                code (str): código do melhor posto, ou None caso nenhum seja alcançável
+        """
+        entry = self.bestEntry(location, reach, max_queue)
+        return entry[1] if entry else None
+
+    def bestEntry(self, location, reach, max_queue=25):
+        """
+        Retorna o (fila, código) do melhor posto em outra localização a até "reach" de distância
+            Parâmetros:
+                location (int): localização do carro
+                reach (int): maior distância que o carro consegue percorrer
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+        """
+        if reach < 1:
+            return None
+
+        left = self.query(
+            bisect_left(self.locations, location - reach),
+            bisect_left(self.locations, location))
+        right = self.query(
+            bisect_right(self.locations, location),
+            bisect_right(self.locations, location + reach))
+        entry = min(left, right)
+        if entry[0] < max_queue:
+            return entry
+        return None
+
+    def bestWithin(self, location, network, time_left, max_queue=25):
+        """
+        Retorna o (fila, código) do melhor posto em outra localização alcançável pela
+        malha viária em menos de "time_left"
+            Parâmetros:
+                location (int): localização do carro
+                network (RoadNetwork): malha viária
+                time_left (float): tempo restante da bateria do carro
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+        """
+        entry = EMPTY
+        for other in self.reachableLocations(location, network, time_left):
+            entry = min(entry, self.top(other))
+        if entry[0] < max_queue:
+            return entry
+        return None
+
+    def bestEntries(self, location, reach, count=8, max_queue=25):
+        """
+        Retorna os "count" melhores postos em outra localização a até "reach" de distância,
+        junto com um limite inferior da fila dos demais postos da faixa
+            Parâmetros:
+                location (int): localização do carro
+                reach (int): maior distância que o carro consegue percorrer
+                count (int): quantidade de postos retornados
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+            Retornos:
+                entries (list): (fila, código) dos melhores postos, em ordem crescente
+                bound (tuple): menor (fila, código) possível entre os postos não retornados
+        """
+        if reach < 1:
+            return [], EMPTY
+        nodes = self.nodes(bisect_left(self.locations, location - reach), bisect_left(self.locations, location))
+        nodes += self.nodes(bisect_right(self.locations, location), bisect_right(self.locations, location + reach))
+        return self.smallest(nodes, count, max_queue)
+
+    def bestEntriesWithin(self, location, network, time_left, count=8, max_queue=25):
+        """
+        Equivalente a bestEntries para as localizações alcançáveis pela malha viária
+            Parâmetros:
+                location (int): localização do carro
+                network (RoadNetwork): malha viária
+                time_left (float): tempo restante da bateria do carro
+                count (int): quantidade de postos retornados
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+        """
+        nodes = [self.size + self.positions[other] for other in self.reachableLocations(location, network, time_left)]
+        return self.smallest(nodes, count, max_queue)
+
+    def smallest(self, nodes, count, max_queue):
+        """
+        Percorre a árvore a partir de um conjunto de nós em ordem crescente de fila, como
+        uma busca pelo melhor primeiro: cada nó guarda o menor (fila, código) abaixo dele,
+        então só são abertos os nós que podem conter um dos "count" melhores postos
+            Parâmetros:
+                nodes (list): nós da árvore que cobrem as localizações consultadas
+                count (int): quantidade de postos retornados
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+        """
+        # Itens (valor, nó); nó None indica um posto, cujo valor é a própria entrada
+        pending = [(self.tree[node], node) for node in nodes if self.tree[node] != EMPTY]
+        heapq.heapify(pending)
+        entries = []
+        while pending and len(entries) < count and pending[0][0][0] < max_queue:
+            value, node = heapq.heappop(pending)
+            if node is None:
+                entries.append(value)
+            elif node < self.size:
+                for child in (2 * node, 2 * node + 1):
+                    if self.tree[child] != EMPTY:
+                        heapq.heappush(pending, (self.tree[child], child))
+            else:
+                location = self.locations[node - self.size]
+                for entry in set(self.heaps[location]):
+                    if self.entries.get(entry[1]) == (location, entry[0]):
+                        heapq.heappush(pending, (entry, None))
+        return entries, pending[0][0] if pending else EMPTY
+
+    def reachableLocations(self, location, network, time_left):
+        """
+        Retorna as outras localizações com postos alcançáveis pela malha viária em menos
+        de "time_left", percorrendo as localizações alcançáveis ou as localizações com
+        postos, o que for menor
+        """
+        reachable = network.within(location, time_left)
+        if len(reachable) > len(self.locations):
+            distances = network.tree(location)[2]
+            reachable = [other for other in self.locations if distances.get(other, time_left) < time_left]
+        return [other for other in reachable if other != location and other in self.heaps]
+
+    def top(self, location):
+        """
+        Retorna o (fila, código) do melhor posto de uma localização, descartando
+        entradas desatualizadas do heap
+            Parâmetros:
+                location (int): localização dos postos
+        """
+        heap = self.heaps[location]
+        while heap:
+            queue, code = heap[0]
+            if self.entries.get(code) == (location, queue):
+                return heap[0]
+            heapq.heappop(heap)
+        return EMPTY
+
+    def refresh(self, location):
+        """
+        Atualiza a folha de uma localização e os seus ancestrais na árvore
+            Parâmetros:
+                location (int): localização alterada
+        """
+        heap = self.heaps[location]
+        # Evita que entradas desatualizadas se acumulem no heap
+        if len(heap) > 64 + 2 * self.counts.get(location, 0):
+            self.heaps[location] = heap = [
+                (queue, code) for queue, code in set(heap)
+                if self.entries.get(code) == (location, queue)]
+            heapq.heapify(heap)
+
+        i = self.size + self.positions[location]
+        self.tree[i] = self.top(location)
+        i //= 2
+        while i:
+            self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def rebuild(self):
+        """
+        Reconstrói a árvore após o surgimento de uma nova localização
+        """
+        self.positions = {location: i for i, location in enumerate(self.locations)}
+        self.size = 1
+        while self.size < len(self.locations):
+            self.size *= 2
+
+        self.tree = [EMPTY] * (2 * self.size)
+        for location, i in self.positions.items():
+            self.tree[self.size + i] = self.top(location)
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def nodes(self, start, end):
+        """
+        Retorna os nós da árvore que cobrem as posições [start, end) da lista de localizações
+            Parâmetros:
+                start (int): primeira posição da faixa
+                end (int): posição seguinte à última da faixa
+        """
+        nodes = []
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                nodes.append(start)
+                start += 1
+            if end & 1:
+                end -= 1
+                nodes.append(end)
+            start //= 2
+            end //= 2
+        return nodes
+
+    def query(self, start, end):
+        """
+        Retorna o menor (fila, código) entre as posições [start, end) da lista de localizações
+            Parâmetros:
+                start (int): primeira posição da faixa
+                end (int): posição seguinte à última da faixa
+        """
+        result = EMPTY
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                result = min(result, self.tree[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                result = min(result, self.tree[end])
+            start //= 2
+            end //= 2
+        return result
@@ -0,0 +1,93 @@
+from time import monotonic
+
+
+class TimingWheel:
+    """
+    Prazos de expiração dos postos agrupados em intervalos de tempo fixos. Renovar o
+    prazo de um posto custa O(1), e a verificação percorre apenas os intervalos já
+    vencidos, sem examinar os postos que continuam ativos
+        Atributos:
+            ttl (float): tempo, em segundos, sem notícias após o qual um posto expira
+            resolution (float): duração, em segundos, de cada intervalo
+            buckets (dict): códigos dos postos que expiram em cada intervalo
+            deadlines (dict): intervalo de expiração de cada posto, indexado pelo código
+            current (int): último intervalo já verificado
+    """
+
+    def __init__(self, ttl, resolution=1.0, now=None):
+        """
+        Método construtor da classe
+            Parâmetros:
+                ttl (float): tempo, em segundos, sem notícias após o qual um posto expira
+                resolution (float): duração, em segundos, de cada intervalo
+                now (float): instante atual
+        """
+        now = monotonic() if now is None else now
+        self.ttl = ttl
+        self.resolution = resolution
+        self.buckets = {}
+        self.deadlines = {}
+        self.current = int(now // resolution)
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def touch(self, code, now=None):
+        """
+        Renova o prazo de um posto que deu notícias
+            Parâmetros:
+                code (str): código do posto
+                now (float): instante atual
+        """
+        now = monotonic() if now is None else now
+        tick = int((now + self.ttl) // self.resolution) + 1
+        old = self.deadlines.get(code)
+        if old == tick:
+            return
+        if old is not None:
+            self.forget(code, old)
+        self.deadlines[code] = tick
+        self.buckets.setdefault(tick, set()).add(code)
+
+    def discard(self, code):
+        """
+        Remove o prazo de um posto que deixou o registro
+            Parâmetros:
+                code (str): código do posto
+        """
+        tick = self.deadlines.pop(code, None)
+        if tick is not None:
+            self.forget(code, tick)
+
+    def forget(self, code, tick):
+        bucket = self.buckets[tick]
+        bucket.discard(code)
+        if not bucket:
+            del self.buckets[tick]
+
+    def expire(self, now=None):
+        """
+        Retorna os postos cujo prazo venceu, removendo-os da roda
+            Parâmetros:
+                now (float): instante atual
+            Retornos:
+                expired (list): códigos dos postos expirados
+        """
+        now = monotonic() if now is None else now
+        tick = int(now // self.resolution)
+        if tick <= self.current:
+            return []
+
+        # Após um longo intervalo sem verificações, percorre apenas os intervalos ocupados
+        if tick - self.current > len(self.buckets):
+            due = sorted(due for due in self.buckets if due <= tick)
+        else:
+            due = range(self.current + 1, tick + 1)
+        self.current = tick
+
+        expired = []
+        for due_tick in due:
+            for code in self.buckets.pop(due_tick, ()):
+                del self.deadlines[code]
+                expired.append(code)
+        return expired
@@ -1,9 +1,13 @@
 from paho.mqtt import client as mqtt_client
 from random import randint
-from time import sleep
+from time import sleep, time
 import threading
 import socket
 import json
+from publisher import Publisher
+from telemetry import TelemetryPolicy
+from http_parser import HttpParser
+from tracing import tracer
 
 
 class Car:
@@ -20,11 +24,15 @@ class Car:
             server_port (int): porta de conexão dos brokers dos servidores locais
             BATTERY_TOPIC (str): tópico MQTT para solicitar vaga em um posto
             PATH_TOPIC (str): tópico MQTT para enviar a localização atual do carro
+            REPLY_TOPIC (str): tópico MQTT exclusivo do carro, em que ele recebe o posto escolhido
             TEST_TOPIC (str):
             client_id (str): id do cliente
             tcp_host (str): endereço de acesso do sistema de informações do carro
             tcp_port (int): porta de acesso do socket TCP
             format (str): formato da codificação de caracteres
+            publisher (Publisher): fila de publicações MQTT, enviada fora das threads do carro
+            telemetry (TelemetryPolicy): decide quando a bateria baixa justifica um novo pedido de posto
+            trace (tuple): id de rastreamento e instante de envio do último pedido de posto ainda sem resposta
     """
 
     def __init__(self, location=randint(1, 2)):
@@ -35,6 +43,7 @@ class Car:
         self.mode = 2  # 1 = economico, 2 = regular, 3 = sport, 4 = recarregando
         self.location = location
         self.station = 0
+        self.best_station = None
         self.servers = {1: '172.16.103.1', 2: '172.16.103.3'}
         self.server_port = 1883
 
@@ -43,11 +52,16 @@ class Car:
         self.UPDATE_TOPIC = "REDESP2IG/station/traffic"
         self.TEST_TOPIC = "REDESP2IG/car/test"
         self.client_id = f'Carro {randint(0, 1000)}'
+        self.REPLY_TOPIC = f"{self.PATH_TOPIC}/{self.client_id}"
 
         self.tcp_host = socket.gethostbyname(socket.gethostname())
         self.tcp_port = 1159
 
         self.format = 'utf-8'
+        self.publisher = None
+        self.telemetry = TelemetryPolicy()
+        self.trace = None
+        tracer.component = "car"
 
     def manageBattery(self, client: mqtt_client):
         """
@@ -58,28 +72,78 @@ class Car:
         """
         while True:
             print("Bateria: " + str(self.battery))
-            if self.mode > 3:
-                self.battery = min(100, self.battery + 5)
-            else:
-                self.battery = max(0, self.battery - self.mode * 2)
-                if self.battery < 25:
-                    p_id = "{\"car\": \"" + self.client_id + "\", "
-                    p_location = "\"location\": \"" + str(self.location) + "\", "
-                    p_mode = "\"mode\": \"" + str(self.mode) + "\", "
-                    p_battery = "\"battery\": \"" + str(self.battery) + "\"}"
-                    publication = p_id + p_location + p_mode + p_battery
-                    print("==ENVIANDO MENSAGEM==")
-                    print(publication)
-                    self.publish(client, self.BATTERY_TOPIC, publication)
+            if not self.updateBattery():
+                self.telemetry.reset()
+            elif self.telemetry.shouldRequest(self.battery, self.mode, self.location):
+                publication = self.batteryMessage()
+                print("==ENVIANDO MENSAGEM==")
+                print(publication)
+                # Um nível de bateria ainda não enviado é substituído pelo mais recente
+                self.publish(client, self.BATTERY_TOPIC, publication, key="battery")
             sleep(2)
 
+    def updateBattery(self):
+        """
+        Avança um passo do modelo da bateria: carrega no posto ou descarrega de acordo
+        com o modo de autonomia
+
+            Retornos:
+                low (bool): indica se a bateria está baixa e o carro precisa de um posto
+        """
+        if self.mode > 3:
+            self.battery = min(100, self.battery + 5)
+            return False
+        self.battery = max(0, self.battery - self.mode * 2)
+        return self.battery < 25
+
+    def batteryMessage(self):
+        """
+        Monta o pedido de posto enviado quando a bateria está baixa, com um novo id de
+        rastreamento que acompanha o pedido até a resposta
+        """
+        trace = tracer.newTrace()
+        self.trace = (trace, time())
+        p_id = "{\"car\": \"" + self.client_id + "\", "
+        p_location = "\"location\": \"" + str(self.location) + "\", "
+        p_mode = "\"mode\": \"" + str(self.mode) + "\", "
+        p_battery = "\"battery\": \"" + str(self.battery) + "\", "
+        p_reply = "\"reply\": \"" + self.REPLY_TOPIC + "\", "
+        p_trace = "\"trace\": \"" + trace + "\"}"
+        return p_id + p_location + p_mode + p_battery + p_reply + p_trace
+
+    def traceAnswer(self, answer):
+        """
+        Registra o tempo total do pedido de posto, caso a resposta seja do último pedido enviado
+            Parâmetros:
+                answer (dict): resposta do servidor local
+        """
+        if self.trace and answer.get("trace") == self.trace[0]:
+            tracer.record(self.trace[0], "car.roundtrip", self.trace[1])
+            self.trace = None
+
     def setLocation(self, client, current_location, station=0):
         """
         Altera a localização atual do carro
             Parâmetros:
                 current_location (str): localização atual do carro
         """
+        publication = self.locationMessage(current_location, station)
+
+        print("==ENVIANDO MENSAGEM==")
+        print(publication)
+        self.publish(client, self.UPDATE_TOPIC, publication)
+
+    def locationMessage(self, current_location, station=0):
+        """
+        Altera a localização e o modo do carro ao entrar ou sair de um posto e monta a
+        mensagem que avisa o posto
 
+            Parâmetros:
+                current_location (str): localização atual do carro
+                station (int): código do posto em que o carro entrou, ou 0 ao sair
+        """
+        # Na saída, a mensagem indica o posto que o carro está deixando
+        left_station = self.station
         self.location = current_location
         self.station = station
         p_operation = "\"operation\": \"none\", "
@@ -94,14 +158,10 @@ class Car:
 
         p_id = "{\"car\": \"" + self.client_id + "\", "
         p_location = "\"location\": \"" + str(self.location) + "\", "
-        p_station = "\"station\": \"" + str(self.station) + "\", "
+        p_station = "\"station\": \"" + str(self.station or left_station) + "\", "
         p_battery = "\"battery\": \"" + str(self.battery) + "\"}"
 
-        publication = p_id + p_location + p_station + p_operation + p_battery
-
-        print("==ENVIANDO MENSAGEM==")
-        print(publication)
-        self.publish(client, self.UPDATE_TOPIC, publication)
+        return p_id + p_location + p_station + p_operation + p_battery
 
     def setMode(self, car_mode):
         """
@@ -123,7 +183,8 @@ class Car:
         """
         if rc == 0:
             print("Connected to MQTT Broker!")
-            client.subscribe(self.PATH_TOPIC)
+            # Recebe apenas as respostas endereçadas a este carro
+            client.subscribe(self.REPLY_TOPIC)
         else:
             print("Failed to connect, return code %d\n", rc)
             # Renova a assinatura caso a conexão tenha sido perdida
@@ -141,6 +202,7 @@ class Car:
         else:
             server_addr = self.servers.get(self.location)
         client.connect(server_addr, self.server_port)
+        self.publisher = Publisher(client)
         return client
 
     def on_message(self, client: mqtt_client, userdata, message):
@@ -153,33 +215,28 @@ class Car:
                 message (str): mensagem recebida
         """
         print(f"Mensagem `{message.payload.decode(self.format)}` recebido do tópico `{message.topic}`")
-        decoded = message.payload.decode(self.format)
-        match decoded:
-            case "REDESP2IG/car/path":
-                if decoded.get("car"):
-                    if decoded.get("car") == self.client_id:
-                        print("Mensagem é pra este carro.")
-                        self.best_station = int(decoded.get("code"))
-
-    def publish(self, client: mqtt_client, topic, message):
+        decoded = json.loads(message.payload.decode(self.format))
+        match message.topic:
+            case self.REPLY_TOPIC:
+                self.traceAnswer(decoded)
+                self.telemetry.answered(bool(decoded.get("code")))
+                if decoded.get("code"):
+                    self.best_station = decoded.get("code")
+
+    def publish(self, client: mqtt_client, topic, message, key=None):
         """
-        Publica mensagens nos tópicos do broker
+        Publica mensagens nos tópicos do broker, sem esperar pelo envio
 
             Parâmetros:
                 client (mqtt_client): cliente MQTT
                 topic (str): tópico do broker
                 message (str): mensagem a ser publicada
+                key (str): chave de substituição de mensagens ainda não enviadas
         """
-        while True:
-            result = client.publish(topic, message)
-            # result: [0, 1]
-            status = result[0]
-            if status == 0:
-                print(f"Enviando `{message}` para o tópico `{topic}`")
-                break
-            else:
-                sleep(1)
-                print(f"Falha ao enviar mensagem para o tópico {topic}")
+        if self.publisher.publish(topic, message, key):
+            print(f"Enviando `{message}` para o tópico `{topic}`")
+        else:
+            print(f"Fila de envio cheia, mensagem descartada para o tópico {topic}")
 
     def conexaoTCP(self, socket_tcp):
         """
@@ -207,82 +264,88 @@ class Car:
 
     def tratarRequests(self, client):
         """
-        Faz o tratamento dos "requests" dos clientes
+        Faz o tratamento dos "requests" dos clientes. A conexão é mantida aberta entre
+        as "requests" (keep-alive) e as respostas de "requests" enviadas em sequência
+        são devolvidas na mesma ordem
             Parâmetros:
                 client (socket): cliente conectado
         """
-        while True:
-            try:
-                message = client.recv(1024)
-                data = self.getMessageData(message.decode('utf-8'))
-                print("Mensagem recebida:", message)
-
-                if (data["method"] == "GET"):
-                    # Retorna o nível de bateria do carro
-                    if (data["url_content"] == "/nivel-bateria"):
-                        response = self.assembleResponse("200", "OK", json.dumps("Nível da bateria: " + self.battery + "%"))
-                        self.sendTCPMessage(client, response)
-                        print("Nível da bateria do carro: " + self.battery)
-
-                    # Retorna o modo de autonomia atual do carro
-                    elif (data["url_content"] == "/modo"):
-                        response = self.assembleResponse("200", "OK", json.dumps("Modo de autonomia: " + self.mode + "%"))
-                        self.sendTCPMessage(client, response)
-                        print("Modo de autonomia do carro: " + self.mode)
-
-                elif (data["method"] == "POST"):
-                    # Altera a localização atual do carro
-                    if (data["url_content"] == "/mudar-localizacao"):
-
-                        current_location = data["body_content"]["current_location"]
-                        current_station = data["body_content"]["current_station"]
-
-                        self.setLocation(client, current_location, current_station)
-                        print("Localização alterada para: " + self.location)
-
-                    # Altera o modo de autonomia do carro
-                    elif (data["url_content"] == "/alterar-modo-carro"):
-                        car_mode = data["body_content"]["car_mode"]
-                        self.setMode(car_mode)
-                        print("Modo alterado para: " + self.mode)
-
-                elif (data["method"] == "PUT"):
-                    pass
-
-            except:
-                break
-
-    def getMessageData(self, mensagem):
+        parser = HttpParser()
+        try:
+            while True:
+                message = client.recv(65536)
+                if not message:
+                    break
+                try:
+                    requests = parser.feed(message)
+                except ValueError as e:
+                    self.sendTCPMessage(client, self.assembleResponse("400", "Bad Request", json.dumps(str(e)), False))
+                    break
+
+                responses = []
+                keep_alive = True
+                for request in requests:
+                    print("Mensagem recebida:", request.method, request.url_content)
+                    keep_alive = request.keep_alive
+                    responses.append(self.handleRequest(request, keep_alive))
+                    if not keep_alive:
+                        break
+                # As respostas de "requests" recebidas juntas seguem em um único envio
+                if responses:
+                    self.sendTCPMessage(client, "".join(responses))
+                if not keep_alive:
+                    break
+        finally:
+            client.close()
+
+    def handleRequest(self, request, keep_alive=True):
         """
-        Obtém os dados de uma "request"
+        Executa uma "request" e monta a sua resposta
 
             Parâmetros:
-                mensagem (str): mensagem recebida de um cliente ("request")
+                request (HttpRequest): "request" recebida
+                keep_alive (bool): indica se a conexão continua aberta após a resposta
 
             Retornos:
-                um dicionário com o "method", o "url_content" e o "body_content" da "request"
+                response (str): resposta HTTP do servidor
         """
-        method = mensagem.split(" ")[0]
-        url_content = mensagem.split(" ")[1]
-
         try:
-            # Prepara as mensagens no padrão JSON
-            mensagem = mensagem.replace("{", "{dir")
-            mensagem = mensagem.replace("}", "esq}")
-            mensagem = mensagem.split("{")[1].split("}")[0]
-            mensagem = mensagem.replace("dir", "{")
-            mensagem = mensagem.replace("esq", "}")
-
-            body_content = json.loads(mensagem)
-
-        except:
-            body_content = "{}"
-
-        return {
-            "method": method,
-            "url_content": url_content,
-            "body_content": body_content
-        }
+            if request.method == "GET":
+                # Retorna o nível de bateria do carro
+                if request.url_content == "/nivel-bateria":
+                    print("Nível da bateria do carro: " + str(self.battery))
+                    return self.assembleResponse(
+                        "200", "OK", json.dumps("Nível da bateria: " + str(self.battery) + "%"), keep_alive)
+
+                # Retorna o modo de autonomia atual do carro
+                elif request.url_content == "/modo":
+                    print("Modo de autonomia do carro: " + str(self.mode))
+                    return self.assembleResponse(
+                        "200", "OK", json.dumps("Modo de autonomia: " + str(self.mode)), keep_alive)
+
+            elif request.method == "POST":
+                # Altera a localização atual do carro
+                if request.url_content == "/mudar-localizacao":
+                    body_content = request.json()
+                    current_location = int(body_content["current_location"])
+                    current_station = body_content.get("current_station", 0)
+                    self.setLocation(None, current_location, current_station)
+                    print("Localização alterada para: " + str(self.location))
+                    return self.assembleResponse(
+                        "200", "OK", json.dumps("Localização alterada para: " + str(self.location)), keep_alive)
+
+                # Altera o modo de autonomia do carro
+                elif request.url_content == "/alterar-modo-carro":
+                    car_mode = int(request.json()["car_mode"])
+                    self.setMode(car_mode)
+                    print("Modo alterado para: " + str(self.mode))
+                    return self.assembleResponse(
+                        "200", "OK", json.dumps("Modo alterado para: " + str(self.mode)), keep_alive)
+
+        except (KeyError, TypeError, ValueError):
+            return self.assembleResponse("400", "Bad Request", json.dumps("Corpo da request inválido"), keep_alive)
+
+        return self.assembleResponse("404", "Not Found", json.dumps("Rota não encontrada"), keep_alive)
 
     def sendTCPMessage(self, client, message):
         """
@@ -293,11 +356,11 @@ class Car:
                 client (socket): cliente conectado
         """
         try:
-            client.send(message.encode('utf-8'))
-        except:
+            client.sendall(message.encode('utf-8'))
+        except OSError:
             pass
 
-    def assembleResponse(self, status_code, status_message, body):
+    def assembleResponse(self, status_code, status_message, body, keep_alive=True):
         """
         Monta a "response" a ser enviada
 
@@ -305,25 +368,23 @@ class Car:
                 status_code (str): código de status da resposta HTTP do servidor
                 status_message (str): mensagem de status da resposta do servidor
                 body (str): corpo da mensagem de retorno
+                keep_alive (bool): indica se a conexão continua aberta após a resposta
 
             Retornos:
                 response (str): resposta HTTP do servidor
         """
-        http_version = "HTTP/1.1"
-        HOST = "127.0.0.1:50000"
-        user_agent = "server-conces-energia"
-        content_type = "text/html"
-        content_length = len(body)
-
-        response = "{0} {1} {2}\nHOST: {3}\nUser-Agent: {4}\nContent-Type: {5}\nContent-Length: {6}\n\n{7}".format(
-            http_version,
-            status_code,
-            status_message,
-            HOST,
-            user_agent,
-            content_type,
-            content_length,
-            body)
+        # O Content-Length conta bytes, não caracteres
+        content_length = len(body.encode('utf-8'))
+        connection = "keep-alive" if keep_alive else "close"
+
+        response = (
+            "HTTP/1.1 {0} {1}\r\n"
+            "Server: server-conces-energia\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            "Content-Length: {2}\r\n"
+            "Connection: {3}\r\n"
+            "\r\n"
+            "{4}").format(status_code, status_message, content_length, connection, body)
 
         return response
 
@@ -334,6 +395,7 @@ class Car:
         tcp_thread.start()
 
         client_mqtt = self.connect_mqtt()
+        self.publisher.start()
 
         # Thread para gerenciar a bateria do carro
         battery_thread = threading.Thread(target=self.manageBattery, args=[client_mqtt])
@@ -342,5 +404,7 @@ class Car:
         client_mqtt.loop_forever()
 
 
-carro_inst = Car()
-carro_inst.main()
+if __name__ == "__main__":
+    tracer.dumpOnSignal()
+    carro_inst = Car()
+    carro_inst.main()
@@ -0,0 +1,251 @@
+"""
+Simula uma frota de carros em um único processo: cada carro é uma tarefa asyncio
+com o mesmo modelo de bateria e as mesmas mensagens de entrada e saída dos postos
+da classe Car, e todos compartilham um pequeno conjunto de conexões com o broker
+
+    Uso:
+        python fleet_simulator.py --broker 172.16.103.3 --sizes 100 1000 5000 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+from time import monotonic
+
+from paho.mqtt import client as mqtt_client
+
+from car import Car
+from publisher import Publisher
+from telemetry import TelemetryPolicy
+
+
+class FleetSimulator:
+    """
+    Frota de carros simulados sobre um conjunto de conexões MQTT compartilhadas
+        Atributos:
+            broker_addr (str): endereço do broker
+            broker_port (int): porta de conexão do broker
+            size (int): quantidade de carros
+            connections (int): quantidade de conexões com o broker
+            tick (float): duração, em segundos, de um passo do modelo de bateria
+            regions (int): quantidade de localidades em que os carros começam
+            cars (dict): carros simulados, indexados pelo código
+            clients (list): conexões MQTT compartilhadas
+            publishers (list): fila de publicações de cada conexão
+            reply_prefix (str): prefixo dos tópicos de resposta dos carros
+            requested (dict): instante do primeiro pedido ainda não respondido de cada carro
+            latencies (list): tempo, em segundos, entre o pedido e a resposta de cada carro atendido
+            counters (dict): quantidade de mensagens de cada tipo
+            lock (threading.Lock): protege os contadores, alterados também pelas threads MQTT
+    """
+
+    def __init__(self, broker_addr, broker_port, size, connections=4, tick=2.0, regions=2, seed=1):
+        """
+        Método construtor da classe
+            Parâmetros:
+                broker_addr (str): endereço do broker
+                broker_port (int): porta de conexão do broker
+                size (int): quantidade de carros
+                connections (int): quantidade de conexões com o broker
+                tick (float): duração, em segundos, de um passo do modelo de bateria
+                regions (int): quantidade de localidades em que os carros começam
+                seed (int): semente do gerador aleatório
+        """
+        self.broker_addr = broker_addr
+        self.broker_port = broker_port
+        self.size = size
+        self.connections = max(1, connections)
+        self.tick = tick
+        self.regions = regions
+        self.random = random.Random(seed)
+        self.cars = {}
+        self.clients = []
+        self.publishers = []
+        self.requested = {}
+        self.reply_prefix = "REDESP2IG/car/path/"
+        self.latencies = []
+        self.counters = {"battery": 0, "traffic": 0, "replies": 0, "not_found": 0}
+        self.lock = threading.Lock()
+        self.loop = None
+
+    def createCars(self):
+        for i in range(self.size):
+            car = Car(self.random.randint(1, self.regions))
+            car.battery = self.random.randint(20, 100)
+            car.mode = self.random.randint(1, 3)
+            # O nível extra no código permite que cada conexão assine as respostas
+            # apenas dos seus carros
+            car.client_id = f"sim{i % self.connections}/{i}"
+            car.REPLY_TOPIC = f"{car.PATH_TOPIC}/{car.client_id}"
+            # Os intervalos da política seguem a duração do passo simulado (2 s no carro real)
+            scale = self.tick / 2
+            car.telemetry = TelemetryPolicy(min_interval=10 * scale, answer_timeout=15 * scale,
+                                            answer_hold=60 * scale)
+            self.cars[car.client_id] = car
+            self.reply_prefix = car.PATH_TOPIC + "/"
+
+    def connect(self):
+        """
+        Abre as conexões compartilhadas com o broker
+        """
+        for i in range(self.connections):
+            client = mqtt_client.Client()
+            reply_topic = f"{self.reply_prefix}sim{i}/#"
+            client.on_connect = lambda client, userdata, flags, rc, topic=reply_topic: client.subscribe(topic)
+            client.on_message = self.on_message
+            publisher = Publisher(client, max_queue=10 * self.size, window=100)
+            client.connect(self.broker_addr, self.broker_port)
+            client.loop_start()
+            publisher.start()
+            self.clients.append(client)
+            self.publishers.append(publisher)
+
+    def disconnect(self):
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+
+    def on_message(self, client: mqtt_client, userdata, message):
+        """
+        Repassa a resposta de um posto ao loop asyncio (callback das threads MQTT)
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+                userdata (): dados definidos pelo usuário
+                message (str): mensagem recebida
+        """
+        self.loop.call_soon_threadsafe(self.handleReply, message.topic, message.payload)
+
+    def handleReply(self, topic, payload):
+        """
+        Registra no carro o posto escolhido pelo servidor local
+            Parâmetros:
+                topic (str): tópico de resposta do carro
+                payload (bytes): resposta do servidor
+        """
+        car = self.cars.get(topic[len(self.reply_prefix):])
+        if car is None:
+            return
+        answer = json.loads(payload)
+        car.traceAnswer(answer)
+        car.telemetry.answered(bool(answer.get("code")))
+        with self.lock:
+            self.counters["replies"] += 1
+            requested = self.requested.pop(car.client_id, None)
+            if requested is not None:
+                self.latencies.append(monotonic() - requested)
+            if not answer.get("code"):
+                self.counters["not_found"] += 1
+                return
+        car.best_station = answer.get("code")
+        car.target_location = int(answer.get("location", car.location))
+
+    def send(self, car, topic, publication, kind, key=None):
+        index = int(car.client_id[3:car.client_id.index("/")])
+        self.publishers[index].publish(topic, publication, key)
+        with self.lock:
+            self.counters[kind] += 1
+
+    async def runCar(self, car):
+        """
+        Executa o ciclo de um carro: descarrega a bateria, pede um posto, viaja até ele,
+        carrega e sai do posto
+            Parâmetros:
+                car (Car): carro simulado
+        """
+        # Espalha os carros ao longo do primeiro passo para não enviarem juntos
+        await asyncio.sleep(self.random.random() * self.tick)
+        travel = 0
+        while True:
+            if car.mode > 3 and car.battery >= 100:
+                self.send(car, car.UPDATE_TOPIC, car.locationMessage(car.location, 0), "traffic")
+            elif car.best_station and car.mode <= 3:
+                # O carro leva um passo por unidade de distância até o posto escolhido
+                if travel == 0:
+                    travel = max(1, abs(car.target_location - car.location))
+                travel -= 1
+                if travel == 0:
+                    station, car.best_station = car.best_station, None
+                    self.send(car, car.UPDATE_TOPIC, car.locationMessage(car.target_location, station), "traffic")
+
+            if not car.updateBattery():
+                car.telemetry.reset()
+            elif not car.best_station and car.telemetry.shouldRequest(car.battery, car.mode, car.location):
+                with self.lock:
+                    self.requested.setdefault(car.client_id, monotonic())
+                self.send(car, car.BATTERY_TOPIC, car.batteryMessage(), "battery", key=car.client_id)
+            await asyncio.sleep(self.tick)
+
+    async def run(self, duration):
+        """
+        Executa a frota durante um intervalo de tempo
+            Parâmetros:
+                duration (float): duração da simulação, em segundos
+            Retornos:
+                report (dict): taxas de mensagens e latência das respostas
+        """
+        self.loop = asyncio.get_running_loop()
+        self.createCars()
+        self.connect()
+        tasks = [asyncio.create_task(self.runCar(car)) for car in self.cars.values()]
+        started = monotonic()
+        await asyncio.sleep(duration)
+        elapsed = monotonic() - started
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.disconnect()
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        """
+        Resume as mensagens trocadas durante a simulação
+            Parâmetros:
+                elapsed (float): duração da simulação, em segundos
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            counters = dict(self.counters)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+        publishers = [publisher.stats() for publisher in self.publishers]
+        return {
+            "cars": self.size,
+            "seconds": round(elapsed, 1),
+            "battery_per_s": round(counters["battery"] / elapsed, 1),
+            "traffic_per_s": round(counters["traffic"] / elapsed, 1),
+            "replies_per_s": round(counters["replies"] / elapsed, 1),
+            "not_found": counters["not_found"],
+            "published": sum(stats["published"] for stats in publishers),
+            "coalesced": sum(stats["coalesced"] for stats in publishers),
+            "dropped": sum(stats["dropped"] for stats in publishers),
+            "suppressed": sum(car.telemetry.suppressed for car in self.cars.values()),
+            "latency_p50_ms": percentile(0.50),
+            "latency_p95_ms": percentile(0.95),
+            "latency_p99_ms": percentile(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default="172.16.103.3")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--tick", type=float, default=2.0)
+    parser.add_argument("--regions", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        simulator = FleetSimulator(args.broker, args.port, size, args.connections, args.tick,
+                                   args.regions, args.seed)
+        print(json.dumps(asyncio.run(simulator.run(args.duration))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+
+
+class HttpRequest:
+    """
+    "Request" HTTP recebida pelo sistema de informações do carro
+        Atributos:
+            method (str): método da "request" (GET, POST, ...)
+            url_content (str): caminho requisitado
+            version (str): versão do protocolo HTTP
+            headers (dict): cabeçalhos, com os nomes em letras minúsculas
+            body (bytes): corpo da "request"
+    """
+
+    def __init__(self, method, url_content, version, headers, body):
+        self.method = method
+        self.url_content = url_content
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        """
+        Indica se a conexão continua aberta após a resposta: padrão no HTTP/1.1 e
+        opcional no HTTP/1.0
+        """
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        """
+        Retorna o corpo da "request" convertido de JSON, ou um dicionário vazio caso não haja corpo
+        """
+        if not self.body:
+            return {}
+        return json.loads(self.body.decode("utf-8"))
+
+
+class HttpParser:
+    """
+    Reconstrói as "requests" HTTP/1.1 recebidas por uma conexão TCP, independente de
+    como os bytes foram divididos entre as leituras do socket. Várias "requests"
+    enviadas em sequência na mesma conexão (pipelining) são retornadas em ordem
+        Atributos:
+            buffer (bytearray): bytes recebidos que ainda não formam uma "request" completa
+            max_header (int): tamanho máximo aceito para a linha inicial e os cabeçalhos
+            max_body (int): tamanho máximo aceito para o corpo
+            current (HttpRequest): "request" cujos cabeçalhos já chegaram e que aguarda o corpo
+            body_size (int): tamanho do corpo da "request" atual
+    """
+
+    def __init__(self, max_header=8192, max_body=1 << 20):
+        """
+        Método construtor da classe
+            Parâmetros:
+                max_header (int): tamanho máximo aceito para a linha inicial e os cabeçalhos
+                max_body (int): tamanho máximo aceito para o corpo
+        """
+        self.buffer = bytearray()
+        self.max_header = max_header
+        self.max_body = max_body
+        self.current = None
+        self.body_size = 0
+
+    def feed(self, data):
+        """
+        Adiciona bytes recebidos e retorna as "requests" que ficaram completas
+            Parâmetros:
+                data (bytes): bytes lidos do socket
+            Retornos:
+                requests (list): "requests" completas, na ordem de chegada
+        """
+        self.buffer += data
+        requests = []
+        while True:
+            if self.current is None and not self.parseHead():
+                return requests
+            if len(self.buffer) < self.body_size:
+                return requests
+            self.current.body = bytes(self.buffer[:self.body_size])
+            del self.buffer[:self.body_size]
+            requests.append(self.current)
+            self.current = None
+
+    def parseHead(self):
+        """
+        Lê a linha inicial e os cabeçalhos da próxima "request", caso já tenham chegado
+            Retornos:
+                parsed (bool): indica se os cabeçalhos foram lidos
+        """
+        # Linhas vazias entre "requests" são permitidas
+        while self.buffer.startswith(b"\r\n"):
+            del self.buffer[:2]
+        end = self.buffer.find(b"\r\n\r\n")
+        if end < 0:
+            if len(self.buffer) > self.max_header:
+                raise ValueError("Cabeçalho excede o tamanho máximo permitido")
+            return False
+
+        lines = bytes(self.buffer[:end]).decode("latin-1").split("\r\n")
+        del self.buffer[:end + 4]
+        try:
+            method, url_content, version = lines[0].split(" ")
+        except ValueError:
+            raise ValueError("Linha inicial inválida")
+        if not version.startswith("HTTP/1."):
+            raise ValueError("Versão do HTTP não suportada")
+
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(":")
+            if not separator:
+                raise ValueError("Cabeçalho inválido")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise ValueError("Transfer-Encoding não suportado")
+        try:
+            self.body_size = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ValueError("Content-Length inválido")
+        if self.body_size < 0 or self.body_size > self.max_body:
+            raise ValueError("Corpo excede o tamanho máximo permitido")
+
+        self.current = HttpRequest(method, url_content, version, headers, b"")
+        return True
@@ -0,0 +1,100 @@
+from time import monotonic
+
+
+class TelemetryPolicy:
+    """
+    Decide quando o carro com bateria baixa deve pedir um posto. Envia o primeiro
+    pedido, espera pela resposta, mantém o posto recebido por um tempo e só volta a
+    pedir quando algo relevante muda: a bateria cai mais uma faixa, o modo de
+    autonomia muda ou o carro muda de localização
+        Atributos:
+            step (int): queda da bateria, em pontos percentuais, que justifica um novo pedido
+            min_interval (float): intervalo mínimo, em segundos, entre dois pedidos
+            answer_timeout (float): tempo, em segundos, após o qual um pedido sem resposta pode ser repetido
+            answer_hold (float): tempo, em segundos, durante o qual o posto recebido é mantido sem novos pedidos
+            last (tuple): (bateria, modo, localização) do último pedido, ou None antes do primeiro
+            last_sent (float): instante do último pedido
+            pending (bool): indica se o último pedido ainda aguarda resposta
+            held_until (float): instante até o qual o posto recebido é mantido
+            sent (int): quantidade de pedidos enviados
+            suppressed (int): quantidade de pedidos evitados
+    """
+
+    def __init__(self, step=5, min_interval=10, answer_timeout=15, answer_hold=60):
+        """
+        Método construtor da classe
+            Parâmetros:
+                step (int): queda da bateria, em pontos percentuais, que justifica um novo pedido
+                min_interval (float): intervalo mínimo, em segundos, entre dois pedidos
+                answer_timeout (float): tempo, em segundos, após o qual um pedido sem resposta pode ser repetido
+                answer_hold (float): tempo, em segundos, durante o qual o posto recebido é mantido sem novos pedidos
+        """
+        self.step = step
+        self.min_interval = min_interval
+        self.answer_timeout = answer_timeout
+        self.answer_hold = answer_hold
+        self.last = None
+        self.last_sent = 0.0
+        self.pending = False
+        self.held_until = 0.0
+        self.sent = 0
+        self.suppressed = 0
+
+    def shouldRequest(self, battery, mode, location, now=None):
+        """
+        Indica se o carro com bateria baixa deve enviar um pedido agora, registrando o
+        envio em caso positivo
+            Parâmetros:
+                battery (int): nível da bateria
+                mode (int): modo de autonomia
+                location (int): localização atual
+                now (float): instante atual
+            Retornos:
+                send (bool): indica se o pedido deve ser enviado
+        """
+        now = monotonic() if now is None else now
+        if self.last is None:
+            return self.record(battery, mode, location, now)
+
+        elapsed = now - self.last_sent
+        if elapsed < self.min_interval or now < self.held_until:
+            self.suppressed += 1
+            return False
+        if self.pending and elapsed < self.answer_timeout:
+            self.suppressed += 1
+            return False
+
+        last_battery, last_mode, last_location = self.last
+        changed = mode != last_mode or location != last_location or battery <= last_battery - self.step
+        # Um pedido sem resposta (perdido) é repetido mesmo sem mudanças
+        if changed or self.pending:
+            return self.record(battery, mode, location, now)
+        self.suppressed += 1
+        return False
+
+    def record(self, battery, mode, location, now):
+        self.last = (battery, mode, location)
+        self.last_sent = now
+        self.pending = True
+        self.sent += 1
+        return True
+
+    def answered(self, found, now=None):
+        """
+        Registra a resposta do servidor local a um pedido
+            Parâmetros:
+                found (bool): indica se um posto foi encontrado
+                now (float): instante atual
+        """
+        now = monotonic() if now is None else now
+        self.pending = False
+        if found:
+            self.held_until = now + self.answer_hold
+
+    def reset(self):
+        """
+        Volta ao estado inicial quando a bateria deixa de estar baixa ou o carro chega a um posto
+        """
+        self.last = None
+        self.pending = False
+        self.held_until = 0.0
@@ -1,7 +1,10 @@
 from paho.mqtt import client as mqtt_client
 from random import randint
-from time import sleep
+from time import time
 import json
+import threading
+from publisher import Publisher
+from slot_scheduler import SlotScheduler
 
 
 class PowerStation:
@@ -16,6 +19,8 @@ class PowerStation:
             central_port (int): porta de conexão do servidor central
             REGISTER_TOPIC (str): tópico de registro da estação no servidor local
             UPDATE_TOPIC (str): tópico para atualização das filas dos postos
+            HEARTBEAT_TOPIC (str): tópico em que o posto indica periodicamente que continua ativo
+            OFFLINE_TOPIC (str): tópico em que o broker avisa a desconexão do posto (última mensagem)
             CAR_TOPIC (str):
             TEST_TOPIC (str):
             station_code (int): código do posto
@@ -23,28 +28,43 @@ class PowerStation:
             location (int): código da localização do posto
             limite_vagas (int): limite de vagas no posto
             vagas_disp (int): quantidade de vagas disponíveis no posto
+            scheduler (SlotScheduler): sessões de carregamento agendadas, usadas para prever a espera de um carro que chega
+            lock (threading.Lock): protege as vagas e a agenda, alteradas pela thread do MQTT e lidas pela thread de "heartbeat"
             format (str): formato da codificação de caracteres
+            publisher (Publisher): fila de publicações MQTT, enviada fora da thread do cliente MQTT
+            heartbeat_interval (float): intervalo, em segundos, entre os avisos de que o posto continua ativo
     """
 
-    def __init__(self, BROKER_ADDR='127.0.0.1', vagas_disp=10):
+    def __init__(self, BROKER_ADDR='127.0.0.1', vagas_disp=10, station_code=None, chargers=4):
         """
         Método construtor da classe
+            Parâmetros:
+                BROKER_ADDR (str): endereço do broker servidor local
+                vagas_disp (int): quantidade de vagas disponíveis no posto
+                station_code (int): código do posto; sorteado caso não seja informado
+                chargers (int): quantidade de carregadores que atendem carros ao mesmo tempo
         """
         self.BROKER_ADDR = BROKER_ADDR
         self.BROKER_PORT = 1883
 
         self.REGISTER_TOPIC = "REDESP2IG/station/register"
         self.UPDATE_TOPIC = "REDESP2IG/station/queue"
+        self.HEARTBEAT_TOPIC = "REDESP2IG/station/heartbeat"
+        self.OFFLINE_TOPIC = "REDESP2IG/station/offline"
         self.CAR_TOPIC = "REDESP2IG/station/traffic"
         self.TEST_TOPIC = "REDESP2IG/station/test"
 
-        self.station_code = randint(1, 100)
+        self.station_code = station_code if station_code is not None else randint(1, 100)
         self.client_id = f'Station {self.station_code}'
 
         self.limite_vagas = 25
         self.vagas_disp = vagas_disp
+        self.scheduler = SlotScheduler(chargers)
+        self.lock = threading.Lock()
 
         self.format = 'utf-8'
+        self.publisher = None
+        self.heartbeat_interval = 5
 
     def on_connect(self, client: mqtt_client, userdata, flags, rc):
         """
@@ -60,6 +80,9 @@ class PowerStation:
             print("Connected to MQTT Broker!")
             client.subscribe(self.CAR_TOPIC)
             client.subscribe(self.TEST_TOPIC)
+            # Registra o posto a cada (re)conexão, para que um servidor local
+            # reiniciado volte a conhecê-lo
+            self.register(client)
         else:
             print("Failed to connect, return code %d\n", rc)
 
@@ -70,6 +93,9 @@ class PowerStation:
         client = mqtt_client.Client()
         client.on_connect = self.on_connect
         client.on_message = self.on_message
+        self.publisher = Publisher(client)
+        # O broker publica esta mensagem caso a conexão com o posto caia sem aviso
+        client.will_set(self.OFFLINE_TOPIC, json.dumps({"code": str(self.station_code)}), qos=1)
         client.connect(self.BROKER_ADDR, self.BROKER_PORT)
         return client
 
@@ -113,7 +139,7 @@ class PowerStation:
         pub_code = "{\"code\": \"" + str(self.station_code) + "\", "
         pub_queue = "\"queue\": \"" + str(self.limite_vagas - self.vagas_disp) + "\"}"
         publication = pub_code + pub_queue
-        self.publish(client, self.REGISTER_TOPIC, publication)
+        self.publish(client, self.REGISTER_TOPIC, publication, key="register")
 
     def updateVagas(self, client: mqtt_client, payload):
         """
@@ -123,45 +149,79 @@ class PowerStation:
                 client (mtt_client): cliente MQTT
                 payload (str): conteúdo da mensagem
         """
-        if int(payload.get("station")) == self.station_code:
+        if int(payload.get("station")) == self.station_code and self.applyTraffic(payload):
+            self.publishVagas(client)
+
+    def applyTraffic(self, payload):
+        """
+        Aplica a entrada ou a saída de um carro às vagas do posto
+
+            Parâmetros:
+                payload (dict): conteúdo da mensagem
+            Retornos:
+                changed (bool): indica se a mensagem era uma entrada ou saída
+        """
+        with self.lock:
             if payload.get("operation") == "entrance":
                 self.vagas_disp = max(0, self.vagas_disp - 1)
-                self.publishVagas(client)
+                self.scheduler.start(payload.get("car"), int(payload.get("battery", 0)))
+                return True
             elif payload.get("operation") == "exit":
                 self.vagas_disp = min(self.limite_vagas, self.vagas_disp + 1)
-                self.publishVagas(client)
+                self.scheduler.finish(payload.get("car"))
+                return True
+            return False
+
+    def queueInfo(self):
+        """
+        Retorna o código, a fila e o instante (time()) em que um carro que chega agora
+        começa a carregar. O instante é absoluto para continuar válido depois de enviado
+        """
+        with self.lock:
+            return {
+                "station": str(self.station_code),
+                "queue": str(self.limite_vagas - self.vagas_disp),
+                "free at": str(round(time() + self.scheduler.eta(), 1))}
 
     def publishVagas(self, client: mqtt_client):
         """
-        Publica as vagas disponíveis no posto
+        Publica as vagas disponíveis no posto e o instante em que um carro que chega começa a carregar
 
             Parâmetros:
                 client (mqtt_client): cliente MQTT
         """
-        pub_code = "{\"station\": \"" + str(self.station_code) + "\","
-        pub_queue = "\"queue\": \"" + str(self.limite_vagas - self.vagas_disp) + "\"}"
-        publication = pub_code + pub_queue
-        self.publish(client, self.UPDATE_TOPIC, publication)
+        publication = json.dumps(self.queueInfo())
+        # Apenas a fila mais recente importa ao servidor local
+        self.publish(client, self.UPDATE_TOPIC, publication, key="queue")
 
-    def publish(self, client: mqtt_client, topic, message):
+    def heartbeatLoop(self, client: mqtt_client):
         """
-        Publica mensagens nos tópicos do broker
+        Avisa periodicamente o servidor local de que o posto continua ativo, junto com a
+        fila atual, para que o posto não seja removido do registro
+
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+        """
+        while True:
+            threading.Event().wait(self.heartbeat_interval)
+            info = self.queueInfo()
+            info["code"] = info.pop("station")
+            self.publish(client, self.HEARTBEAT_TOPIC, json.dumps(info), key="heartbeat")
+
+    def publish(self, client: mqtt_client, topic, message, key=None):
+        """
+        Publica mensagens nos tópicos do broker, sem esperar pelo envio
 
             Parâmetros:
                 client (mqtt_client): cliente MQTT
                 topic (str): tópico do broker
                 message (str): mensagem a ser publicada
+                key (str): chave de substituição de mensagens ainda não enviadas
         """
-        while True:
-            result = client.publish(topic, message)
-            # result: [0, 1]
-            status = result[0]
-            if status == 0:
-                print(f"Enviou `{message}` para o tópico `{topic}`")
-                break
-            else:
-                print(f"Falha ao enviar mensagem para o tópico {topic}")
-                sleep(1)
+        if self.publisher.publish(topic, message, key):
+            print(f"Enviou `{message}` para o tópico `{topic}`")
+        else:
+            print(f"Fila de envio cheia, mensagem descartada para o tópico {topic}")
 
     def messageTreatment(self, payload):
         if (payload == ""):
@@ -169,12 +229,17 @@ class PowerStation:
 
     def main(self):
         client = self.connect_mqtt()
-        self.register(client)
+        self.publisher.start()
+
+        heartbeat_thread = threading.Thread(target=self.heartbeatLoop, args=[client], daemon=True)
+        heartbeat_thread.start()
+
         client.loop_forever()
 
 
-addr = input("Insira o endereço do servidor: \n")
-v = input("Insira o número de vagas no posto: \n")
-v = int(v)
-post_inst = PowerStation(addr, v)
-post_inst.main()
+if __name__ == "__main__":
+    addr = input("Insira o endereço do servidor: \n")
+    v = input("Insira o número de vagas no posto: \n")
+    v = int(v)
+    post_inst = PowerStation(addr, v)
+    post_inst.main()
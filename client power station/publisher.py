@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+from itertools import count
+from time import monotonic
+
+
+class Publisher:
+    """
+    Fila de publicações MQTT enviada por uma thread própria, para que quem publica
+    (inclusive as callbacks do cliente MQTT) nunca espere pelo broker. Limita as
+    mensagens aguardando confirmação, tenta de novo com espera crescente em caso de
+    falha e substitui mensagens ainda não enviadas por versões mais recentes de mesma chave
+        Atributos:
+            client (mqtt_client): cliente MQTT usado nas publicações
+            max_queue (int): quantidade máxima de mensagens aguardando envio
+            window (int): quantidade máxima de mensagens enviadas sem confirmação do broker
+            qos (int): nível de QoS das publicações
+            ack_timeout (float): tempo, em segundos, após o qual uma mensagem sem confirmação deixa a janela
+            max_backoff (float): maior espera, em segundos, entre tentativas de envio
+            queue (OrderedDict): mensagens aguardando envio (chave -> (tópico, mensagem)), em ordem de chegada
+            inflight (dict): instante de envio das mensagens sem confirmação, indexadas pelo mid
+            early_acks (set): confirmações recebidas antes do registro da mensagem na janela
+            condition (threading.Condition): protege a fila e acorda a thread de envio
+            queued (int): mensagens aceitas na fila
+            published (int): mensagens entregues ao cliente MQTT
+            acked (int): mensagens confirmadas
+            dropped (int): mensagens descartadas por falta de espaço na fila
+            coalesced (int): mensagens substituídas por uma mais recente de mesma chave
+            retried (int): tentativas de envio que falharam
+            expired (int): mensagens que deixaram a janela sem confirmação
+    """
+
+    def __init__(self, client, max_queue=1000, window=20, qos=0, ack_timeout=10, max_backoff=5):
+        """
+        Método construtor da classe
+            Parâmetros:
+                client (mqtt_client): cliente MQTT usado nas publicações
+                max_queue (int): quantidade máxima de mensagens aguardando envio
+                window (int): quantidade máxima de mensagens enviadas sem confirmação do broker
+                qos (int): nível de QoS das publicações
+                ack_timeout (float): tempo, em segundos, após o qual uma mensagem sem confirmação deixa a janela
+                max_backoff (float): maior espera, em segundos, entre tentativas de envio
+        """
+        self.client = client
+        self.max_queue = max_queue
+        self.window = window
+        self.qos = qos
+        self.ack_timeout = ack_timeout
+        self.max_backoff = max_backoff
+        self.queue = OrderedDict()
+        self.inflight = {}
+        self.early_acks = set()
+        self.ids = count()
+        self.condition = threading.Condition()
+        self.queued = 0
+        self.published = 0
+        self.acked = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.expired = 0
+        client.on_publish = self.on_publish
+
+    def start(self):
+        thread = threading.Thread(target=self.publishLoop, daemon=True)
+        thread.start()
+
+    def publish(self, topic, message, key=None):
+        """
+        Agenda uma publicação sem bloquear
+            Parâmetros:
+                topic (str): tópico do broker
+                message (str): mensagem a ser publicada
+                key (str): chave de substituição; uma mensagem ainda não enviada com a mesma chave é trocada por esta
+            Retornos:
+                accepted (bool): indica se a mensagem entrou na fila
+        """
+        with self.condition:
+            if key is not None and (topic, key) in self.queue:
+                # Mantém a posição da mensagem antiga, mas com o conteúdo mais recente
+                self.queue[(topic, key)] = (topic, message)
+                self.coalesced += 1
+                return True
+            if len(self.queue) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self.queue[(topic, key) if key is not None else next(self.ids)] = (topic, message)
+            self.queued += 1
+            self.condition.notify()
+            return True
+
+    def publishLoop(self):
+        """
+        Envia as mensagens da fila respeitando a janela de mensagens sem confirmação
+        """
+        backoff = 0
+        while True:
+            with self.condition:
+                while not self.queue or len(self.inflight) >= self.window:
+                    self.expire()
+                    self.condition.wait(1)
+                key, (topic, message) = self.queue.popitem(last=False)
+
+            # O cliente MQTT é chamado fora da trava, pois a sua thread de rede
+            # chama on_publish com as travas internas do cliente adquiridas
+            result = self.client.publish(topic, message, qos=self.qos)
+
+            with self.condition:
+                if result[0] != 0:
+                    # Devolve a mensagem ao início da fila, a não ser que uma versão
+                    # mais recente já tenha chegado
+                    if key not in self.queue:
+                        self.queue[key] = (topic, message)
+                        self.queue.move_to_end(key, last=False)
+                    self.retried += 1
+                    backoff = min(self.max_backoff, backoff * 2 or 0.1)
+                else:
+                    backoff = 0
+                    self.published += 1
+                    mid = result[1]
+                    if mid in self.early_acks:
+                        self.early_acks.discard(mid)
+                        self.acked += 1
+                    else:
+                        self.inflight[mid] = monotonic()
+
+                if backoff:
+                    self.condition.wait(backoff)
+
+    def on_publish(self, client, userdata, mid, *args):
+        """
+        Confirma uma mensagem enviada (callback do cliente MQTT), liberando espaço na janela
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+                userdata (): dados definidos pelo usuário
+                mid (int): id da mensagem confirmada
+        """
+        with self.condition:
+            if self.inflight.pop(mid, None) is None:
+                # O cliente pode confirmar a mensagem antes de publish retornar
+                self.early_acks.add(mid)
+            else:
+                self.acked += 1
+            self.condition.notify()
+
+    def expire(self):
+        """
+        Retira da janela as mensagens que não foram confirmadas a tempo, como as
+        enviadas antes de uma queda da conexão
+        """
+        limit = monotonic() - self.ack_timeout
+        for mid in [mid for mid, sent in self.inflight.items() if sent < limit]:
+            del self.inflight[mid]
+            self.expired += 1
+        # Confirmações de mensagens expiradas nunca serão associadas
+        if len(self.early_acks) > self.window:
+            self.early_acks.clear()
+
+    def stats(self):
+        """
+        Retorna os contadores das publicações
+        """
+        with self.condition:
+            return {
+                "pending": len(self.queue),
+                "inflight": len(self.inflight),
+                "queued": self.queued,
+                "published": self.published,
+                "acked": self.acked,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "retried": self.retried,
+                "expired": self.expired}
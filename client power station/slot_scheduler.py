@@ -0,0 +1,138 @@
+import heapq
+from collections import deque
+from time import monotonic
+
+
+class SlotScheduler:
+    """
+    Agenda das sessões de carregamento de um posto. Cada carregador tem uma fila de
+    sessões com o início e o fim previstos, calculados pelo nível da bateria de cada
+    carro, e um heap guarda o instante em que cada carregador fica livre
+        Atributos:
+            charge_rate (float): pontos percentuais de bateria carregados por segundo
+            lanes (list): carros de cada carregador, na ordem das sessões
+            sessions (dict): [carregador, início, fim] da sessão de cada carro
+            free_at (list): instante em que cada carregador termina a última sessão agendada
+            heap (list): pares (free_at, carregador), com entradas desatualizadas descartadas na consulta
+    """
+
+    def __init__(self, chargers=4, charge_rate=2.5):
+        """
+        Método construtor da classe
+            Parâmetros:
+                chargers (int): quantidade de carregadores do posto
+                charge_rate (float): pontos percentuais de bateria carregados por segundo
+        """
+        self.charge_rate = charge_rate
+        self.lanes = [deque() for _ in range(max(1, chargers))]
+        self.sessions = {}
+        self.free_at = [0.0] * len(self.lanes)
+        self.heap = [(0.0, lane) for lane in range(len(self.lanes))]
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def duration(self, battery):
+        """
+        Retorna o tempo, em segundos, para carregar a bateria até 100%
+            Parâmetros:
+                battery (int): nível da bateria na chegada
+        """
+        return max(0, 100 - int(battery)) / self.charge_rate
+
+    def start(self, car, battery, now=None):
+        """
+        Agenda a sessão de um carro que chegou ao posto no carregador que fica livre primeiro
+            Parâmetros:
+                car (str): código do carro
+                battery (int): nível da bateria do carro
+                now (float): instante atual
+            Retornos:
+                start (float): instante previsto para o início do carregamento
+        """
+        now = monotonic() if now is None else now
+        if car in self.sessions:
+            self.finish(car, now)
+        lane = self.freeLane()
+        self.prune(lane, now)
+        start = max(now, self.free_at[lane])
+        end = start + self.duration(battery)
+        self.lanes[lane].append(car)
+        self.sessions[car] = [lane, start, end]
+        self.setFree(lane, end)
+        return start
+
+    def finish(self, car, now=None):
+        """
+        Encerra a sessão de um carro que saiu do posto, antecipando as sessões
+        seguintes do mesmo carregador
+            Parâmetros:
+                car (str): código do carro
+                now (float): instante atual
+            Retornos:
+                finished (bool): indica se o carro tinha uma sessão agendada
+        """
+        now = monotonic() if now is None else now
+        session = self.sessions.pop(car, None)
+        if session is None:
+            return False
+        lane, start, end = session
+        cars = self.lanes[lane]
+        position = cars.index(car)
+        del cars[position]
+
+        # As sessões seguintes começam quando a anterior termina, ou agora
+        previous_end = self.sessions[cars[position - 1]][2] if position else now
+        for following in list(cars)[position:]:
+            session = self.sessions[following]
+            length = session[2] - session[1]
+            session[1] = max(now, previous_end)
+            session[2] = session[1] + length
+            previous_end = session[2]
+        self.setFree(lane, self.sessions[cars[-1]][2] if cars else now)
+        return True
+
+    def earliestStart(self, arrival=None):
+        """
+        Retorna o instante mais cedo em que um carro chegando em "arrival" começa a carregar
+            Parâmetros:
+                arrival (float): instante de chegada do carro
+        """
+        arrival = monotonic() if arrival is None else arrival
+        return max(arrival, self.free_at[self.freeLane()])
+
+    def eta(self, now=None):
+        """
+        Retorna a espera prevista, em segundos, de um carro que chega agora
+            Parâmetros:
+                now (float): instante atual
+        """
+        now = monotonic() if now is None else now
+        return self.earliestStart(now) - now
+
+    def freeLane(self):
+        """
+        Retorna o carregador que fica livre primeiro, descartando as entradas desatualizadas do heap
+        """
+        while self.heap[0][0] != self.free_at[self.heap[0][1]]:
+            heapq.heappop(self.heap)
+        return self.heap[0][1]
+
+    def setFree(self, lane, free_at):
+        self.free_at[lane] = free_at
+        heapq.heappush(self.heap, (free_at, lane))
+        # Evita que entradas desatualizadas se acumulem no heap
+        if len(self.heap) > 4 * len(self.lanes):
+            self.heap = [(time, lane) for lane, time in enumerate(self.free_at)]
+            heapq.heapify(self.heap)
+
+    def prune(self, lane, now):
+        """
+        Remove as sessões já encerradas pelo tempo de um carregador cujos carros não avisaram a saída
+            Parâmetros:
+                lane (int): carregador
+                now (float): instante atual
+        """
+        cars = self.lanes[lane]
+        while cars and self.sessions[cars[0]][2] <= now:
+            del self.sessions[cars.popleft()]
@@ -0,0 +1,184 @@
+"""
+Hospeda vários postos de carregamento em um único processo, com uma única conexão
+MQTT para todos eles
+
+    Uso:
+        python station_host.py --broker 172.16.103.3 --stations 200 --vagas 10
+"""
+import argparse
+import json
+import threading
+
+from paho.mqtt import client as mqtt_client
+
+from power_station import PowerStation
+from publisher import Publisher
+
+
+class StationHost:
+    """
+    Conjunto de postos de um mesmo operador que compartilham a conexão MQTT. As
+    mensagens de entrada e saída dos carros são lidas uma única vez e entregues ao
+    posto pelo seu código, e os registros e as filas são publicados em lotes
+        Atributos:
+            broker_addr (str): endereço do broker servidor local
+            broker_port (int): porta de conexão do broker do servidor local
+            REGISTER_TOPIC (str): tópico de registro dos postos no servidor local
+            UPDATE_TOPIC (str): tópico para atualização das filas dos postos
+            HEARTBEAT_TOPIC (str): tópico em que os postos indicam periodicamente que continuam ativos
+            OFFLINE_TOPIC (str): tópico em que o broker avisa a desconexão de todos os postos hospedados
+            CAR_TOPIC (str): tópico de entrada e saída dos carros nos postos
+            stations (dict): postos hospedados, indexados pelo código
+            dirty (set): códigos dos postos cuja fila mudou desde a última publicação
+            batch_size (int): quantidade máxima de postos em cada mensagem
+            flush_interval (float): intervalo, em segundos, entre as publicações das filas
+            heartbeat_interval (float): intervalo, em segundos, entre os avisos de que os postos continuam ativos
+            lock (threading.Lock): protege os postos e as filas pendentes
+            publisher (Publisher): fila de publicações MQTT
+            format (str): formato da codificação de caracteres
+    """
+
+    def __init__(self, broker_addr, stations, batch_size=200, flush_interval=0.2, broker_port=1883):
+        """
+        Método construtor da classe
+            Parâmetros:
+                broker_addr (str): endereço do broker servidor local
+                stations (list): postos hospedados (PowerStation)
+                batch_size (int): quantidade máxima de postos em cada mensagem
+                flush_interval (float): intervalo, em segundos, entre as publicações das filas
+                broker_port (int): porta de conexão do broker do servidor local
+        """
+        self.broker_addr = broker_addr
+        self.broker_port = broker_port
+
+        self.REGISTER_TOPIC = "REDESP2IG/station/register"
+        self.UPDATE_TOPIC = "REDESP2IG/station/queue"
+        self.HEARTBEAT_TOPIC = "REDESP2IG/station/heartbeat"
+        self.OFFLINE_TOPIC = "REDESP2IG/station/offline"
+        self.CAR_TOPIC = "REDESP2IG/station/traffic"
+
+        self.stations = {str(station.station_code): station for station in stations}
+        self.dirty = set()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.heartbeat_interval = 5
+        self.lock = threading.Lock()
+        self.publisher = None
+
+        self.format = 'utf-8'
+
+    def on_connect(self, client: mqtt_client, userdata, flags, rc):
+        """
+        Retorna o status da conexão (callback) de acordo com a resposta do servidor
+
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+                userdata: dados do usuário
+                flags: flags de resposta enviadas pelo broker
+                rc (int): determina se o cliente está conectado com sucesso
+        """
+        if rc == 0:
+            print(f"Connected to MQTT Broker! {len(self.stations)} postos hospedados")
+            client.subscribe(self.CAR_TOPIC)
+            # Registra os postos a cada (re)conexão, para que um servidor local
+            # reiniciado volte a conhecê-los
+            self.register()
+        else:
+            print("Failed to connect, return code %d\n", rc)
+
+    def on_message(self, client: mqtt_client, userdata, message):
+        """
+        Entrega a entrada ou a saída de um carro ao posto correspondente
+
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+                userdata: dados do usuário
+                message (str): mensagem recebida
+        """
+        try:
+            payload = json.loads(message.payload.decode(self.format))
+        except ValueError:
+            return
+        code = str(payload.get("station"))
+        with self.lock:
+            station = self.stations.get(code)
+            if station is not None and station.applyTraffic(payload):
+                self.dirty.add(code)
+
+    def register(self):
+        """
+        Registra todos os postos no servidor local, em lotes de até batch_size postos
+        """
+        with self.lock:
+            stations = [
+                {"code": code, "queue": str(station.limite_vagas - station.vagas_disp)}
+                for code, station in self.stations.items()]
+        for start in range(0, len(stations), self.batch_size):
+            batch = stations[start:start + self.batch_size]
+            self.publisher.publish(self.REGISTER_TOPIC, json.dumps({"stations": batch}), key=start)
+
+    def flushLoop(self):
+        """
+        Publica periodicamente, em lotes, as filas dos postos que mudaram
+        """
+        while True:
+            threading.Event().wait(self.flush_interval)
+            with self.lock:
+                dirty, self.dirty = self.dirty, set()
+                updates = [self.stations[code].queueInfo() for code in dirty]
+            for start in range(0, len(updates), self.batch_size):
+                batch = updates[start:start + self.batch_size]
+                self.publisher.publish(self.UPDATE_TOPIC, json.dumps({"stations": batch}))
+
+    def heartbeatLoop(self):
+        """
+        Avisa periodicamente, em lotes, que todos os postos hospedados continuam ativos
+        """
+        while True:
+            threading.Event().wait(self.heartbeat_interval)
+            with self.lock:
+                beats = []
+                for station in self.stations.values():
+                    info = station.queueInfo()
+                    info["code"] = info.pop("station")
+                    beats.append(info)
+            for start in range(0, len(beats), self.batch_size):
+                batch = beats[start:start + self.batch_size]
+                self.publisher.publish(self.HEARTBEAT_TOPIC, json.dumps({"stations": batch}), key=start)
+
+    def main(self):
+        client = mqtt_client.Client()
+        client.on_connect = self.on_connect
+        client.on_message = self.on_message
+        self.publisher = Publisher(client)
+        # Uma única última mensagem avisa a desconexão de todos os postos do processo
+        offline = [{"code": code} for code in self.stations]
+        client.will_set(self.OFFLINE_TOPIC, json.dumps({"stations": offline}), qos=1)
+        client.connect(self.broker_addr, self.broker_port)
+        self.publisher.start()
+
+        flush_thread = threading.Thread(target=self.flushLoop, daemon=True)
+        flush_thread.start()
+
+        heartbeat_thread = threading.Thread(target=self.heartbeatLoop, daemon=True)
+        heartbeat_thread.start()
+
+        client.loop_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default="127.0.0.1")
+    parser.add_argument("--stations", type=int, default=100)
+    parser.add_argument("--vagas", type=int, default=10)
+    parser.add_argument("--first-code", type=int, default=1)
+    args = parser.parse_args()
+
+    stations = [
+        PowerStation(args.broker, args.vagas, code)
+        for code in range(args.first_code, args.first_code + args.stations)]
+    StationHost(args.broker, stations).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import logging
+import socket
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import count
+from time import sleep
+
+from protocol import ProtocolSession
+
+log = logging.getLogger(__name__)
+
+
+class CloudConnection:
+    """
+    Conexão TCP com o servidor central que permite várias requisições em andamento,
+    identificadas por um id e associadas às respostas por uma thread de leitura. Após
+    uma queda, as requisições pendentes falham na hora e a conexão é refeita em segundo
+    plano, com espera crescente entre as tentativas
+        Atributos:
+            host (str): endereço do servidor central
+            port (int): porta do servidor central
+            format (str): formato da codificação de caracteres
+            socket (socket): socket TCP da conexão
+            session (ProtocolSession): protocolo negociado com o servidor central (JSON ou binário)
+            pending (OrderedDict): requisições aguardando resposta (id -> Future), em ordem de envio
+            ids (itertools.count): gerador dos ids das requisições
+            lock (threading.Lock): protege o dicionário de requisições pendentes
+            send_lock (threading.Lock): impede que duas threads escrevam no socket ao mesmo tempo
+            connected (bool): indica se a conexão está ativa
+            on_push (function): recebe as mensagens enviadas pelo servidor central sem requisição (retrato e alterações dos postos)
+            on_connect (function): chamada com a conexão sempre que ela é refeita
+            min_backoff (float): espera, em segundos, antes da primeira tentativa de reconexão
+            max_backoff (float): maior espera, em segundos, entre as tentativas de reconexão
+            reconnects (int): quantidade de vezes que a conexão foi refeita
+    """
+
+    def __init__(self, host, port, format='utf-8'):
+        """
+        Método construtor da classe
+            Parâmetros:
+                host (str): endereço do servidor central
+                port (int): porta do servidor central
+                format (str): formato da codificação de caracteres
+        """
+        self.host = host
+        self.port = port
+        self.format = format
+        self.socket = None
+        self.session = ProtocolSession(format)
+        self.pending = OrderedDict()
+        self.ids = count(1)
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.connected = False
+        self.on_push = None
+        self.on_connect = None
+        self.min_backoff = 0.5
+        self.max_backoff = 10
+        self.reconnects = 0
+
+    def connect(self, timeout=2):
+        """
+        Conecta ao servidor central, negocia o protocolo e inicia a thread de leitura
+            Parâmetros:
+                timeout (float): tempo máximo, em segundos, de espera pela conexão e pela negociação
+        """
+        # Cada conexão negocia o protocolo do zero, sem restos da conexão anterior
+        self.session = ProtocolSession(self.format)
+        self.socket = socket.create_connection((self.host, self.port), timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Detecta conexões mortas sem FIN, como as de um servidor central desligado da rede
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        early = self.negotiateProtocol(timeout)
+        self.connected = True
+
+        reader = threading.Thread(target=self.readLoop, args=[early], daemon=True)
+        reader.start()
+
+    def negotiateProtocol(self, timeout):
+        """
+        Negocia com o servidor central o protocolo da conexão TCP. Um servidor central
+        que não conhece a negociação não responde, e a conexão continua em JSON
+            Parâmetros:
+                timeout (float): tempo máximo, em segundos, de espera pela resposta
+            Retornos:
+                early (list): mensagens recebidas junto com a resposta da negociação
+        """
+        self.socket.sendall(self.session.hello())
+        self.socket.settimeout(timeout)
+        early = []
+        try:
+            reply = None
+            while reply is None:
+                data = self.socket.recv(65536)
+                if not data:
+                    break
+                # Lê apenas a resposta, pois os bytes seguintes a ela já estão na nova codificação
+                self.session.codec.buffer += data
+                reply = self.session.codec.next()
+            if reply is not None and not self.session.accept(reply):
+                early.append(reply)
+        except socket.timeout:
+            pass
+        finally:
+            self.socket.settimeout(None)
+        log.info("Protocolo com o servidor central: %s", self.session.protocol)
+        return early
+
+    def request(self, message):
+        """
+        Envia uma requisição sem esperar pela resposta
+            Parâmetros:
+                message (dict): mensagem a ser enviada para o servidor central
+            Retornos:
+                future (Future): recebe a resposta do servidor central
+        """
+        future = Future()
+        # A escrita usa uma trava própria para que a thread de leitura nunca espere
+        # por um envio bloqueado
+        with self.send_lock:
+            with self.lock:
+                if not self.connected:
+                    future.set_exception(ConnectionError("Sem conexão com o servidor central"))
+                    return future
+                request_id = next(self.ids) & 0xFFFFFFFF or next(self.ids)
+                self.pending[request_id] = future
+            # Uma requisição cancelada, como a que excedeu o prazo em call(), deixa de aguardar resposta
+            future.add_done_callback(lambda future: self.forget(request_id, future))
+            connection = self.socket
+            try:
+                connection.sendall(self.session.encode(dict(message, id=request_id)))
+            except OSError as e:
+                with self.lock:
+                    self.pending.pop(request_id, None)
+                future.set_exception(e)
+                # Acorda a thread de leitura, que encerra a conexão e a refaz
+                shutdown(connection)
+        return future
+
+    def forget(self, request_id, future):
+        with self.lock:
+            if self.pending.get(request_id) is future:
+                del self.pending[request_id]
+
+    def readLoop(self, early):
+        """
+        Lê as respostas do servidor central e entrega cada uma à requisição de mesmo id
+            Parâmetros:
+                early (list): mensagens recebidas durante a negociação do protocolo
+        """
+        try:
+            for message in early + list(self.session.codec):
+                self.deliver(message)
+            while True:
+                data = self.socket.recv(65536)
+                if not data:
+                    break
+                for message in self.session.codec.feed(data):
+                    self.deliver(message)
+        except (OSError, ValueError) as e:
+            log.warning("Falha na conexão com o servidor central: %s", e)
+        finally:
+            self.close()
+        log.warning("Conexão com o servidor central perdida, reconectando")
+        self.reconnect()
+
+    def reconnect(self):
+        """
+        Refaz a conexão após uma queda, dobrando a espera entre as tentativas até
+        max_backoff, e avisa on_connect quando ela volta
+        """
+        delay = self.min_backoff
+        while True:
+            sleep(delay)
+            try:
+                self.connect()
+            except OSError as e:
+                delay = min(2 * delay, self.max_backoff)
+                log.warning("Servidor central indisponível (%s), nova tentativa em %.1f s", e, delay)
+                continue
+            self.reconnects += 1
+            log.info("Conexão com o servidor central refeita")
+            if self.on_connect:
+                self.on_connect(self)
+            return
+
+    def deliver(self, message):
+        """
+        Entrega uma mensagem recebida à requisição correspondente. on_push e os callbacks
+        dos Futures rodam na thread de leitura e não devem enviar mensagens, pois um envio
+        bloqueado deixaria de ler as respostas
+            Parâmetros:
+                message (dict): mensagem recebida do servidor central
+        """
+        request_id = message.pop("id", None)
+        if request_id is None and self.on_push and ("snapshot" in message or "delta" in message):
+            self.on_push(message)
+            return
+        with self.lock:
+            if request_id is not None:
+                future = self.pending.pop(request_id, None)
+            elif self.pending:
+                # Um servidor central antigo não devolve o id, mas responde em ordem
+                future = self.pending.popitem(last=False)[1]
+            else:
+                future = None
+
+        # A requisição pode ter sido cancelada por ter excedido o tempo de espera
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    def close(self):
+        """
+        Encerra a conexão, falhando as requisições que aguardavam resposta
+        """
+        with self.lock:
+            self.connected = False
+            pending, self.pending = self.pending, OrderedDict()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Conexão com o servidor central encerrada"))
+        if self.socket:
+            shutdown(self.socket)
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+
+
+def shutdown(connection):
+    try:
+        connection.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class CloudClient:
+    """
+    Cliente do servidor central com um pequeno pool de conexões multiplexadas
+        Atributos:
+            connections (list): conexões com o servidor central
+            next_connection (itertools.count): escolhe as conexões em rodízio
+            timeout (float): tempo máximo, em segundos, de espera por uma resposta
+            subscription (tuple): tratador e pedido da inscrição, refeita a cada reconexão
+    """
+
+    def __init__(self, host, port, format='utf-8', pool_size=1, timeout=10):
+        """
+        Método construtor da classe
+            Parâmetros:
+                host (str): endereço do servidor central
+                port (int): porta do servidor central
+                format (str): formato da codificação de caracteres
+                pool_size (int): quantidade de conexões com o servidor central
+                timeout (float): tempo máximo, em segundos, de espera por uma resposta
+        """
+        self.connections = [CloudConnection(host, port, format) for _ in range(max(1, pool_size))]
+        self.next_connection = count()
+        self.timeout = timeout
+        self.subscription = None
+        for connection in self.connections:
+            connection.on_connect = self.resubscribe
+
+    @property
+    def protocol(self):
+        return self.connections[0].session.protocol
+
+    def connect(self):
+        """
+        Conecta o pool ao servidor central. As conexões que falham continuam sendo
+        tentadas em segundo plano, então o servidor local inicia mesmo sem o servidor central
+        """
+        for connection in self.connections:
+            try:
+                connection.connect()
+            except OSError as e:
+                log.warning("Falha ao conectar ao servidor central: %s", e)
+                threading.Thread(target=connection.reconnect, daemon=True).start()
+
+    def request(self, message):
+        """
+        Envia uma requisição pela próxima conexão ativa do pool, sem esperar pela resposta
+            Parâmetros:
+                message (dict): mensagem a ser enviada para o servidor central
+            Retornos:
+                future (Future): recebe a resposta do servidor central
+        """
+        for _ in range(len(self.connections)):
+            connection = self.connections[next(self.next_connection) % len(self.connections)]
+            if connection.connected:
+                return connection.request(message)
+        return self.connections[0].request(message)
+
+    def subscribe(self, handler, message):
+        """
+        Envia um pedido de inscrição cujas mensagens seguintes chegam sem requisição.
+        A inscrição usa sempre a mesma conexão, para que as mensagens cheguem em ordem
+            Parâmetros:
+                handler (function): recebe as mensagens enviadas pelo servidor central
+                message (dict): pedido de inscrição
+            Retornos:
+                future (Future): recebe a confirmação do servidor central
+        """
+        self.subscription = (handler, message)
+        connection = self.connections[0]
+        connection.on_push = handler
+        return connection.request(message)
+
+    def resubscribe(self, connection):
+        """
+        Refaz a inscrição na conexão que a carrega, após uma reconexão. O servidor central
+        responde com um novo retrato, que substitui a cópia dos postos
+            Parâmetros:
+                connection (CloudConnection): conexão refeita
+        """
+        if connection is not self.connections[0] or self.subscription is None:
+            return
+        future = connection.request(self.subscription[1])
+        future.add_done_callback(self.checkSubscription)
+
+    def checkSubscription(self, future):
+        if future.exception() is not None:
+            log.warning("Falha ao refazer a inscrição no servidor central: %s", future.exception())
+
+    def call(self, message):
+        """
+        Envia uma requisição e espera pela resposta
+            Parâmetros:
+                message (dict): mensagem a ser enviada para o servidor central
+            Retornos:
+                response (dict): resposta do servidor central, ou None em caso de falha
+        """
+        future = self.request(message)
+        try:
+            return future.result(self.timeout)
+        except Exception as e:
+            future.cancel()
+            log.warning("Sem resposta do servidor central: %s", e)
+            return None
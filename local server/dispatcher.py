@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+from time import perf_counter
+from zlib import crc32
+
+log = logging.getLogger(__name__)
+
+
+class KeyedDispatcher:
+    """
+    Distribui o tratamento das mensagens entre threads de trabalho. Mensagens com a
+    mesma chave (código do posto ou do carro) vão sempre para a mesma thread, o que
+    preserva a ordem entre elas
+        Atributos:
+            queues (list): fila limitada de tarefas de cada thread
+            workers (list): threads de trabalho
+            handled (dict): quantidade de tarefas tratadas por tipo de mensagem
+            failed (dict): quantidade de tarefas que terminaram em erro por tipo de mensagem
+            dropped (dict): quantidade de tarefas descartadas com a fila cheia por tipo de mensagem
+            latency (dict): tempo total e maior tempo de tratamento por tipo de mensagem
+            lock (threading.Lock): protege os contadores
+            registry (MetricsRegistry): registro de métricas que também recebe as latências, caso informado
+    """
+
+    def __init__(self, workers=4, max_queue=1000, registry=None):
+        """
+        Método construtor da classe
+            Parâmetros:
+                workers (int): quantidade de threads de trabalho
+                max_queue (int): quantidade máxima de tarefas aguardando em cada thread
+                registry (MetricsRegistry): registro de métricas que também recebe as latências
+        """
+        self.queues = [queue.Queue(max_queue) for _ in range(max(1, workers))]
+        self.workers = []
+        self.handled = {}
+        self.failed = {}
+        self.dropped = {}
+        self.latency = {}
+        self.lock = threading.Lock()
+        self.registry = registry
+
+    def start(self):
+        for tasks in self.queues:
+            worker = threading.Thread(target=self.work, args=[tasks], daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, key, kind, function, *args):
+        """
+        Agenda uma tarefa na thread responsável pela chave sem bloquear: quem submete é a
+        thread de rede do cliente MQTT, que não pode parar. Com a fila cheia, a tarefa é
+        descartada e contada; o próximo "heartbeat" do posto corrige a fila ou o registro perdido,
+        e o carro sem resposta repete o pedido enquanto a bateria estiver baixa
+            Parâmetros:
+                key (str): chave que define a thread e a ordem da tarefa
+                kind (str): tipo da mensagem, usado nas métricas
+                function (function): tratamento a ser executado
+                args: parâmetros do tratamento
+            Retornos:
+                queued (bool): indica se a tarefa foi agendada
+        """
+        index = crc32(str(key).encode()) % len(self.queues)
+        try:
+            self.queues[index].put_nowait((kind, function, args, perf_counter()))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped[kind] = self.dropped.get(kind, 0) + 1
+            if self.registry is not None:
+                self.registry.increment("messages_dropped_total", kind=kind)
+            log.debug("Fila da thread %d cheia, mensagem do tipo %s descartada", index, kind)
+            return False
+
+    def work(self, tasks):
+        """
+        Executa em ordem as tarefas da fila de uma thread
+            Parâmetros:
+                tasks (queue.Queue): fila de tarefas da thread
+        """
+        while True:
+            kind, function, args, queued_at = tasks.get()
+            try:
+                function(*args)
+                self.record(kind, perf_counter() - queued_at)
+            except Exception as e:
+                with self.lock:
+                    self.failed[kind] = self.failed.get(kind, 0) + 1
+                if self.registry is not None:
+                    self.registry.increment("message_failures_total", kind=kind)
+                log.warning("Falha ao tratar mensagem do tipo %s: %s", kind, e)
+
+    def record(self, kind, elapsed):
+        """
+        Registra o tempo de tratamento de uma mensagem, desde a sua chegada
+            Parâmetros:
+                kind (str): tipo da mensagem
+                elapsed (float): tempo decorrido, em segundos
+        """
+        with self.lock:
+            self.handled[kind] = self.handled.get(kind, 0) + 1
+            total, slowest = self.latency.get(kind, (0.0, 0.0))
+            self.latency[kind] = (total + elapsed, max(slowest, elapsed))
+        if self.registry is not None:
+            self.registry.increment("messages_total", kind=kind)
+            self.registry.observe("message_seconds", elapsed, kind=kind)
+
+    def metrics(self):
+        """
+        Retorna a profundidade das filas, a latência de tratamento e os descartes por tipo de mensagem
+        """
+        with self.lock:
+            latency = {
+                kind: {
+                    "count": self.handled[kind],
+                    "avg_ms": round(1000 * total / self.handled[kind], 3),
+                    "max_ms": round(1000 * slowest, 3)}
+                for kind, (total, slowest) in self.latency.items()}
+            failed = dict(self.failed)
+            dropped = dict(self.dropped)
+        return {
+            "queue_depth": [tasks.qsize() for tasks in self.queues],
+            "latency": latency,
+            "failed": failed,
+            "dropped": dropped}
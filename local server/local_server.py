@@ -1,10 +1,26 @@
 from paho.mqtt import client as mqtt_client
 from random import randint
-from time import sleep
+from time import sleep, perf_counter, time
 import threading
-import socket
 import json
-from station import Station
+import logging
+import os
+from station import StationTable
+from station_heap import StationHeap
+from cloud_client import CloudClient
+from reservations import ReservationBook
+from registry_store import RegistryStore
+from dispatcher import KeyedDispatcher
+from station_sync import StationSync
+from station_replica import StationReplica
+from road_network import RoadNetwork
+from publisher import Publisher
+from timing_wheel import TimingWheel
+from tracing import tracer
+from metrics import MetricsRegistry
+from profiler import SamplingProfiler
+
+log = logging.getLogger("local_server")
 
 
 class LocalServer:
@@ -19,35 +35,114 @@ class LocalServer:
             CAR_BATTERY_TOPIC (str): tópico para indicar o nível de bateria baixa dos carros
             STATION_UPDATE_TOPIC (str): tópico para atualização das filas dos postos
             STATION_REGISTER_TOPIC (str): tópico de registro da estação no servidor local
-            CAR_PATH_TOPIC (str): tópico para indicar a localização dos carros
+            STATION_HEARTBEAT_TOPIC (str): tópico em que os postos indicam periodicamente que continuam ativos
+            STATION_OFFLINE_TOPIC (str): tópico em que o broker publica a última mensagem dos postos desconectados
+            CAR_PATH_TOPIC (str): tópico para indicar a localização dos carros; cada carro recebe o seu posto em um subtópico próprio
+            METRICS_TOPIC (str): tópico em que o servidor publica as suas métricas
             location (str): localização ao qual o servidor processa as requisições
-            cloud_socket (socket): inicialização do socket TCP para comunicação com o servidor central
-            station_dict (dict): lista de postos da localidade
+            cloud (CloudClient): conexões multiplexadas com o servidor central
+            cloud_pool_size (int): quantidade de conexões com o servidor central
+            sync_mode (str): "batched" acumula as atualizações de postos e as envia em lotes, "immediate" envia cada uma
+            station_sync (StationSync): envio em lotes das atualizações de postos para o servidor central
+            network (RoadNetwork): malha viária com os tempos de viagem entre as localizações; None usa a distância em linha reta
+            replica (StationReplica): cópia dos postos de todas as localidades, mantida pelo servidor central
+            station_table (StationTable): tabela colunar dos postos da localidade
+            station_heap (StationHeap): postos da localidade ordenados pela fila somada às reservas e, no empate, pelo instante em que ficam livres
+            free_at (dict): instante, no relógio do posto (time()), em que cada posto termina as sessões agendadas
+            station_lock (threading.Lock): protege a tabela e o heap de postos, alterados por várias threads de trabalho
+            reservations (ReservationBook): vagas reservadas para os carros encaminhados que ainda não chegaram
+            registry (RegistryStore): cópia em disco do registro de postos, usada para reiniciar o servidor já com os postos conhecidos
             format (str): formato da codificação de caracteres
+            pending_cars (list): pedidos de carros com bateria baixa aguardando o envio do próximo lote
+            queued_cars (dict): quantidade de pedidos de cada carro no lote ainda não respondidos
+            batch_size (int): quantidade de pedidos que dispara o envio imediato do lote
+            batch_interval (float): tempo máximo, em segundos, que um pedido aguarda o lote
+            dispatcher (KeyedDispatcher): threads que tratam as mensagens dos postos e dos carros fora da thread do MQTT
+            metrics_interval (float): intervalo, em segundos, entre as publicações de métricas
+            publisher (Publisher): fila de publicações MQTT, enviada fora das threads de tratamento
+            station_ttl (float): tempo, em segundos, sem notícias de um posto após o qual ele é removido
+            liveness (TimingWheel): prazo de expiração de cada posto, renovado por qualquer mensagem do posto
+            alive_interval (float): intervalo, em segundos, entre os avisos ao servidor central dos postos ativos
+            evicted (int): quantidade de postos removidos por falta de notícias
+            metrics (MetricsRegistry): contadores, latências por tipo de mensagem e medidores do servidor
+            metrics_port (int): porta local do endpoint de métricas; None desliga o endpoint
+            profiler (SamplingProfiler): perfil por amostragem, ligado e desligado pelo sinal SIGUSR1
     """
 
-    def __init__(self, location, broker_addr="172.16.103.3"):
+    def __init__(self, location, broker_addr="172.16.103.3", broker_port=1883,
+                 cloud_host="172.16.103.9", cloud_port=1917, network_path="road_network.json"):
         """
         Método construtor da classe
             Parâmetros:
                 location (str): localização do posto
+                broker_addr (str): endereço do broker
+                broker_port (int): porta de conexão do broker
+                cloud_host (str): endereço do servidor central
+                cloud_port (int): porta do servidor central
+                network_path (str): arquivo da malha viária, o mesmo do servidor central; sem ele, vale a distância em linha reta
         """
         self.broker_addr = broker_addr
-        self.broker_port = 1883
+        self.broker_port = broker_port
 
-        self.cloud_host = "172.16.103.9" #"192.168.1.3", 172.16.103.220, 172.16.103.9
-        self.cloud_port = 1917
+        self.cloud_host = cloud_host #"192.168.1.3", 172.16.103.220, 172.16.103.9
+        self.cloud_port = cloud_port
 
         self.CAR_BATTERY_TOPIC = "REDESP2IG/car/battery"
         self.STATION_UPDATE_TOPIC = "REDESP2IG/station/queue"
         self.STATION_REGISTER_TOPIC = "REDESP2IG/station/register"
+        self.STATION_HEARTBEAT_TOPIC = "REDESP2IG/station/heartbeat"
+        self.STATION_OFFLINE_TOPIC = "REDESP2IG/station/offline"
         self.CAR_PATH_TOPIC = "REDESP2IG/car/path"
+        self.METRICS_TOPIC = f"REDESP2IG/server/{location}/metrics"
 
         self.location = location
-        self.station_dict = {}
-        self.cloud_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.station_table = StationTable()
+        self.station_heap = StationHeap()
+        self.station_lock = threading.Lock()
+        self.free_at = {}
+        self.reservations = ReservationBook()
+        self.registry = RegistryStore(f"registry/local-{location}")
 
         self.format = 'utf-8'
+        self.cloud_pool_size = 1
+        self.cloud = CloudClient(self.cloud_host, self.cloud_port, self.format, self.cloud_pool_size)
+        self.sync_mode = "batched"
+        self.station_sync = StationSync(self.cloud.request, interval=0.5, max_pending=128)
+        self.network = None
+        if network_path and os.path.exists(network_path):
+            self.network = RoadNetwork.load(network_path)
+            log.info("Malha viária carregada de %s: %s", network_path, self.network.stats())
+        self.replica = StationReplica(self.network)
+
+        self.pending_cars = []
+        self.queued_cars = {}
+        self.pending_lock = threading.Condition()
+        self.batch_size = 64
+        self.batch_interval = 0.05
+
+        self.metrics = MetricsRegistry("local")
+        self.metrics_port = 9918
+        self.dispatcher = KeyedDispatcher(workers=4, max_queue=1000, registry=self.metrics)
+        self.metrics_interval = 10
+        self.publisher = None
+
+        self.station_ttl = 15
+        self.liveness = TimingWheel(self.station_ttl)
+        self.alive_interval = 15
+        self.evicted = 0
+        tracer.component = f"local-{location}"
+        self.profiler = SamplingProfiler(f"local-{location}")
+
+        self.metrics.gauge("stations", lambda: len(self.station_table))
+        self.metrics.gauge("pending_cars", lambda: len(self.pending_cars))
+        self.metrics.gauge("dispatcher_queue_depth", lambda: sum(tasks.qsize() for tasks in self.dispatcher.queues))
+        self.metrics.gauge("sync_pending", lambda: len(self.station_sync.pending))
+        self.metrics.gauge("publisher_pending", lambda: self.publisher.stats()["pending"] if self.publisher else 0)
+        self.metrics.gauge("replica_stations", lambda: len(self.replica.index.entries))
+        self.metrics.gauge("cloud_connections", lambda: sum(c.connected for c in self.cloud.connections))
+        self.metrics.gauge("cloud_reconnects", lambda: sum(c.reconnects for c in self.cloud.connections))
+        self.metrics.gauge("cloud_pending", lambda: sum(len(c.pending) for c in self.cloud.connections))
+        self.metrics.gauge("evicted", lambda: self.evicted)
 
     def on_connect(self, client: mqtt_client, userdata, flags, rc):
         """
@@ -59,12 +154,14 @@ class LocalServer:
                 rc (int): determina se o cliente está conectado com sucesso
         """
         if rc == 0:
-            print("Connected to MQTT Broker!")
+            log.info("Connected to MQTT Broker!")
             client.subscribe(self.CAR_BATTERY_TOPIC)
             client.subscribe(self.STATION_UPDATE_TOPIC)
             client.subscribe(self.STATION_REGISTER_TOPIC)
+            client.subscribe(self.STATION_HEARTBEAT_TOPIC)
+            client.subscribe(self.STATION_OFFLINE_TOPIC)
         else:
-            print("Failed to connect, return code %d\n", rc)
+            log.error("Failed to connect, return code %d", rc)
 
     def on_message(self, client: mqtt_client, userdata, message):
         """
@@ -74,24 +171,70 @@ class LocalServer:
                 message (str): mensagem recebida
         """
         decoded = message.payload.decode(self.format)
-        print("Message received on topic " + message.topic + " with QoS " + str(message.qos) + " and payload " + str(
-            decoded))
+        log.debug("Message received on topic %s with QoS %s and payload %s", message.topic, message.qos, decoded)
+        self.metrics.increment("mqtt_messages_total", topic=message.topic.rsplit("/", 1)[-1])
+
+        # Esta thread também mantém a conexão com o broker, então ela apenas
+        # identifica a mensagem e repassa o tratamento para as threads de trabalho
+        try:
+            info = json.loads(decoded)
+        except ValueError:
+            log.warning("Mensagem ignorada: JSON inválido")
+            return
+        if not isinstance(info, dict):
+            log.warning("Mensagem ignorada: o conteúdo não é um objeto JSON")
+            return
 
         match message.topic:
             case "REDESP2IG/car/battery":
-                path = self.getPath(decoded)
-                self.publishPath(client, path)
+                # A escolha do posto disputa station_lock com as threads que gravam o registro
+                # em disco, então também sai desta thread. Pedidos do mesmo carro ficam na
+                # mesma thread de trabalho, na ordem de chegada
+                self.dispatcher.submit(info.get("car"), "battery", self.routeCar, client, info)
             case "REDESP2IG/station/queue":
-                self.updateQueue(decoded)
+                # Mensagens do mesmo posto são tratadas na mesma thread, na ordem de chegada.
+                # Um processo com vários postos envia as filas em lote, no campo "stations"
+                for station_info in info.get("stations", [info]):
+                    code = station_info.get("code", station_info.get("station"))
+                    self.dispatcher.submit(code, "queue", self.updateQueue, station_info)
             case "REDESP2IG/station/register":
-                self.registerStation(decoded)
+                for station_info in info.get("stations", [info]):
+                    self.dispatcher.submit(station_info.get("code"), "register", self.registerStation, station_info)
+            case "REDESP2IG/station/heartbeat":
+                for station_info in info.get("stations", [info]):
+                    self.dispatcher.submit(station_info.get("code"), "heartbeat", self.heartbeat, station_info)
+            case "REDESP2IG/station/offline":
+                for station_info in info.get("stations", [info]):
+                    self.dispatcher.submit(station_info.get("code"), "offline", self.removeStation, station_info.get("code"))
 
     def tcpStart(self):
         """
-        Inicializa o socket TCP
+        Inicializa as conexões TCP com o servidor central
+        """
+        self.cloud.connect()
+        log.info("Connected to cloud.")
+        self.subscribeReplica()
+
+    def subscribeReplica(self):
+        """
+        Pede ao servidor central um retrato dos postos e o envio das alterações seguintes
         """
-        self.cloud_socket.connect((self.cloud_host, self.cloud_port))
-        print("Connected to cloud.")
+        future = self.cloud.subscribe(self.onReplicaMessage, {"subscribe": "stations"})
+        future.add_done_callback(self.checkCloudAck)
+
+    def onReplicaMessage(self, message):
+        """
+        Aplica à cópia local um retrato ou uma alteração dos postos enviada pelo servidor central
+            Parâmetros:
+                message (dict): mensagem enviada pelo servidor central
+        """
+        if "snapshot" in message:
+            self.replica.applySnapshot(message["snapshot"])
+            log.info("Cópia dos postos sincronizada: %s", self.replica.stats())
+        elif self.replica.applyDelta(message["delta"]):
+            log.warning("Alteração dos postos perdida, pedindo um novo retrato")
+            # Esta é a thread de leitura da conexão, que não pode esperar por um envio
+            threading.Thread(target=self.subscribeReplica, daemon=True).start()
 
     def mqttStart(self):
         """
@@ -100,6 +243,7 @@ class LocalServer:
         client = mqtt_client.Client()
         client.on_connect = self.on_connect
         client.on_message = self.on_message
+        self.publisher = Publisher(client)
         client.connect(self.broker_addr, self.broker_port)
         return client
 
@@ -109,13 +253,22 @@ class LocalServer:
             Parâmetros:
                 station_info (dict): informações de um posto de carregamento
         """
-        print(self.station_dict)
-        station_info = json.loads(station_info)
-        station_find = self.station_dict.get(station_info.get("code"))
-        if station_find:
-            station_find.queue = int(station_info.get("queue"))
-        self.communeWithCloud(station_find.getJson())
-        print(self.station_dict)
+        # Os postos publicam a fila com o código no campo "station"
+        code = station_info.get("code", station_info.get("station"))
+        new_queue = int(station_info.get("queue"))
+        with self.station_lock:
+            if code not in self.station_table:
+                return
+            # O aumento da fila indica a chegada de carros que tinham reserva
+            self.reservations.confirm(code, new_queue - self.station_table.queue(code))
+            self.station_table.setQueue(code, new_queue)
+            self.setFreeAt(code, station_info)
+            self.liveness.touch(code)
+            self.refreshStation(code)
+            self.saveStation(code)
+            info = self.station_table.getInfo(code)
+        self.notifyCloud(info)
+        log.debug("%d postos registrados", len(self.station_table))
 
     def registerStation(self, station_info):
         """
@@ -123,95 +276,552 @@ class LocalServer:
             Parâmetros:
                 station_info (dict): informações de um posto de carregamento
         """
-        print(self.station_dict)
-        station_info = json.loads(station_info)
-        new_station = Station(self.location, station_info.get("code"), int(station_info.get("queue")))
-        self.station_dict[station_info.get("code")] = new_station
-        self.communeWithCloud(new_station.getJson())
-        print(self.station_dict)
+        code = station_info.get("code")
+        with self.station_lock:
+            self.station_table.upsert(code, self.location, int(station_info.get("queue")))
+            self.setFreeAt(code, station_info)
+            self.liveness.touch(code)
+            self.refreshStation(code)
+            self.saveStation(code)
+            info = self.station_table.getInfo(code)
+        self.notifyCloud(info)
+        log.debug("%d postos registrados", len(self.station_table))
+
+    def heartbeat(self, station_info):
+        """
+        Renova o prazo de um posto ativo. Um posto desconhecido, removido por engano ou
+        registrado antes de um reinício sem registro em disco, é registrado novamente, e
+        uma fila diferente da conhecida, de uma atualização perdida, é corrigida
+            Parâmetros:
+                station_info (dict): código, fila e instante em que o posto fica livre
+        """
+        code = station_info.get("code")
+        queue = int(station_info.get("queue"))
+        with self.station_lock:
+            known = code in self.station_table
+            if known and self.station_table.queue(code) == queue:
+                self.liveness.touch(code)
+                if self.setFreeAt(code, station_info):
+                    self.refreshStation(code)
+                return
+        if known:
+            self.updateQueue(station_info)
+        else:
+            self.registerStation(station_info)
+
+    def removeStation(self, code):
+        """
+        Remove um posto desconectado ou sem notícias e avisa o servidor central
+            Parâmetros:
+                code (str): código do posto
+        """
+        with self.station_lock:
+            if code not in self.station_table:
+                return
+            self.station_table.remove(code)
+            self.free_at.pop(code, None)
+            self.liveness.discard(code)
+            self.refreshStation(code)
+            self.registry.appendRemoval(code)
+        self.notifyCloud({"code": code, "removed": "1"})
+        log.info("Posto %s removido, %d postos registrados", code, len(self.station_table))
+
+    def evictStale(self):
+        """
+        Remove os postos cujo prazo venceu, examinando apenas os prazos vencidos
+        """
+        with self.station_lock:
+            expired = self.liveness.expire()
+        for code in expired:
+            self.evicted += 1
+            self.removeStation(code)
+
+    def livenessLoop(self):
+        """
+        Remove periodicamente os postos sem notícias e avisa o servidor central de
+        quais postos da localidade continuam ativos
+        """
+        last_alive = perf_counter()
+        while True:
+            sleep(self.liveness.resolution)
+            self.evictStale()
+            if perf_counter() - last_alive >= self.alive_interval:
+                last_alive = perf_counter()
+                with self.station_lock:
+                    codes = list(self.station_table.codes)
+                if codes:
+                    self.notifyAlive(codes)
+
+    def notifyAlive(self, codes):
+        future = self.cloud.request({"alive": codes})
+        # A resposta chega na thread de leitura da conexão; o reenvio dos postos fica com
+        # as threads de trabalho. Um aviso descartado com a fila cheia é refeito no próximo intervalo
+        future.add_done_callback(lambda future: self.dispatcher.submit("alive", "alive", self.checkAliveAck, future))
+
+    def checkAliveAck(self, future):
+        """
+        Reenvia ao servidor central os postos ativos que ele não conhece mais, removidos
+        por falta de notícias ou perdidos em um reinício
+            Parâmetros:
+                future (Future): resposta do servidor central à lista de postos ativos
+        """
+        if future.exception() is not None:
+            log.warning("Falha ao enviar atualização para o servidor central: %s", future.exception())
+            return
+        unknown = future.result().get("unknown") or []
+        with self.station_lock:
+            infos = [self.station_table.getInfo(code) for code in unknown if code in self.station_table]
+        for info in infos:
+            self.notifyCloud(info)
+        if infos:
+            log.info("%d postos reenviados ao servidor central", len(infos))
 
     def getPath(self, car_info):
         """
         Determina o melhor posto da localidade para o carro recarregar a bateria
             Parâmetros:
-                car_info (): informações do carro (bateria e modo de autonomia)
-        """
-        car_info = json.loads(car_info)
-        best_queue = 25
-        best_station = None
-        for station in self.station_dict.values():
-            if int(station.queue) < best_queue:
-                best_station = station
-                best_queue = int(station.queue)
-        if best_station:
-            print(best_station)
-            response_car = "{\"car\": \"" + car_info.get("car") + "\", "
-            response_location = "\"location\": \"" + str(self.location) + "\", "
-            response_station_code = "\"code\": \"" + str(best_station.code) + "\", "
-            response_station_queue = "\"queue\": \"" + str(best_station.queue) + "\"}"
-
-            return response_car + response_location + response_station_code + response_station_queue
-        else:
-            remaining_time = int(car_info.get("battery")) // max(1, int(car_info.get("mode")))
+                car_info (dict): informações do carro (bateria e modo de autonomia)
+        """
+        response = self.localPath(car_info)
+        if response is None:
+            response = self.remotePath(car_info) or self.communeWithCloud(self.cloudRequest(car_info))
+        return response
 
-            message_car = "{\"car\": \"" + car_info.get("car") + "\", "
-            message_location = "\"location\": \"" + str(self.location) + "\", "
-            message_battery = "\"battery\": \"" + car_info.get("battery") + "\", "
-            message_mode = "\"mode\": \"" + car_info.get("mode") + "\", "
-            message_time = "\"time left\": \"" + str(remaining_time) + "\"}"
+    def localPath(self, car_info):
+        """
+        Reserva uma vaga no posto da localidade com a menor fila
+            Parâmetros:
+                car_info (dict): informações do carro
+            Retornos:
+                response (str): resposta para o carro, ou None caso a localidade não tenha vagas
+        """
+        self.refreshStations(self.reservations.expire())
+        best_station = self.bestLocalStation()
+        if best_station is None:
+            return None
+        log.debug("Posto escolhido: %s", best_station.code)
+        self.refreshStations(self.reservations.reserve(best_station.code, car_info.get("car")))
+        return self.pathResponse(car_info, best_station)
 
-            message = message_car + message_location + message_battery + message_mode + message_time
-            response = self.communeWithCloud(message)
-            return response
+    def getPathBatch(self, cars_info):
+        """
+        Determina o melhor posto para um lote de carros, enviando ao servidor central
+        em uma única mensagem os pedidos que não podem ser atendidos na localidade
+            Parâmetros:
+                cars_info (list): informações de cada carro (bateria e modo de autonomia)
+            Retornos:
+                paths (list): resposta de cada carro, na mesma ordem do lote
+        """
+        paths = [None] * len(cars_info)
+        remote = []
 
-    def publishPath(self, client: mqtt_client, station_info):
-        if station_info:
-            self.publish(client, self.CAR_PATH_TOPIC, station_info)
+        # Cada carro do lote reserva uma vaga antes do próximo escolher, então
+        # os carros são distribuídos entre os postos em vez de irem todos ao mesmo.
+        # Uma vaga pode ter sido liberada desde a chegada do pedido. A falha no
+        # pedido de um carro deixa apenas esse carro sem posto
+        for i, car_info in enumerate(cars_info):
+            started = time()
+            try:
+                paths[i] = self.localPath(car_info)
+                if paths[i] is not None:
+                    tracer.record(car_info.get("trace"), "local.select", started)
+                    continue
+                paths[i] = self.remotePath(car_info)
+                if paths[i] is not None:
+                    tracer.record(car_info.get("trace"), "local.replica", started)
+                    continue
+                remote.append((i, self.cloudRequest(car_info)))
+            except Exception as e:
+                log.error("Falha ao escolher o posto para o carro %s: %s", car_info.get("car"), e)
+
+        if remote:
+            message = {"batch": [request for _, request in remote]}
+            started = time()
+            try:
+                response = self.communeWithCloud(message)
+                answers = json.loads(response).get("batch", []) if response else []
+            except Exception as e:
+                log.error("Falha ao consultar o servidor central para o lote: %s", e)
+                answers = []
+            self.metrics.observe("cloud_seconds", time() - started, kind="batch")
+            for (i, _), answer in zip(remote, answers):
+                tracer.record(cars_info[i].get("trace"), "local.cloud", started)
+                paths[i] = json.dumps(answer, ensure_ascii=False)
+        return paths
+
+    def remotePath(self, car_info):
+        """
+        Escolhe um posto de outra localidade usando a cópia dos postos, sem esperar pelo
+        servidor central, que é apenas avisado da reserva
+            Parâmetros:
+                car_info (dict): informações do carro
+            Retornos:
+                response (str): resposta para o carro, ou None caso a cópia não tenha um posto alcançável
+        """
+        time_left = int(self.cloudRequest(car_info)["time left"])
+        station = self.replica.best(int(self.location), time_left)
+        if station is None:
+            return None
+        code, location, queue = station
+        self.notifyReservation(code, car_info.get("car"))
+        return json.dumps({
+            "car": car_info.get("car"),
+            "location": str(location),
+            "code": str(code),
+            "queue": str(queue)}, ensure_ascii=False)
+
+    def notifyReservation(self, code, car):
+        future = self.cloud.request({"reserve": code, "car": car})
+        future.add_done_callback(self.checkCloudAck)
+
+    def bestLocalStation(self):
+        """
+        Retorna o posto da localidade com a menor fila, contando as vagas reservadas
+        """
+        with self.station_lock:
+            best = self.station_heap.top()
+            if best is None or best[0][0] >= 25:
+                return None
+            return self.station_table.get(best[1])
+
+    def setFreeAt(self, code, station_info):
+        """
+        Guarda o instante em que o posto termina as sessões agendadas. Deve ser chamado com
+        station_lock adquirido
+            Parâmetros:
+                code (str): código do posto
+                station_info (dict): informações do posto; postos antigos não informam "free at"
+            Retornos:
+                changed (bool): indica se o instante mudou
+        """
+        if "free at" not in station_info:
+            return False
+        free_at = float(station_info["free at"])
+        if self.free_at.get(code) == free_at:
+            return False
+        self.free_at[code] = free_at
+        return True
+
+    def refreshStation(self, code):
+        """
+        Atualiza a posição de um posto no heap após mudar a sua fila, as suas reservas ou o
+        instante em que fica livre. Deve ser chamado com station_lock adquirido
+            Parâmetros:
+                code (str): código do posto
+        """
+        if code in self.station_table:
+            # Entre filas iguais, vence o posto que libera um carregador mais cedo
+            key = (self.station_table.queue(code) + self.reservations.count(code), self.free_at.get(code, 0.0))
+            self.station_heap.update(code, key)
         else:
-            self.publish(client, self.CAR_PATH_TOPIC, "{\"result\": \"posto não encontrado\"}")
+            self.station_heap.remove(code)
+
+    def refreshStations(self, codes):
+        """
+        Atualiza no heap os postos cujas reservas mudaram
+            Parâmetros:
+                codes (iterable): códigos dos postos
+        """
+        if not codes:
+            return
+        with self.station_lock:
+            for code in codes:
+                self.refreshStation(code)
+
+    def pathResponse(self, car_info, station):
+        """
+        Monta a resposta indicando a um carro o posto em que ele deve recarregar
+            Parâmetros:
+                car_info (dict): informações do carro
+                station (Station): posto escolhido
+        """
+        return json.dumps({
+            "car": car_info.get("car"),
+            "location": str(self.location),
+            "code": str(station.code),
+            "queue": str(station.queue)}, ensure_ascii=False)
+
+    def validCar(self, car_info):
+        """
+        Indica se o pedido de um carro tem os campos usados na escolha do posto, o que é
+        verificado antes de qualquer reserva
+            Parâmetros:
+                car_info (dict): informações do carro
+        """
+        car = car_info.get("car")
+        if not isinstance(car, str) or not car:
+            return False
+        try:
+            return int(car_info.get("battery")) >= 0 and int(car_info.get("mode")) >= 0
+        except (TypeError, ValueError):
+            return False
+
+    def cloudRequest(self, car_info):
+        """
+        Monta o pedido enviado ao servidor central quando não há vagas na localidade
+            Parâmetros:
+                car_info (dict): informações do carro
+        """
+        remaining_time = int(car_info.get("battery")) // max(1, int(car_info.get("mode")))
+        request = {
+            "car": car_info.get("car"),
+            "location": str(self.location),
+            "battery": car_info.get("battery"),
+            "mode": car_info.get("mode"),
+            "time left": str(remaining_time)}
+        if car_info.get("trace"):
+            request["trace"] = car_info["trace"]
+        return request
+
+    def routeCar(self, client: mqtt_client, car_info):
+        """
+        Responde na hora o pedido de um carro quando a localidade tem vaga, sem esperar
+        pelo lote, que fica apenas com os pedidos que dependem da cópia dos postos ou
+        do servidor central. Um carro que ainda tem pedido no lote segue para o lote,
+        para que as suas respostas saiam na ordem dos pedidos
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+                car_info (dict): informações do carro (bateria e modo de autonomia)
+        """
+        # Instante de chegada, usado no rastreamento do pedido
+        car_info["received"] = time()
+        if not self.validCar(car_info):
+            log.warning("Pedido de carro inválido: %s", car_info)
+            self.publishPath(client, None, self.replyTopic(car_info), car_info.get("trace"))
+            return
+        with self.pending_lock:
+            queued = car_info.get("car") in self.queued_cars
+        path = None
+        if not queued:
+            try:
+                path = self.localPath(car_info)
+            except Exception as e:
+                log.error("Falha ao escolher o posto local para o carro: %s", e)
+        if path is None:
+            self.enqueueCar(car_info)
+            return
+        tracer.record(car_info.get("trace"), "local.select", car_info["received"])
+        self.publishPath(client, path, self.replyTopic(car_info), car_info.get("trace"))
+        tracer.record(car_info.get("trace"), "local.total", car_info["received"])
+
+    def enqueueCar(self, car_info):
+        """
+        Adiciona o pedido de um carro ao próximo lote
+            Parâmetros:
+                car_info (dict): informações do carro (bateria e modo de autonomia)
+        """
+        car_info.setdefault("received", time())
+        car = car_info.get("car")
+        with self.pending_lock:
+            self.pending_cars.append(car_info)
+            self.queued_cars[car] = self.queued_cars.get(car, 0) + 1
+            if len(self.pending_cars) >= self.batch_size:
+                self.pending_lock.notify()
+
+    def releaseCars(self, cars_info):
+        """
+        Libera os carros de um lote já respondido para voltarem à resposta imediata
+            Parâmetros:
+                cars_info (list): informações de cada carro do lote
+        """
+        with self.pending_lock:
+            for car_info in cars_info:
+                car = car_info.get("car")
+                if self.queued_cars.get(car, 0) > 1:
+                    self.queued_cars[car] -= 1
+                else:
+                    self.queued_cars.pop(car, None)
+
+    def batchLoop(self, client: mqtt_client):
+        """
+        Envia periodicamente os pedidos acumulados dos carros como um lote
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+        """
+        while True:
+            with self.pending_lock:
+                if len(self.pending_cars) < self.batch_size:
+                    self.pending_lock.wait(self.batch_interval)
+                cars_info, self.pending_cars = self.pending_cars, []
+
+            if not cars_info:
+                continue
+            try:
+                started = perf_counter()
+                batch_started = time()
+                for car_info in cars_info:
+                    tracer.record(car_info.get("trace"), "local.batch_wait", car_info["received"], batch_started)
+                for car_info, path in zip(cars_info, self.getPathBatch(cars_info)):
+                    try:
+                        self.publishPath(client, path, self.replyTopic(car_info), car_info.get("trace"))
+                    except Exception as e:
+                        log.error("Falha ao responder o carro %s: %s", car_info.get("car"), e)
+                    tracer.record(car_info.get("trace"), "local.total", car_info["received"])
+                self.dispatcher.record("battery batch", perf_counter() - started)
+            except Exception as e:
+                log.error("Falha ao processar o lote de pedidos dos carros: %s", e)
+            finally:
+                self.releaseCars(cars_info)
+
+    def replyTopic(self, car_info):
+        """
+        Retorna o tópico em que o carro espera a resposta. Carros que não informam um
+        tópico próprio recebem a resposta no tópico compartilhado
+            Parâmetros:
+                car_info (dict): informações do carro
+        """
+        reply = car_info.get("reply")
+        # Restringe as respostas aos subtópicos de CAR_PATH_TOPIC
+        if isinstance(reply, str) and reply.startswith(self.CAR_PATH_TOPIC + "/") \
+                and "+" not in reply and "#" not in reply:
+            return reply
+        return self.CAR_PATH_TOPIC
+
+    def publishPath(self, client: mqtt_client, station_info, topic=None, trace=None):
+        """
+        Publica o posto escolhido para um carro
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+                station_info (str): resposta para o carro, ou None caso nenhum posto tenha sido encontrado
+                topic (str): tópico de resposta do carro
+                trace (str): id de rastreamento do pedido, devolvido ao carro
+        """
+        topic = topic or self.CAR_PATH_TOPIC
+        if not station_info:
+            station_info = "{\"result\": \"posto não encontrado\"}"
+        if trace:
+            station_info = json.dumps(dict(json.loads(station_info), trace=trace), ensure_ascii=False)
+        self.publish(client, topic, station_info)
 
     def communeWithCloud(self, message):
         """
         Envia dados sobre a localização e o tempo de bateria restante para o servidor central
+        e espera pela resposta
+            Parâmetros:
+                message (str | dict): mensagem a ser enviada para o servidor central
+        """
+        if isinstance(message, str):
+            message = json.loads(message)
+        response = self.cloud.call(message)
+        if response is None:
+            return None
+        response = json.dumps(response, ensure_ascii=False)
+        log.debug("Resposta do servidor central: %s", response)
+        return response
+
+    def notifyCloud(self, message):
+        """
+        Envia uma atualização para o servidor central sem bloquear a thread atual
+        à espera da confirmação. No modo em lotes, apenas o estado mais recente de
+        cada posto é enviado no próximo lote
+            Parâmetros:
+                message (dict): mensagem a ser enviada para o servidor central
+        """
+        if self.sync_mode == "batched":
+            self.station_sync.push(message)
+            return
+        future = self.cloud.request(message)
+        future.add_done_callback(self.checkCloudAck)
+
+    def checkCloudAck(self, future):
+        if future.exception() is not None:
+            log.warning("Falha ao enviar atualização para o servidor central: %s", future.exception())
+
+    def getMetrics(self):
+        """
+        Retorna a profundidade das filas de tratamento e a latência por tipo de mensagem
+        """
+        metrics = self.dispatcher.metrics()
+        with self.pending_lock:
+            metrics["pending_cars"] = len(self.pending_cars)
+        metrics["station_sync"] = self.station_sync.stats()
+        metrics["replica"] = self.replica.stats()
+        metrics["stations"] = len(self.station_table)
+        metrics["evicted"] = self.evicted
+        if self.publisher:
+            metrics["publisher"] = self.publisher.stats()
+        return metrics
+
+    def metricsLoop(self, client: mqtt_client):
+        """
+        Publica periodicamente as métricas do servidor
+            Parâmetros:
+                client (mqtt_client): cliente MQTT
+        """
+        while True:
+            sleep(self.metrics_interval)
+            self.publish(client, self.METRICS_TOPIC, json.dumps(self.getMetrics()), key="metrics")
+
+    def loadRegistry(self):
+        """
+        Carrega os postos salvos em disco antes de começar a atender os carros
+        """
+        self.station_table.upsertMany(
+            (code, location, queue) for code, (location, queue) in self.registry.load().items())
+        with self.station_lock:
+            # Os postos carregados que não derem notícias dentro do prazo são removidos
+            for code in self.station_table.codes:
+                self.liveness.touch(code)
+                self.refreshStation(code)
+        log.info("%d postos carregados do registro", len(self.station_table))
+
+    def saveStation(self, code):
+        """
+        Registra em disco a atualização de um posto
             Parâmetros:
-                message (str): mensagem a ser enviada para o servidor central
+                code (str): código do posto atualizado
         """
-        self.cloud_socket.send(message.encode(self.format))
-        response = self.cloud_socket.recv(1024)
-        response = response.decode(self.format)
-        response = str(response)
-        if response:
-            print(response)
-            return response
+        self.registry.append(code, self.station_table.location(code), self.station_table.queue(code))
+        if self.registry.needsCompaction():
+            self.registry.compact(self.station_table.items())
 
-    def publish(self, client: mqtt_client, topic, message):
+    def publish(self, client: mqtt_client, topic, message, key=None):
         """
-        Publica mensagens nos tópicos do broker
+        Publica mensagens nos tópicos do broker, sem esperar pelo envio
 
             Parâmetros:
                 client (mqtt_client): cliente MQTT
                 topic (str): tópico do broker
                 message (str): mensagem a ser publicada
+                key (str): chave de substituição de mensagens ainda não enviadas
         """
-        while True:
-            result = client.publish(topic, message)
-            # result: [0, 1]
-            status = result[0]
-            if status == 0:
-                print(f"Enviando `{message}` para o tópico `{topic}`")
-                break
-            else:
-                print(f"Falha ao enviar mensagem para o tópico {topic}")
-                sleep(1)
+        if self.publisher.publish(topic, message, key):
+            log.debug("Enviando `%s` para o tópico `%s`", message, topic)
+        else:
+            self.metrics.increment("mqtt_dropped_total")
+            log.warning("Fila de envio cheia, mensagem descartada para o tópico %s", topic)
 
     def main(self):
+        self.loadRegistry()
+        self.metrics.serve(self.metrics_port)
         self.tcpStart()
+        if self.sync_mode == "batched":
+            self.station_sync.start()
         broker = self.mqttStart()
+        self.publisher.start()
+        self.dispatcher.start()
+
+        # Thread para enviar os pedidos dos carros em lotes
+        batch_thread = threading.Thread(target=self.batchLoop, args=[broker])
+        batch_thread.start()
+
+        metrics_thread = threading.Thread(target=self.metricsLoop, args=[broker], daemon=True)
+        metrics_thread.start()
+
+        liveness_thread = threading.Thread(target=self.livenessLoop, daemon=True)
+        liveness_thread.start()
+
         broker.loop_forever()
 
 
 #addr = input("Insira o endereço do broker: ")
 #airro_num = input("Insira o numero do bairro: ")
 #bairro_num = int(bairro_num)
-server = LocalServer(2, "172.16.103.3")
-server.main()
+if __name__ == "__main__":
+    # LOG_LEVEL=DEBUG exibe cada mensagem recebida e enviada
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    tracer.dumpOnSignal()
+    server = LocalServer(2, "172.16.103.3")
+    server.profiler.installSignal()
+    server.main()
@@ -0,0 +1,173 @@
+import bisect
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Limites, em segundos, dos intervalos dos histogramas de latência
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class MetricsRegistry:
+    """
+    Contadores, histogramas de latência e medidores de um servidor, expostos em um
+    endpoint HTTP local no formato de texto do Prometheus (/metrics) e em JSON
+    (/metrics.json). Os medidores são funções avaliadas apenas na leitura, então
+    não custam nada no tratamento das mensagens
+        Atributos:
+            prefix (str): prefixo dos nomes das métricas
+            counters (dict): valor de cada contador, indexado pelo nome e pelos rótulos
+            histograms (dict): contagem por intervalo, soma e quantidade de cada histograma
+            gauges (dict): função que lê cada medidor, indexada pelo nome
+            lock (threading.Lock): protege os contadores e os histogramas
+            server (ThreadingHTTPServer): servidor do endpoint, caso iniciado
+    """
+
+    def __init__(self, prefix):
+        """
+        Método construtor da classe
+            Parâmetros:
+                prefix (str): prefixo dos nomes das métricas
+        """
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Soma um valor a um contador
+            Parâmetros:
+                name (str): nome do contador
+                amount (int): valor somado
+                labels: rótulos que distinguem as séries do contador
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        """
+        Registra uma duração em um histograma
+            Parâmetros:
+                name (str): nome do histograma
+                seconds (float): duração, em segundos
+                labels: rótulos que distinguem as séries do histograma
+        """
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def gauge(self, name, function):
+        """
+        Registra um medidor
+            Parâmetros:
+                name (str): nome do medidor
+                function (function): retorna o valor atual do medidor
+        """
+        self.gauges[name] = function
+
+    def readGauges(self):
+        values = {}
+        for name, function in self.gauges.items():
+            try:
+                values[name] = function()
+            except Exception as e:
+                log.warning("Falha ao ler o medidor %s: %s", name, e)
+        return values
+
+    def snapshot(self):
+        """
+        Retorna os valores atuais de todas as métricas
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.histograms.items()}
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters.items()],
+            "histograms": [{"name": name, "labels": dict(labels), "count": count, "sum": round(total, 6),
+                            "buckets": dict(zip([str(limit) for limit in BUCKETS] + ["+Inf"], buckets))}
+                           for (name, labels), (buckets, total, count) in histograms.items()],
+            "gauges": self.readGauges()}
+
+    def render(self):
+        """
+        Retorna as métricas no formato de texto do Prometheus
+        """
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(buckets), total, count))
+                                for key, (buckets, total, count) in self.histograms.items())
+
+        for (name, labels), value in counters:
+            lines.append(f"{self.prefix}_{name}{formatLabels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in histograms:
+            cumulative = 0
+            for limit, bucket in zip(BUCKETS + ("+Inf",), buckets):
+                cumulative += bucket
+                lines.append(f"{self.prefix}_{name}_bucket{formatLabels(labels + (('le', limit),))} {cumulative}")
+            lines.append(f"{self.prefix}_{name}_sum{formatLabels(labels)} {total}")
+            lines.append(f"{self.prefix}_{name}_count{formatLabels(labels)} {count}")
+        for name, value in self.readGauges().items():
+            lines.append(f"{self.prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Inicia o endpoint HTTP em uma thread própria
+            Parâmetros:
+                port (int): porta do endpoint; o endpoint não é iniciado caso seja None
+                host (str): endereço de escuta, local por padrão
+        """
+        if port is None:
+            return
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug("Endpoint de métricas: " + format, *args)
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            log.warning("Endpoint de métricas não iniciado na porta %s: %s", port, e)
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        log.info("Métricas disponíveis em http://%s:%s/metrics", host, self.server.server_address[1])
+
+
+def formatLabels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"")
+        pairs.append(f"{name}=\"{value}\"")
+    return "{" + ",".join(pairs) + "}"
@@ -0,0 +1,115 @@
+import logging
+import os
+import signal
+import sys
+import threading
+from time import time
+
+log = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Perfil por amostragem de um servidor em execução: uma thread lê periodicamente a
+    pilha de todas as outras threads e conta quantas vezes cada pilha aparece. Fica
+    desligado até ser acionado, e o resultado é gravado no formato "folded" aceito
+    pelo flamegraph.pl e pelo speedscope
+        Atributos:
+            component (str): nome do processo, usado no nome dos arquivos
+            interval (float): intervalo, em segundos, entre as amostras
+            directory (str): diretório dos arquivos gravados
+            samples (dict): quantidade de amostras de cada pilha
+            running (threading.Event): indica se a amostragem está ligada
+            started (float): instante em que a amostragem foi ligada
+            thread (threading.Thread): thread de amostragem
+            lock (threading.Lock): impede que dois acionamentos seguidos liguem ou desliguem a amostragem ao mesmo tempo
+    """
+
+    def __init__(self, component, interval=0.005, directory="profiles"):
+        """
+        Método construtor da classe
+            Parâmetros:
+                component (str): nome do processo, usado no nome dos arquivos
+                interval (float): intervalo, em segundos, entre as amostras
+                directory (str): diretório dos arquivos gravados
+        """
+        self.component = component
+        self.interval = interval
+        self.directory = directory
+        self.samples = {}
+        self.running = threading.Event()
+        self.started = 0.0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.running.is_set():
+            return
+        self.samples = {}
+        self.started = time()
+        self.running.set()
+        self.thread = threading.Thread(target=self.sampleLoop, daemon=True)
+        self.thread.start()
+        log.warning("Perfil por amostragem ligado")
+
+    def stop(self):
+        """
+        Desliga a amostragem e grava o perfil
+            Retornos:
+                path (str): arquivo gravado, ou None caso a amostragem estivesse desligada
+        """
+        if not self.running.is_set():
+            return None
+        self.running.clear()
+        self.thread.join()
+        path = os.path.join(self.directory, f"{self.component}-{os.getpid()}-{int(self.started)}.folded")
+        self.write(path)
+        total = sum(self.samples.values())
+        log.warning("Perfil gravado em %s: %d amostras em %.1f s", path, total, time() - self.started)
+        return path
+
+    def toggle(self):
+        with self.lock:
+            if self.running.is_set():
+                self.stop()
+            else:
+                self.start()
+
+    def sampleLoop(self):
+        own = threading.get_ident()
+        names = {}
+        while self.running.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+            threading.Event().wait(self.interval)
+
+    def write(self, path):
+        """
+        Grava as pilhas amostradas, uma por linha seguida da quantidade de amostras
+            Parâmetros:
+                path (str): caminho do arquivo
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as output:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                output.write(f"{stack} {count}\n")
+
+    def installSignal(self):
+        """
+        Liga e desliga a amostragem a cada SIGUSR1 recebido. Deve ser chamado pela thread principal
+        """
+        if not hasattr(signal, "SIGUSR1"):
+            return
+        # O tratador apenas aciona outra thread, já que parar a amostragem espera a thread dela
+        signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(target=self.toggle).start())
@@ -0,0 +1,341 @@
+import json
+import struct
+
+
+VERSION = 1
+PROTOCOLS = ("binary", "json")
+
+
+def encodeMessage(message, format='utf-8'):
+    """
+    Codifica uma mensagem para envio pela conexão TCP, delimitada por quebra de linha
+        Parâmetros:
+            message (str | dict): mensagem em JSON (texto ou dicionário)
+            format (str): formato da codificação de caracteres
+        Retornos:
+            frame (bytes): mensagem codificada, terminada em "\\n"
+    """
+    if not isinstance(message, str):
+        message = json.dumps(message, ensure_ascii=False)
+    # O JSON gerado pelo sistema nunca contém quebras de linha literais,
+    # então elas podem ser usadas como delimitador das mensagens
+    message = message.replace("\n", " ")
+    return (message + "\n").encode(format)
+
+
+class FrameReader:
+    """
+    Reconstrói as mensagens JSON recebidas por uma conexão TCP, independente de como
+    os bytes foram divididos ou agrupados nas leituras do socket
+        Atributos:
+            buffer (bytearray): bytes recebidos que ainda não formam uma mensagem completa
+            format (str): formato da codificação de caracteres
+            max_size (int): tamanho máximo aceito para uma mensagem
+    """
+
+    name = "json"
+
+    def __init__(self, format='utf-8', max_size=1 << 20):
+        """
+        Método construtor da classe
+            Parâmetros:
+                format (str): formato da codificação de caracteres
+                max_size (int): tamanho máximo aceito para uma mensagem
+        """
+        self.buffer = bytearray()
+        self.format = format
+        self.max_size = max_size
+
+    def __iter__(self):
+        message = self.next()
+        while message is not None:
+            yield message
+            message = self.next()
+
+    def feed(self, data):
+        """
+        Adiciona bytes recebidos e retorna as mensagens que ficaram completas
+            Parâmetros:
+                data (bytes): bytes lidos do socket
+            Retornos:
+                messages (list): mensagens completas, já convertidas para dicionário
+        """
+        self.buffer += data
+        return list(self)
+
+    def next(self):
+        """
+        Retira do buffer a próxima mensagem completa
+            Retornos:
+                message (dict): mensagem convertida para dicionário, ou None caso ainda não haja uma completa
+        """
+        while True:
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                if len(self.buffer) > self.max_size:
+                    self.buffer.clear()
+                    raise ValueError("Mensagem excede o tamanho máximo permitido")
+                return None
+            line = bytes(self.buffer[:end]).strip()
+            del self.buffer[:end + 1]
+            if line:
+                return json.loads(line.decode(self.format))
+
+    def encode(self, message):
+        return encodeMessage(message, self.format)
+
+
+# Cabeçalho binário: versão, tipo da mensagem, id da requisição e tamanho do conteúdo
+HEADER = struct.Struct("!BBII")
+LENGTH = struct.Struct("!H")
+
+TYPE_JSON = 0
+
+# Campos de cada tipo de mensagem: "i" para inteiros, "s" para textos e
+# "s?" para textos opcionais, omitidos da mensagem quando vazios
+SCHEMAS = {
+    1: (("code", "s"), ("location", "i"), ("queue", "i")),
+    2: (("car", "s"), ("location", "i"), ("battery", "i"), ("mode", "i"), ("time left", "i")),
+    3: (("car", "s"), ("location", "i"), ("code", "s"), ("queue", "i")),
+    4: (("result", "s"), ("car", "s?")),
+    # Pedido de posto com o id de rastreamento atribuído pelo carro
+    6: (("car", "s"), ("location", "i"), ("battery", "i"), ("mode", "i"), ("time left", "i"), ("trace", "s")),
+}
+
+
+class MessageSchema:
+    """
+    Layout binário de um tipo de mensagem: todos os inteiros em uma estrutura de
+    tamanho fixo, seguidos dos textos prefixados pelo seu tamanho
+        Atributos:
+            type (int): código do tipo da mensagem
+            numbers (tuple): nomes dos campos inteiros
+            texts (tuple): nomes dos campos de texto
+            optional (set): campos de texto omitidos quando vazios
+            struct (struct.Struct): estrutura dos campos inteiros
+    """
+
+    def __init__(self, type, fields):
+        self.type = type
+        self.numbers = tuple(name for name, kind in fields if kind == "i")
+        self.texts = tuple(name for name, kind in fields if kind != "i")
+        self.optional = {name for name, kind in fields if kind == "s?"}
+        self.struct = struct.Struct("!" + "i" * len(self.numbers))
+
+    def keySets(self):
+        """
+        Retorna os conjuntos de campos de mensagem que usam este layout
+        """
+        required = frozenset(self.numbers + self.texts) - self.optional
+        key_sets = [required]
+        for name in self.optional:
+            key_sets += [key_set | {name} for key_set in key_sets]
+        return key_sets
+
+    def pack(self, message, format):
+        parts = [self.struct.pack(*(int(message[name]) for name in self.numbers))]
+        for name in self.texts:
+            text = str(message.get(name, "")).encode(format)
+            parts.append(LENGTH.pack(len(text)))
+            parts.append(text)
+        return b"".join(parts)
+
+    def unpack(self, payload, format):
+        message = dict(zip(self.numbers, self.struct.unpack_from(payload, 0)))
+        offset = self.struct.size
+        for name in self.texts:
+            size, = LENGTH.unpack_from(payload, offset)
+            offset += LENGTH.size
+            text = bytes(payload[offset:offset + size]).decode(format)
+            offset += size
+            if text or name not in self.optional:
+                message[name] = text
+        return message
+
+
+LAYOUTS = {type: MessageSchema(type, fields) for type, fields in SCHEMAS.items()}
+KEY_SETS = {key_set: layout for layout in LAYOUTS.values() for key_set in layout.keySets()}
+
+
+class BinaryCodec:
+    """
+    Codifica as mensagens com cabeçalho de tamanho fixo e campos tipados; mensagens
+    que não seguem nenhum layout conhecido (como os lotes) seguem como JSON
+        Atributos:
+            buffer (bytearray): bytes recebidos que ainda não formam uma mensagem completa
+            format (str): formato da codificação de caracteres
+            max_size (int): tamanho máximo aceito para uma mensagem
+    """
+
+    name = "binary"
+
+    def __init__(self, format='utf-8', max_size=1 << 20):
+        """
+        Método construtor da classe
+            Parâmetros:
+                format (str): formato da codificação de caracteres
+                max_size (int): tamanho máximo aceito para uma mensagem
+        """
+        self.buffer = bytearray()
+        self.format = format
+        self.max_size = max_size
+
+    def __iter__(self):
+        message = self.next()
+        while message is not None:
+            yield message
+            message = self.next()
+
+    def feed(self, data):
+        """
+        Adiciona bytes recebidos e retorna as mensagens que ficaram completas
+            Parâmetros:
+                data (bytes): bytes lidos do socket
+            Retornos:
+                messages (list): mensagens completas, já convertidas para dicionário
+        """
+        self.buffer += data
+        return list(self)
+
+    def next(self):
+        """
+        Retira do buffer a próxima mensagem completa
+            Retornos:
+                message (dict): mensagem convertida para dicionário, ou None caso ainda não haja uma completa
+        """
+        if len(self.buffer) < HEADER.size:
+            return None
+        version, type, request_id, size = HEADER.unpack_from(self.buffer, 0)
+        if version != VERSION or size > self.max_size:
+            self.buffer.clear()
+            raise ValueError("Mensagem binária inválida")
+        end = HEADER.size + size
+        if len(self.buffer) < end:
+            return None
+
+        payload = memoryview(self.buffer)[HEADER.size:end]
+        try:
+            if type == TYPE_JSON:
+                message = json.loads(bytes(payload).decode(self.format))
+            else:
+                message = LAYOUTS[type].unpack(payload, self.format)
+        finally:
+            payload.release()
+        del self.buffer[:end]
+
+        if request_id:
+            message["id"] = request_id
+        return message
+
+    def encode(self, message):
+        """
+        Codifica uma mensagem no formato binário
+            Parâmetros:
+                message (str | dict): mensagem em JSON (texto ou dicionário)
+            Retornos:
+                frame (bytes): cabeçalho seguido do conteúdo da mensagem
+        """
+        if isinstance(message, str):
+            message = json.loads(message)
+        request_id = message.get("id", 0)
+        keys = message.keys() - {"id"}
+        layout = KEY_SETS.get(frozenset(keys))
+
+        payload = None
+        if layout:
+            try:
+                payload = layout.pack(message, self.format)
+                type = layout.type
+            except (ValueError, struct.error):
+                payload = None
+        if payload is None:
+            type = TYPE_JSON
+            payload = json.dumps(message, ensure_ascii=False).encode(self.format)
+        return HEADER.pack(VERSION, type, request_id, len(payload)) + payload
+
+
+CODECS = {"json": FrameReader, "binary": BinaryCodec}
+
+
+class ProtocolSession:
+    """
+    Estado do protocolo de uma conexão entre servidor local e servidor central.
+    A conexão começa em JSON e pode passar para o formato binário após a negociação
+    (mensagem "hello"), o que mantém compatíveis as pontas que não a conhecem
+        Atributos:
+            codec (FrameReader | BinaryCodec): codificação em uso na conexão
+            format (str): formato da codificação de caracteres
+            supported (tuple): protocolos aceitos por esta ponta, em ordem de preferência
+    """
+
+    def __init__(self, format='utf-8', supported=PROTOCOLS):
+        """
+        Método construtor da classe
+            Parâmetros:
+                format (str): formato da codificação de caracteres
+                supported (tuple): protocolos aceitos por esta ponta, em ordem de preferência
+        """
+        self.format = format
+        self.supported = supported
+        self.codec = FrameReader(format)
+
+    @property
+    def protocol(self):
+        return self.codec.name
+
+    def encode(self, message):
+        return self.codec.encode(message)
+
+    def switch(self, protocol):
+        """
+        Troca a codificação da conexão, repassando os bytes já recebidos ao novo codec
+            Parâmetros:
+                protocol (str): nome do protocolo escolhido
+        """
+        pending = self.codec.buffer
+        self.codec = CODECS[protocol](self.format)
+        self.codec.buffer += pending
+
+    def hello(self):
+        """
+        Retorna a mensagem de negociação enviada pelo cliente ao conectar
+        """
+        return encodeMessage({"hello": {"protocols": list(self.supported), "version": VERSION}}, self.format)
+
+    def receive(self, data):
+        """
+        Lê os bytes recebidos pelo servidor, respondendo à negociação de protocolo
+            Parâmetros:
+                data (bytes): bytes lidos do socket
+            Retornos:
+                messages (list): mensagens completas recebidas
+                reply (bytes): resposta da negociação a ser enviada antes das demais respostas
+        """
+        self.codec.buffer += data
+        messages = []
+        reply = b""
+        for message in self.codec:
+            if "hello" in message:
+                offered = message["hello"].get("protocols", [])
+                protocol = next((name for name in self.supported if name in offered), "json")
+                version = min(VERSION, int(message["hello"].get("version", VERSION)))
+                reply += encodeMessage({"hello": {"protocol": protocol, "version": version}}, self.format)
+                # As mensagens seguintes já chegam na codificação escolhida
+                self.switch(protocol)
+                more, more_reply = self.receive(b"")
+                return messages + more, reply + more_reply
+            messages.append(message)
+        return messages, reply
+
+    def accept(self, message):
+        """
+        Aplica a resposta do servidor à negociação feita pelo cliente
+            Parâmetros:
+                message (dict): resposta recebida do servidor
+            Retornos:
+                accepted (bool): indica se a mensagem era a resposta da negociação
+        """
+        if "hello" not in message:
+            return False
+        self.switch(message["hello"].get("protocol", "json"))
+        return True
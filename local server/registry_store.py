@@ -0,0 +1,146 @@
+import mmap
+import os
+import struct
+
+
+MAGIC = b"PSR1"
+HEADER = struct.Struct("<4sI")
+RECORD = struct.Struct("<BiiH")
+
+OP_REMOVE = 0
+OP_UPDATE = 1
+
+
+class RegistryStore:
+    """
+    Guarda em disco o registro de postos de carregamento, como um snapshot compacto
+    e um log com as atualizações feitas depois dele
+        Atributos:
+            snapshot_path (str): caminho do arquivo de snapshot
+            log_path (str): caminho do arquivo de log
+            log (file): log aberto para acréscimo de registros
+            log_records (int): quantidade de registros no log desde o último snapshot
+            compact_every (int): quantidade de registros no log que indica a hora de gerar um novo snapshot
+            format (str): formato da codificação de caracteres
+    """
+
+    def __init__(self, directory, compact_every=10000):
+        """
+        Método construtor da classe
+            Parâmetros:
+                directory (str): diretório dos arquivos do registro
+                compact_every (int): quantidade de registros no log que indica a hora de gerar um novo snapshot
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, "stations.snapshot")
+        self.log_path = os.path.join(directory, "stations.log")
+        self.log = None
+        self.log_records = 0
+        self.compact_every = compact_every
+        self.format = 'utf-8'
+
+    def load(self):
+        """
+        Lê o snapshot mapeado em memória e aplica o log sobre ele
+            Retornos:
+                stations (dict): localização e fila de cada posto, indexadas pelo código
+        """
+        stations = {}
+        if os.path.exists(self.snapshot_path) and os.path.getsize(self.snapshot_path) >= HEADER.size:
+            with open(self.snapshot_path, "rb") as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, count = HEADER.unpack_from(data, 0)
+                if magic == MAGIC:
+                    self.readRecords(data, HEADER.size, stations)
+
+        self.log_records = 0
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path):
+            with open(self.log_path, "rb") as file:
+                data = file.read()
+            end, self.log_records = self.readRecords(data, 0, stations)
+            if end < len(data):
+                # Descarta um registro incompleto deixado por uma queda do servidor
+                with open(self.log_path, "r+b") as file:
+                    file.truncate(end)
+
+        self.log = open(self.log_path, "ab")
+        return stations
+
+    def readRecords(self, data, offset, stations):
+        """
+        Aplica os registros de um buffer ao dicionário de postos
+            Parâmetros:
+                data (bytes): conteúdo do snapshot ou do log
+                offset (int): posição do primeiro registro
+                stations (dict): postos lidos até o momento
+            Retornos:
+                end (int): posição seguinte ao último registro completo
+                count (int): quantidade de registros lidos
+        """
+        count = 0
+        while offset + RECORD.size <= len(data):
+            op, location, queue, size = RECORD.unpack_from(data, offset)
+            end = offset + RECORD.size + size
+            if end > len(data):
+                break
+            code = bytes(data[offset + RECORD.size:end]).decode(self.format)
+            if op == OP_UPDATE:
+                stations[code] = (location, queue)
+            else:
+                stations.pop(code, None)
+            offset = end
+            count += 1
+        return offset, count
+
+    def encode(self, op, code, location=0, queue=0):
+        code = str(code).encode(self.format)
+        return RECORD.pack(op, location, queue, len(code)) + code
+
+    def append(self, code, location, queue):
+        """
+        Acrescenta ao log a atualização de um posto
+            Parâmetros:
+                code (str): código do posto
+                location (int): localização do posto
+                queue (int): tamanho da fila de carros do posto
+        """
+        self.write(self.encode(OP_UPDATE, code, location, queue))
+
+    def appendRemoval(self, code):
+        """
+        Acrescenta ao log a remoção de um posto
+            Parâmetros:
+                code (str): código do posto
+        """
+        self.write(self.encode(OP_REMOVE, code))
+
+    def write(self, record):
+        if self.log is None:
+            self.log = open(self.log_path, "ab")
+        self.log.write(record)
+        self.log.flush()
+        self.log_records += 1
+
+    def needsCompaction(self):
+        return self.log_records >= self.compact_every
+
+    def compact(self, stations):
+        """
+        Grava um novo snapshot com o estado atual e esvazia o log
+            Parâmetros:
+                stations (iterable): tuplas (código, localização, fila) de todos os postos
+        """
+        records = [self.encode(OP_UPDATE, code, location, queue) for code, location, queue in stations]
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(records)))
+            file.write(b"".join(records))
+            file.flush()
+            os.fsync(file.fileno())
+        # A troca do arquivo é atômica, então uma queda nunca deixa um snapshot pela metade
+        os.replace(temp_path, self.snapshot_path)
+
+        if self.log is not None:
+            self.log.close()
+        self.log = open(self.log_path, "wb")
+        self.log_records = 0
@@ -0,0 +1,141 @@
+import heapq
+import threading
+from time import monotonic
+
+
+class ReservationBook:
+    """
+    Guarda as reservas provisórias de vagas dos carros que foram encaminhados a um
+    posto e ainda não chegaram, para que a fila considerada na escolha do posto
+    inclua os carros que já estão a caminho
+        Atributos:
+            ttl (float): tempo, em segundos, até uma reserva não confirmada expirar
+            stations (dict): reservas ativas de cada posto (código do carro -> expiração), indexadas pelo código do posto
+            cars (dict): posto reservado por cada carro
+            expirations (list): heap com (expiração, código do posto, código do carro)
+            created (int): quantidade de reservas feitas
+            confirmed (int): quantidade de reservas confirmadas pela chegada do carro
+            expired (int): quantidade de reservas expiradas
+            lock (threading.Lock): protege as reservas do acesso simultâneo de várias threads
+    """
+
+    def __init__(self, ttl=60):
+        """
+        Método construtor da classe
+            Parâmetros:
+                ttl (float): tempo, em segundos, até uma reserva não confirmada expirar
+        """
+        self.ttl = ttl
+        self.stations = {}
+        self.cars = {}
+        self.expirations = []
+        self.created = 0
+        self.confirmed = 0
+        self.expired = 0
+        self.lock = threading.Lock()
+
+    def count(self, code):
+        """
+        Retorna a quantidade de reservas ativas de um posto
+            Parâmetros:
+                code (str): código do posto
+        """
+        return len(self.stations.get(code, ()))
+
+    def counts(self):
+        """
+        Retorna a quantidade de reservas ativas de cada posto que possui alguma reserva
+        """
+        with self.lock:
+            return {code: len(reserved) for code, reserved in self.stations.items()}
+
+    def reserve(self, code, car, now=None):
+        """
+        Reserva uma vaga para um carro, substituindo a reserva anterior do mesmo carro
+            Parâmetros:
+                code (str): código do posto
+                car (str): código do carro
+                now (float): instante atual
+            Retornos:
+                changed (list): códigos dos postos cuja quantidade de reservas mudou
+        """
+        now = monotonic() if now is None else now
+        with self.lock:
+            previous = self.cars.get(car)
+            # Um carro que pede de novo o mesmo posto apenas renova a reserva
+            changed = [] if previous == code else [code]
+            if previous is not None and previous != code:
+                self.discard(previous, car)
+                changed.append(previous)
+
+            expiration = now + self.ttl
+            self.stations.setdefault(code, {})[car] = expiration
+            self.cars[car] = code
+            heapq.heappush(self.expirations, (expiration, code, car))
+            self.created += 1
+            return changed
+
+    def confirm(self, code, arrivals):
+        """
+        Confirma as reservas mais antigas de um posto quando a sua fila aumenta
+            Parâmetros:
+                code (str): código do posto
+                arrivals (int): quantidade de carros que chegaram ao posto
+            Retornos:
+                changed (bool): indica se alguma reserva foi confirmada
+        """
+        with self.lock:
+            reserved = self.stations.get(code)
+            if not reserved or arrivals < 1:
+                return False
+            # Os dicionários mantêm a ordem de inserção, então os primeiros
+            # carros são os que reservaram há mais tempo
+            for car in list(reserved)[:arrivals]:
+                self.discard(code, car)
+                self.confirmed += 1
+            return True
+
+    def expire(self, now=None):
+        """
+        Remove as reservas vencidas, olhando apenas o início do heap de expirações
+            Parâmetros:
+                now (float): instante atual
+            Retornos:
+                changed (set): códigos dos postos cuja quantidade de reservas mudou
+        """
+        now = monotonic() if now is None else now
+        changed = set()
+        with self.lock:
+            while self.expirations and self.expirations[0][0] <= now:
+                expiration, code, car = heapq.heappop(self.expirations)
+                reserved = self.stations.get(code)
+                # Entradas de reservas já confirmadas ou renovadas são descartadas
+                if reserved and reserved.get(car) == expiration:
+                    self.discard(code, car)
+                    self.expired += 1
+                    changed.add(code)
+        return changed
+
+    def discard(self, code, car):
+        """
+        Remove a reserva de um carro, sem deixar postos sem reservas no dicionário
+            Parâmetros:
+                code (str): código do posto
+                car (str): código do carro
+        """
+        reserved = self.stations[code]
+        reserved.pop(car, None)
+        if self.cars.get(car) == code:
+            del self.cars[car]
+        if not reserved:
+            del self.stations[code]
+
+    def stats(self):
+        """
+        Retorna os contadores das reservas
+        """
+        return {
+            "active": len(self.cars),
+            "created": self.created,
+            "confirmed": self.confirmed,
+            "expired": self.expired}
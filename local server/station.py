@@ -1,3 +1,6 @@
+from array import array
+
+
 class Station:
     """
     Guarda informações dos postos de carregamento nos servidores
@@ -37,3 +40,154 @@ class Station:
                 other_station: outra estação que se deseja medir a distância
         """
         return abs(self.location - other_station)
+
+
+class StationTable:
+    """
+    Tabela colunar dos postos de carregamento, com a localização e a fila de todos
+    os postos guardadas em vetores tipados e um índice do código para a linha
+        Atributos:
+            locations (array): localização de cada posto
+            queues (array): tamanho da fila de carros de cada posto
+            codes (list): código de cada posto
+            rows (dict): linha de cada posto na tabela, indexada pelo código
+    """
+
+    def __init__(self):
+        """
+        Método construtor da classe
+        """
+        self.locations = array("i")
+        self.queues = array("i")
+        self.codes = []
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self.rows
+
+    def upsert(self, code, location, queue):
+        """
+        Insere ou atualiza um posto
+            Parâmetros:
+                code (str): código do posto
+                location (int): localização do posto
+                queue (int): tamanho da fila de carros do posto
+            Retornos:
+                row (int): linha do posto na tabela
+        """
+        row = self.rows.get(code)
+        if row is None:
+            row = len(self.codes)
+            self.rows[code] = row
+            self.codes.append(code)
+            self.locations.append(location)
+            self.queues.append(queue)
+        else:
+            self.locations[row] = location
+            self.queues[row] = queue
+        return row
+
+    def upsertMany(self, stations):
+        """
+        Insere ou atualiza vários postos de uma vez
+            Parâmetros:
+                stations (iterable): tuplas (código, localização, fila)
+        """
+        for code, location, queue in stations:
+            self.upsert(code, location, queue)
+
+    def setQueue(self, code, queue):
+        """
+        Atualiza a fila de um posto já registrado
+            Parâmetros:
+                code (str): código do posto
+                queue (int): tamanho da fila de carros do posto
+        """
+        self.queues[self.rows[code]] = queue
+
+    def remove(self, code):
+        """
+        Remove um posto, movendo o último posto da tabela para a linha liberada
+            Parâmetros:
+                code (str): código do posto
+            Retornos:
+                removed (bool): indica se o posto estava registrado
+        """
+        row = self.rows.pop(code, None)
+        if row is None:
+            return False
+        last = len(self.codes) - 1
+        if row != last:
+            moved = self.codes[last]
+            self.codes[row] = moved
+            self.locations[row] = self.locations[last]
+            self.queues[row] = self.queues[last]
+            self.rows[moved] = row
+        self.codes.pop()
+        self.locations.pop()
+        self.queues.pop()
+        return True
+
+    def get(self, code):
+        """
+        Retorna uma cópia do posto como Station, ou None caso ele não esteja registrado
+            Parâmetros:
+                code (str): código do posto
+        """
+        row = self.rows.get(code)
+        if row is None:
+            return None
+        return Station(self.locations[row], code, self.queues[row])
+
+    def queue(self, code):
+        return self.queues[self.rows[code]]
+
+    def location(self, code):
+        return self.locations[self.rows[code]]
+
+    def getJson(self, code):
+        """
+        Retorna as informações de um posto no mesmo formato de Station.getJson
+            Parâmetros:
+                code (str): código do posto
+        """
+        row = self.rows[code]
+        json_code = "{\"code\": \"" + str(code) + "\", "
+        json_location = "\"location\": \"" + str(self.locations[row]) + "\", "
+        json_queue = "\"queue\": \"" + str(self.queues[row]) + "\"}"
+        return json_code + json_location + json_queue
+
+    def getInfo(self, code):
+        """
+        Retorna as informações de um posto como dicionário, com os mesmos campos de getJson
+            Parâmetros:
+                code (str): código do posto
+        """
+        row = self.rows[code]
+        return {"code": str(code), "location": str(self.locations[row]), "queue": str(self.queues[row])}
+
+    def distance(self, code, other_station):
+        """
+        Retorna a distância entre um posto e uma outra localização especificada
+            Parâmetros:
+                code (str): código do posto
+                other_station: localização que se deseja medir a distância
+        """
+        return abs(self.locations[self.rows[code]] - other_station)
+
+    def distances(self, other_station):
+        """
+        Retorna a distância de todos os postos, na ordem das linhas, até uma localização
+            Parâmetros:
+                other_station: localização que se deseja medir a distância
+        """
+        return [abs(location - other_station) for location in self.locations]
+
+    def items(self):
+        """
+        Percorre os postos como tuplas (código, localização, fila)
+        """
+        return zip(self.codes, self.locations, self.queues)
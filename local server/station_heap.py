@@ -0,0 +1,102 @@
+class StationHeap:
+    """
+    Heap mínimo indexado dos postos de carregamento, ordenado pela fila efetiva de cada
+    posto. O índice guarda a posição de cada posto no heap, o que permite atualizar ou
+    remover um posto sem percorrer os demais
+        Atributos:
+            heap (list): pares [fila, código] organizados como heap mínimo
+            positions (dict): posição de cada posto no heap, indexada pelo código
+    """
+
+    def __init__(self):
+        """
+        Método construtor da classe
+        """
+        self.heap = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, code):
+        return code in self.positions
+
+    def update(self, code, queue):
+        """
+        Insere um posto ou altera a sua fila em O(log n)
+            Parâmetros:
+                code (str): código do posto
+                queue (int): fila efetiva do posto
+        """
+        position = self.positions.get(code)
+        if position is None:
+            self.heap.append([queue, code])
+            self.positions[code] = len(self.heap) - 1
+            self.siftUp(len(self.heap) - 1)
+            return
+        old_queue = self.heap[position][0]
+        self.heap[position][0] = queue
+        if queue < old_queue:
+            self.siftUp(position)
+        elif queue > old_queue:
+            self.siftDown(position)
+
+    def remove(self, code):
+        """
+        Remove um posto do heap em O(log n)
+            Parâmetros:
+                code (str): código do posto
+            Retornos:
+                removed (bool): indica se o posto estava no heap
+        """
+        position = self.positions.pop(code, None)
+        if position is None:
+            return False
+        last = self.heap.pop()
+        if position < len(self.heap):
+            self.heap[position] = last
+            self.positions[last[1]] = position
+            self.siftUp(position)
+            self.siftDown(self.positions[last[1]])
+        return True
+
+    def top(self):
+        """
+        Retorna, em O(1), a tupla (fila, código) do posto com a menor fila efetiva,
+        ou None caso o heap esteja vazio
+        """
+        if not self.heap:
+            return None
+        queue, code = self.heap[0]
+        return queue, code
+
+    def siftUp(self, position):
+        heap = self.heap
+        item = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if heap[parent] <= item:
+                break
+            heap[position] = heap[parent]
+            self.positions[heap[position][1]] = position
+            position = parent
+        heap[position] = item
+        self.positions[item[1]] = position
+
+    def siftDown(self, position):
+        heap = self.heap
+        size = len(heap)
+        item = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if item <= heap[child]:
+                break
+            heap[position] = heap[child]
+            self.positions[heap[position][1]] = position
+            position = child
+        heap[position] = item
+        self.positions[item[1]] = position
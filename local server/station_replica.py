@@ -0,0 +1,115 @@
+import threading
+
+from station_index import StationIndex
+
+
+class StationReplica:
+    """
+    Cópia local dos postos de todas as localidades, mantida pelo servidor central com
+    um retrato inicial seguido de alterações numeradas em sequência. Permite escolher
+    um posto de outra localidade sem consultar o servidor central
+        Atributos:
+            index (StationIndex): postos de todas as localidades, por localização e fila
+            sequence (int): número da última alteração aplicada
+            synced (bool): indica se a cópia está completa e em ordem com o servidor central
+            snapshots (int): quantidade de retratos recebidos
+            deltas (int): quantidade de alterações aplicadas
+            gaps (int): quantidade de falhas na sequência que exigiram um novo retrato
+            network (RoadNetwork): malha viária, ou None para distâncias em linha reta
+            lock (threading.Lock): protege a cópia, alterada pela thread de leitura da conexão
+    """
+
+    def __init__(self, network=None):
+        """
+        Método construtor da classe
+            Parâmetros:
+                network (RoadNetwork): malha viária, ou None para distâncias em linha reta
+        """
+        self.index = StationIndex()
+        self.sequence = 0
+        self.synced = False
+        self.snapshots = 0
+        self.deltas = 0
+        self.gaps = 0
+        self.network = network
+        self.lock = threading.Lock()
+
+    def applySnapshot(self, snapshot):
+        """
+        Substitui a cópia pelo retrato enviado pelo servidor central
+            Parâmetros:
+                snapshot (dict): número de sequência e lista de postos (código, localização, fila)
+        """
+        index = StationIndex()
+        for code, location, queue in snapshot["stations"]:
+            index.update(code, int(location), int(queue))
+        with self.lock:
+            self.index = index
+            self.sequence = int(snapshot["seq"])
+            self.synced = True
+            self.snapshots += 1
+
+    def applyDelta(self, delta):
+        """
+        Aplica uma alteração enviada pelo servidor central
+            Parâmetros:
+                delta (dict): número de sequência, postos alterados e códigos dos postos removidos
+            Retornos:
+                resync (bool): indica se houve uma falha na sequência e é preciso pedir um novo retrato
+        """
+        sequence = int(delta["seq"])
+        with self.lock:
+            # Enquanto o novo retrato não chega, as alterações são descartadas
+            if not self.synced or sequence <= self.sequence:
+                return False
+            if sequence != self.sequence + 1:
+                self.synced = False
+                self.gaps += 1
+                return True
+            for code, location, queue in delta.get("stations", []):
+                self.index.update(code, int(location), int(queue))
+            for code in delta.get("removed", []):
+                self.index.remove(code)
+            self.sequence = sequence
+            self.deltas += 1
+            return False
+
+    def best(self, location, time_left, max_queue=25):
+        """
+        Retorna o posto de outra localidade com a menor fila alcançável antes da bateria acabar,
+        pelo mesmo critério do servidor central
+            Parâmetros:
+                location (int): localização do carro
+                time_left (int): tempo restante da bateria do carro
+                max_queue (int): tamanho de fila a partir do qual o posto é descartado
+            Retornos:
+                station (tuple): (código, localização, fila) do posto, ou None caso nenhum seja alcançável
+        """
+        with self.lock:
+            if not self.synced:
+                return None
+            if self.network is None:
+                # 5 unidades de tempo por unidade de distância
+                entry = self.index.bestEntry(location, (time_left - 1) // 5, max_queue)
+            else:
+                entry = self.index.bestWithin(location, self.network, time_left, max_queue)
+            if entry is None:
+                return None
+            queue, code = entry
+            station_location = self.index.entries[code][0]
+            # Conta o carro encaminhado até a próxima alteração enviada pelo servidor central
+            self.index.update(code, station_location, queue + 1)
+            return code, station_location, queue
+
+    def stats(self):
+        """
+        Retorna os contadores da cópia
+        """
+        with self.lock:
+            return {
+                "synced": self.synced,
+                "sequence": self.sequence,
+                "stations": len(self.index),
+                "snapshots": self.snapshots,
+                "deltas": self.deltas,
+                "gaps": self.gaps}
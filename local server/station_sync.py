@@ -0,0 +1,145 @@
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class StationSync:
+    """
+    Envio adiado das atualizações de postos para o servidor central. Guarda apenas o
+    estado mais recente de cada posto e envia as atualizações acumuladas em uma única
+    mensagem, a cada intervalo ou quando a quantidade de postos pendentes atinge o limite.
+    Um lote que não chega ao servidor central volta para a fila; um lote recusado por
+    ele é dividido ao meio até isolar e descartar as atualizações inválidas
+        Atributos:
+            send (function): envia uma mensagem ao servidor central e retorna um Future com a resposta
+            interval (float): tempo máximo, em segundos, que uma atualização aguarda o envio
+            max_pending (int): quantidade de postos pendentes que dispara o envio imediato
+            pending (dict): estado mais recente de cada posto ainda não enviado, indexado pelo código
+            splits (list): metades de lotes recusados, reenviadas separadamente
+            condition (threading.Condition): protege as atualizações pendentes e acorda a thread de envio
+            frames (int): quantidade de mensagens enviadas
+            sent (int): quantidade de atualizações enviadas
+            coalesced (int): atualizações substituídas por uma mais recente antes do envio
+            failed (int): mensagens que falharam e tiveram as atualizações devolvidas à fila
+            rejected (int): atualizações recusadas pelo servidor central e descartadas
+    """
+
+    def __init__(self, send, interval=0.5, max_pending=128):
+        """
+        Método construtor da classe
+            Parâmetros:
+                send (function): envia uma mensagem ao servidor central e retorna um Future com a resposta
+                interval (float): tempo máximo, em segundos, que uma atualização aguarda o envio
+                max_pending (int): quantidade de postos pendentes que dispara o envio imediato
+        """
+        self.send = send
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = {}
+        self.splits = []
+        self.condition = threading.Condition()
+        self.frames = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        thread = threading.Thread(target=self.syncLoop, daemon=True)
+        thread.start()
+
+    def push(self, station_info):
+        """
+        Agenda o envio do estado de um posto, substituindo o estado ainda não enviado
+            Parâmetros:
+                station_info (dict): informações do posto (código, localização e fila)
+        """
+        code = station_info.get("code")
+        with self.condition:
+            if code in self.pending:
+                self.coalesced += 1
+            self.pending[code] = station_info
+            if len(self.pending) >= self.max_pending:
+                self.condition.notify()
+
+    def syncLoop(self):
+        """
+        Envia periodicamente as atualizações acumuladas
+        """
+        while True:
+            with self.condition:
+                if len(self.pending) < self.max_pending and not self.splits:
+                    self.condition.wait(self.interval)
+                updates, self.pending = self.pending, {}
+                splits, self.splits = self.splits, []
+            for split in splits:
+                # Os postos com um estado mais recente seguem no lote normal
+                split = {code: station_info for code, station_info in split.items() if code not in updates}
+                if split:
+                    self.flush(split)
+            if updates:
+                self.flush(updates)
+
+    def flush(self, updates):
+        """
+        Envia um lote de atualizações sem esperar pela confirmação
+            Parâmetros:
+                updates (dict): estado de cada posto, indexado pelo código
+        """
+        with self.condition:
+            self.frames += 1
+            self.sent += len(updates)
+        future = self.send({"updates": list(updates.values())})
+        future.add_done_callback(lambda future: self.checkAck(future, updates))
+
+    def checkAck(self, future, updates):
+        """
+        Devolve à fila as atualizações de um lote que não chegou ao servidor central,
+        exceto as dos postos que já receberam um estado mais recente. Um lote recusado
+        não é reenviado inteiro, pois seria recusado de novo e bloquearia os seguintes
+            Parâmetros:
+                future (Future): resposta do servidor central
+                updates (dict): estado de cada posto enviado no lote
+        """
+        if future.cancelled() or future.exception() is not None:
+            with self.condition:
+                self.failed += 1
+                for code, station_info in updates.items():
+                    self.pending.setdefault(code, station_info)
+            log.warning("Falha ao enviar atualizações para o servidor central")
+            return
+        if future.result().get("result") == "1":
+            return
+        self.reject(updates)
+
+    def reject(self, updates):
+        """
+        Trata um lote recusado pelo servidor central: um lote com várias atualizações é
+        dividido ao meio e cada metade é reenviada; uma atualização sozinha é descartada
+            Parâmetros:
+                updates (dict): estado de cada posto enviado no lote
+        """
+        if len(updates) == 1:
+            with self.condition:
+                self.rejected += 1
+            log.warning("Atualização recusada pelo servidor central e descartada: %s", next(iter(updates.values())))
+            return
+        items = list(updates.items())
+        middle = len(items) // 2
+        with self.condition:
+            self.splits += [dict(items[:middle]), dict(items[middle:])]
+            self.condition.notify()
+
+    def stats(self):
+        """
+        Retorna os contadores do envio de atualizações
+        """
+        with self.condition:
+            return {
+                "pending": len(self.pending),
+                "frames": self.frames,
+                "sent": self.sent,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+                "rejected": self.rejected}
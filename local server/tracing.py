@@ -0,0 +1,105 @@
+import itertools
+import json
+import logging
+import os
+import signal
+from time import time
+
+log = logging.getLogger(__name__)
+
+
+class Tracer:
+    """
+    Registro em memória das etapas percorridas pelos pedidos de posto, identificados
+    por um id de rastreamento que segue em todas as mensagens do pedido. As etapas
+    ficam em um buffer circular de tamanho fixo, sobrescrevendo as mais antigas, e
+    registrar uma etapa não adquire locks nem aloca além da própria tupla
+        Atributos:
+            component (str): nome do processo, gravado em cada etapa
+            capacity (int): quantidade máxima de etapas guardadas
+            buffer (list): etapas registradas (id, componente, etapa, início, duração)
+            counter (itertools.count): posição da próxima etapa no buffer
+    """
+
+    def __init__(self, component="", capacity=1 << 14):
+        """
+        Método construtor da classe
+            Parâmetros:
+                component (str): nome do processo, gravado em cada etapa
+                capacity (int): quantidade máxima de etapas guardadas
+        """
+        self.component = component
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.counter = itertools.count()
+
+    def newTrace(self):
+        """
+        Retorna um novo id de rastreamento
+        """
+        return os.urandom(8).hex()
+
+    def record(self, trace, hop, started, finished=None):
+        """
+        Registra uma etapa de um pedido
+            Parâmetros:
+                trace (str): id de rastreamento do pedido; a etapa é ignorada caso seja vazio
+                hop (str): nome da etapa
+                started (float): instante de início, pelo relógio do sistema (time.time)
+                finished (float): instante de fim; agora, caso não seja informado
+        """
+        if not trace:
+            return
+        finished = time() if finished is None else finished
+        # next() em itertools.count é atômico, então threads diferentes nunca usam a mesma posição
+        self.buffer[next(self.counter) % self.capacity] = (trace, self.component, hop, started, finished - started)
+
+    def spans(self, trace=None):
+        """
+        Retorna as etapas guardadas, em ordem de início
+            Parâmetros:
+                trace (str): id de rastreamento; todas as etapas, caso não seja informado
+        """
+        spans = [span for span in list(self.buffer) if span is not None and (trace is None or span[0] == trace)]
+        spans.sort(key=lambda span: span[3])
+        return [
+            {"trace": trace, "component": component, "hop": hop, "start": started, "duration": duration}
+            for trace, component, hop, started, duration in spans]
+
+    def dump(self, path):
+        """
+        Grava as etapas guardadas em um arquivo, uma etapa em JSON por linha
+            Parâmetros:
+                path (str): caminho do arquivo
+            Retornos:
+                count (int): quantidade de etapas gravadas
+        """
+        spans = self.spans()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as output:
+            for span in spans:
+                output.write(json.dumps(span) + "\n")
+        return len(spans)
+
+    def dumpOnSignal(self, directory="traces"):
+        """
+        Grava as etapas em "directory" sempre que o processo receber SIGUSR2. Deve ser
+        chamado pela thread principal
+            Parâmetros:
+                directory (str): diretório dos arquivos gravados
+        """
+        if not hasattr(signal, "SIGUSR2"):
+            return
+
+        def handler(signum, frame):
+            path = os.path.join(directory, f"{self.component or 'process'}-{os.getpid()}.jsonl")
+            # Como no perfil por amostragem, o aviso sai mesmo sem LOG_LEVEL configurado
+            log.warning("%d etapas gravadas em %s", self.dump(path), path)
+
+        signal.signal(signal.SIGUSR2, handler)
+
+
+# Cada processo tem um único registro, compartilhado por todos os seus módulos
+tracer = Tracer()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# Os módulos de cada componente ficam no diretório do próprio componente, como nas
+# imagens Docker; os módulos compartilhados são cópias idênticas entre os diretórios
+for component in ("central server", "local server", "client car", "client power station"):
+    sys.path.insert(0, os.path.abspath(os.path.join(ROOT, component)))
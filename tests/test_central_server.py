@@ -0,0 +1,30 @@
+import pytest
+
+from central_server import CentralServer
+
+
+@pytest.fixture
+def central(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return CentralServer(cloud_host="127.0.0.1")
+
+
+@pytest.mark.parametrize("bad", [
+    {"code": "c", "location": str(2 ** 31), "queue": "0"},
+    {"code": "c", "location": "1", "queue": str(-2 ** 31 - 1)},
+    {"code": "c", "location": "1"},
+    {"code": "c", "location": "um", "queue": "0"},
+])
+def test_invalid_batch_is_rejected_before_any_change(central, bad):
+    central.applyStation("a", 1, 3)
+    updates = [{"code": "a", "location": "1", "queue": "0"}, {"code": "b", "location": "2", "queue": "0"}, bad]
+
+    assert central.processMessage({"updates": updates}) == {"result": "0"}
+    assert dict((code, (location, queue)) for code, location, queue in central.station_table.items()) == {"a": (1, 3)}
+    assert central.registry.log_records == 1
+
+
+def test_single_update_out_of_range_is_rejected(central):
+    assert central.processMessage({"code": "a", "location": "1", "queue": str(2 ** 40)}) == {"result": "0"}
+    assert "a" not in central.station_table
+    assert central.processMessage({"code": "a", "location": str(-2 ** 31), "queue": "0"}) == {"result": "1"}
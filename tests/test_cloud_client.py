@@ -0,0 +1,54 @@
+import asyncio
+import socket
+import threading
+from time import monotonic, sleep
+
+from central_server import CentralServer
+from cloud_client import CloudClient
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def connect(port, timeout):
+    client = CloudClient("127.0.0.1", port, timeout=timeout)
+    deadline = monotonic() + 5
+    while True:
+        try:
+            for connection in client.connections:
+                connection.connect(timeout=timeout)
+            return client
+        except OSError:
+            if monotonic() > deadline:
+                raise
+            sleep(0.05)
+
+
+def test_unknown_message_is_answered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    port = free_port()
+    central = CentralServer(cloud_host="127.0.0.1", cloud_port=port)
+    threading.Thread(target=asyncio.run, args=[central.conexaoAsync()], daemon=True).start()
+
+    client = connect(port, timeout=5)
+    started = monotonic()
+    assert client.call({"desconhecida": "1"}) == {"result": "0"}
+    assert monotonic() - started < 1
+    assert client.call({"stats": "1"})["stats"]["stations"] == 0
+
+
+def test_timed_out_request_leaves_pending():
+    # Um servidor que aceita a conexão e nunca responde
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+
+    client = connect(listener.getsockname()[1], timeout=0.2)
+    assert client.call({"stats": "1"}) is None
+    assert all(not connection.pending for connection in client.connections)
+    listener.close()
@@ -0,0 +1,35 @@
+import threading
+
+from dispatcher import KeyedDispatcher
+from metrics import MetricsRegistry
+
+
+def test_full_queue_drops_without_blocking():
+    registry = MetricsRegistry("test")
+    dispatcher = KeyedDispatcher(workers=1, max_queue=2, registry=registry)
+
+    # Sem threads de trabalho, a fila enche e as próximas tarefas são descartadas
+    queued = [dispatcher.submit("a", "queue", print) for _ in range(5)]
+
+    assert queued == [True, True, False, False, False]
+    assert dispatcher.metrics()["dropped"] == {"queue": 3}
+    assert dispatcher.metrics()["queue_depth"] == [2]
+
+
+def test_same_key_keeps_order():
+    dispatcher = KeyedDispatcher(workers=4, max_queue=100)
+    handled = []
+    done = threading.Event()
+
+    def handle(value):
+        handled.append(value)
+        if value == 49:
+            done.set()
+
+    dispatcher.start()
+    for value in range(50):
+        assert dispatcher.submit("posto", "queue", handle, value)
+
+    assert done.wait(5)
+    assert handled == list(range(50))
+    assert dispatcher.metrics()["dropped"] == {}
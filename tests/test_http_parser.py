@@ -0,0 +1,90 @@
+import json
+import random
+
+import pytest
+
+from http_parser import HttpParser
+
+
+def request(method, path, body=None, headers=()):
+    lines = [f"{method} {path} HTTP/1.1", "Host: carro"] + list(headers)
+    payload = b""
+    if body is not None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        lines.append(f"Content-Length: {len(payload)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+
+
+REQUESTS = [
+    request("GET", "/battery"),
+    request("POST", "/mode", {"mode": "1", "destino": "São Paulo"}),
+    request("GET", "/path", headers=["Connection: close"]),
+    request("POST", "/empty", {}),
+]
+
+
+def check(requests):
+    assert [(item.method, item.url_content) for item in requests] == [
+        ("GET", "/battery"), ("POST", "/mode"), ("GET", "/path"), ("POST", "/empty")]
+    assert requests[0].body == b"" and requests[0].json() == {}
+    assert requests[1].json() == {"mode": "1", "destino": "São Paulo"}
+    assert requests[1].keep_alive and not requests[2].keep_alive
+
+
+def test_pipelined_requests_in_one_read():
+    parser = HttpParser()
+    check(parser.feed(b"".join(REQUESTS)))
+    assert not parser.buffer and parser.current is None
+
+
+def test_byte_by_byte_and_random_splits():
+    stream = b"".join(REQUESTS)
+    parser = HttpParser()
+    received = []
+    for position in range(len(stream)):
+        received += parser.feed(stream[position:position + 1])
+    check(received)
+
+    rng = random.Random(23)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(stream)), 5))
+        parser = HttpParser()
+        received = []
+        for start, end in zip([0] + cuts, cuts + [len(stream)]):
+            received += parser.feed(stream[start:end])
+        check(received)
+
+
+def test_waits_for_the_whole_body():
+    parser = HttpParser()
+    data = REQUESTS[1]
+    assert parser.feed(data[:-3]) == []
+    assert parser.current is not None
+    assert len(parser.feed(data[-3:] + b"\r\n" + REQUESTS[0])) == 2
+
+
+def test_http_1_0_keep_alive():
+    parser = HttpParser()
+    plain, kept = parser.feed(
+        b"GET / HTTP/1.0\r\n\r\n"
+        b"GET / HTTP/1.0\r\nConnection: Keep-Alive\r\n\r\n")
+    assert not plain.keep_alive and kept.keep_alive
+
+
+@pytest.mark.parametrize("data", [
+    b"GET /\r\n\r\n",
+    b"GET / HTTP/2\r\n\r\n",
+    b"GET / HTTP/1.1\r\nsem separador\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: muitos\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n",
+    b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n",
+])
+def test_invalid_requests_are_rejected(data):
+    with pytest.raises(ValueError):
+        HttpParser().feed(data)
+
+
+def test_oversized_header_is_rejected():
+    parser = HttpParser(max_header=64)
+    with pytest.raises(ValueError):
+        parser.feed(b"GET / HTTP/1.1\r\n" + b"X: " + b"a" * 100)
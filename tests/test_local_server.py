@@ -0,0 +1,86 @@
+import json
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from local_server import LocalServer
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = LocalServer(1, cloud_host="127.0.0.1", cloud_port=1, network_path=None)
+    server.published = []
+    server.publish = lambda client, topic, message: server.published.append((topic, json.loads(message)))
+    server.notifyCloud = lambda message: None
+    return server
+
+
+def car(code, battery="10"):
+    return {"car": code, "location": "1", "battery": battery, "mode": "1"}
+
+
+def test_car_with_batched_request_stays_on_batch_path(server):
+    # Sem postos na localidade, o primeiro pedido vai para o lote
+    server.routeCar(None, car("x"))
+    assert [info["car"] for info in server.pending_cars] == ["x"]
+
+    server.registerStation({"code": "p1", "queue": "0"})
+    # O segundo pedido de "x" não pode ser respondido antes do primeiro
+    server.routeCar(None, car("x"))
+    server.routeCar(None, car("y"))
+    assert [info["car"] for info in server.pending_cars] == ["x", "x"]
+    assert [message["car"] for _, message in server.published] == ["y"]
+
+    server.releaseCars(server.pending_cars)
+    assert server.queued_cars == {}
+    server.routeCar(None, car("x"))
+    assert [message["car"] for _, message in server.published] == ["y", "x"]
+
+
+def test_invalid_request_is_answered_without_reserving(server):
+    server.registerStation({"code": "p1", "queue": "0"})
+    for info in ({"location": "1", "battery": "10", "mode": "1"}, car("x", battery=None), car("y", battery="baixa")):
+        server.routeCar(None, info)
+
+    assert [message for _, message in server.published] == [{"result": "posto não encontrado"}] * 3
+    assert server.reservations.stats()["active"] == 0
+    assert not server.pending_cars
+
+
+def test_failed_car_does_not_fail_the_batch(server, monkeypatch):
+    remote_path = server.remotePath
+
+    def failing(car_info):
+        if car_info["car"] == "ruim":
+            raise RuntimeError("falha")
+        return remote_path(car_info)
+
+    monkeypatch.setattr(server, "remotePath", failing)
+    monkeypatch.setattr(server, "communeWithCloud", lambda message: json.dumps(
+        {"batch": [{"car": request["car"], "code": "remoto"} for request in message["batch"]]}))
+
+    paths = server.getPathBatch([car("a"), car("ruim"), car("b")])
+    assert [path and json.loads(path)["car"] for path in paths] == ["a", None, "b"]
+
+
+def test_alive_ack_is_handled_off_the_reader_thread(server, monkeypatch):
+    server.registerStation({"code": "p1", "queue": "0"})
+    answer = Future()
+    monkeypatch.setattr(server.cloud, "request", lambda message: answer)
+    pushed = []
+    done = threading.Event()
+
+    def notify(message):
+        pushed.append((message["code"], threading.current_thread()))
+        done.set()
+
+    server.notifyCloud = notify
+    server.dispatcher.start()
+    server.notifyAlive(["p1"])
+    # A resposta é entregue por esta thread, no papel da thread de leitura da conexão
+    answer.set_result({"result": "1", "unknown": ["p1"]})
+
+    assert done.wait(5)
+    assert pushed[0][0] == "p1" and pushed[0][1] is not threading.current_thread()
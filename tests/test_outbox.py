@@ -0,0 +1,75 @@
+import threading
+
+from central_server import CentralServer
+from outbox import Outbox
+from station_replica import StationReplica
+
+
+def test_stalled_connection_drops_instead_of_blocking():
+    released = threading.Event()
+    written = []
+
+    def write(data):
+        released.wait(5)
+        written.append(data)
+
+    outbox = Outbox(write, max_bytes=10)
+    outbox.start()
+    assert outbox.put(b"12345")
+    assert outbox.put(b"67890")
+    # Com a fila cheia, as alterações são descartadas e o retrato entra mesmo assim
+    assert not outbox.put(b"x")
+    assert outbox.put(b"retrato", force=True)
+    assert outbox.dropped == 1
+
+    # Uma resposta espera por espaço até a conexão voltar a escrever
+    answered = threading.Thread(target=outbox.put, args=(b"resposta",), kwargs={"block": True})
+    answered.start()
+    answered.join(0.1)
+    assert answered.is_alive()
+    released.set()
+    answered.join(5)
+    assert not answered.is_alive()
+
+    outbox.close()
+    assert not outbox.put(b"depois")
+    assert written[:3] == [b"12345", b"67890", b"retrato"]
+
+
+def test_close_releases_blocked_sender():
+    outbox = Outbox(lambda data: None, max_bytes=1)
+    outbox.put(b"ab")
+    sender = threading.Thread(target=outbox.put, args=(b"c",), kwargs={"block": True})
+    sender.start()
+    outbox.close()
+    sender.join(5)
+    assert not sender.is_alive()
+
+
+def test_lagging_subscriber_resyncs_through_sequence_gap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    central = CentralServer(cloud_host="127.0.0.1")
+    replica = StationReplica()
+    stalled = [False]
+
+    def send(message, force=False):
+        if stalled[0] and not force:
+            return False
+        if "snapshot" in message:
+            replica.applySnapshot(message["snapshot"])
+        else:
+            send.resync |= replica.applyDelta(message["delta"])
+        return True
+
+    send.resync = False
+    central.processMessage({"subscribe": "stations"}, send)
+    central.processMessage({"code": "a", "location": "1", "queue": "0"})
+    stalled[0] = True
+    central.processMessage({"code": "a", "location": "1", "queue": "1"})
+    stalled[0] = False
+    central.processMessage({"code": "b", "location": "2", "queue": "0"})
+
+    assert send.resync and not replica.synced
+    # O novo pedido de inscrição traz um retrato em dia
+    central.processMessage({"subscribe": "stations"}, send)
+    assert replica.synced and replica.index.entries == {"a": (1, 1), "b": (2, 0)}
@@ -0,0 +1,43 @@
+import random
+import sys
+import threading
+
+from power_station import PowerStation
+
+
+def test_traffic_and_heartbeat_threads_share_the_schedule():
+    station = PowerStation(station_code=1, chargers=3)
+    errors = []
+
+    def traffic(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(5000):
+                operation = rng.choice(["entrance", "exit"])
+                station.applyTraffic({"operation": operation, "car": str(rng.randrange(30)), "battery": "40"})
+        except Exception as e:
+            errors.append(e)
+
+    def heartbeat():
+        try:
+            for _ in range(5000):
+                float(station.queueInfo()["free at"])
+        except Exception as e:
+            errors.append(e)
+
+    # Trocas de thread frequentes expõem as operações do heap intercaladas
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=traffic, args=[seed]) for seed in range(2)]
+        threads.append(threading.Thread(target=heartbeat))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert not errors
+    heap = station.scheduler.heap
+    assert all(heap[(i - 1) // 2] <= heap[i] for i in range(1, len(heap)))
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from protocol import HEADER, SCHEMAS, TYPE_JSON, BinaryCodec, FrameReader, ProtocolSession
+
+MESSAGES = [
+    {"code": "posto-1", "location": "12", "queue": "3"},
+    {"car": "carro-7", "location": "4", "battery": "18", "mode": "1", "time left": "40"},
+    {"car": "carro-7", "location": "9", "code": "posto-ç", "queue": "0"},
+    {"result": "1", "car": "carro-7"},
+    {"result": "0"},
+    {"car": "carro-7", "location": "4", "battery": "18", "mode": "1", "time left": "40", "trace": "ab12"},
+    # Sem layout: lotes e campos inteiros que não são números seguem como JSON
+    {"updates": [{"code": "1", "location": "2", "queue": "3"}]},
+    {"code": "posto-1", "location": "longe", "queue": "3"},
+]
+
+
+def same(message, decoded):
+    return {key: str(value) if not isinstance(value, list) else value for key, value in decoded.items()} == message
+
+
+def test_every_message_round_trips():
+    codec = BinaryCodec()
+    for request_id, message in enumerate(MESSAGES):
+        decoded = codec.feed(codec.encode(dict(message, id=request_id)))
+        assert len(decoded) == 1
+        assert decoded[0].pop("id", 0) == request_id
+        assert same(message, decoded[0])
+
+
+def test_layouts_are_used_for_known_messages():
+    codec = BinaryCodec()
+    types = [HEADER.unpack_from(codec.encode(message))[1] for message in MESSAGES]
+    assert types == [1, 2, 3, 4, 4, 6, TYPE_JSON, TYPE_JSON]
+    assert set(types) - {TYPE_JSON} == set(SCHEMAS)
+
+
+def test_partial_and_grouped_reads():
+    rng = random.Random(2)
+    codec = BinaryCodec()
+    stream = b"".join(codec.encode(dict(message, id=i + 1)) for i, message in enumerate(MESSAGES * 20))
+
+    received = []
+    offset = 0
+    while offset < len(stream):
+        size = rng.choice([1, 2, 7, 64, 500])
+        received += codec.feed(stream[offset:offset + size])
+        offset += size
+
+    assert [message.pop("id") for message in received] == list(range(1, len(MESSAGES) * 20 + 1))
+    assert all(same(message, decoded) for message, decoded in zip(MESSAGES * 20, received))
+    assert not codec.buffer
+
+
+def test_invalid_header_is_rejected():
+    codec = BinaryCodec(max_size=16)
+    with pytest.raises(ValueError):
+        codec.feed(HEADER.pack(1, 1, 0, 17))
+    with pytest.raises(ValueError):
+        codec.feed(HEADER.pack(9, 1, 0, 0))
+    assert not codec.buffer
+
+
+def test_negotiation_switches_both_ends():
+    client, server = ProtocolSession(), ProtocolSession()
+    # Os bytes que chegam junto com a negociação já estão na codificação escolhida
+    messages, reply = server.receive(client.hello() + BinaryCodec().encode(MESSAGES[0]))
+    assert server.protocol == "binary"
+    assert len(messages) == 1 and same(MESSAGES[0], messages[0])
+
+    assert client.accept(FrameReader().feed(reply)[0])
+    assert client.protocol == "binary"
+    messages, reply = server.receive(client.encode(MESSAGES[1]))
+    assert not reply and same(MESSAGES[1], messages[0])
+
+
+def test_negotiation_falls_back_to_json():
+    client, server = ProtocolSession(supported=("json",)), ProtocolSession()
+    messages, reply = server.receive(client.hello())
+    assert client.accept(FrameReader().feed(reply)[0])
+    assert client.protocol == server.protocol == "json"
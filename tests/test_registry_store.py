@@ -0,0 +1,62 @@
+import os
+import random
+
+from registry_store import RegistryStore
+
+
+def reopen(store):
+    store.log.close()
+    return RegistryStore(os.path.dirname(store.log_path), store.compact_every)
+
+
+def test_replay_matches_applied_updates(tmp_path):
+    rng = random.Random(17)
+    store = RegistryStore(str(tmp_path), compact_every=200)
+    assert store.load() == {}
+    expected = {}
+    for step in range(1500):
+        code = f"posto-{rng.randrange(80)}"
+        if rng.random() < 0.2:
+            store.appendRemoval(code)
+            expected.pop(code, None)
+        else:
+            location, queue = rng.randrange(-50, 50), rng.randrange(30)
+            store.append(code, location, queue)
+            expected[code] = (location, queue)
+        if store.needsCompaction():
+            store.compact((code, location, queue) for code, (location, queue) in expected.items())
+        if step % 250 == 0:
+            store = reopen(store)
+            assert store.load() == expected
+
+    store = reopen(store)
+    assert store.load() == expected
+    assert store.log_records < store.compact_every
+
+
+def test_truncated_record_is_discarded(tmp_path):
+    store = RegistryStore(str(tmp_path))
+    store.load()
+    store.append("a", 1, 2)
+    store.append("ç", 3, 4)
+    store.log.close()
+    # Uma queda no meio da escrita deixa o último registro incompleto
+    with open(store.log_path, "r+b") as file:
+        file.truncate(os.path.getsize(store.log_path) - 1)
+
+    store = RegistryStore(str(tmp_path))
+    assert store.load() == {"a": (1, 2)}
+    assert store.log_records == 1
+    store.append("b", 5, 6)
+    store = reopen(store)
+    assert store.load() == {"a": (1, 2), "b": (5, 6)}
+
+
+def test_log_after_snapshot_wins(tmp_path):
+    store = RegistryStore(str(tmp_path))
+    store.load()
+    store.compact([("a", 1, 1), ("b", 2, 2)])
+    store.append("a", 1, 9)
+    store.appendRemoval("b")
+    store = reopen(store)
+    assert store.load() == {"a": (1, 9)}
@@ -0,0 +1,50 @@
+import random
+
+from reservations import ReservationBook
+
+
+def test_matches_reference_model():
+    rng = random.Random(29)
+    book = ReservationBook(ttl=10)
+    # Modelo de referência: posto, expiração e ordem de chegada da reserva de cada carro
+    model = {}
+    order = 0
+    now = 0.0
+    for _ in range(4000):
+        now += rng.random()
+        code, car = str(rng.randrange(8)), str(rng.randrange(40))
+        operation = rng.random()
+        if operation < 0.5:
+            book.reserve(code, car, now)
+            # Renovar a reserva no mesmo posto mantém a posição na ordem de chegada
+            arrived = model[car][2] if car in model and model[car][0] == code else order
+            model[car] = (code, now + 10, arrived)
+            order += 1
+        elif operation < 0.7:
+            arrivals = rng.randint(0, 3)
+            oldest = sorted((arrived, other) for other, (reserved, _, arrived) in model.items() if reserved == code)
+            assert book.confirm(code, arrivals) == bool(oldest and arrivals)
+            for _, other in oldest[:arrivals]:
+                del model[other]
+        else:
+            expired = {car for car, (_, expiration, _) in model.items() if expiration <= now}
+            assert book.expire(now) == {model[car][0] for car in expired}
+            for car in expired:
+                del model[car]
+
+        assert book.counts() == {
+            code: count for code in map(str, range(8))
+            if (count := sum(reserved == code for reserved, _, _ in model.values()))}
+        assert book.cars == {car: reserved for car, (reserved, _, _) in model.items()}
+
+
+def test_changed_stations():
+    book = ReservationBook(ttl=5)
+    assert book.reserve("a", "carro", 0.0) == ["a"]
+    assert book.reserve("a", "carro", 1.0) == []
+    assert book.reserve("b", "carro", 2.0) == ["b", "a"]
+    assert book.count("a") == 0 and book.count("b") == 1
+    # A entrada antiga do heap não expira a reserva renovada
+    assert book.expire(6.5) == set()
+    assert book.expire(7.0) == {"b"}
+    assert book.stats() == {"active": 0, "created": 3, "confirmed": 0, "expired": 1}
@@ -0,0 +1,62 @@
+import json
+import random
+
+import pytest
+
+from road_network import INF, RoadNetwork
+
+
+def floyd(nodes, edges):
+    distances = {(a, b): 0.0 if a == b else INF for a in nodes for b in nodes}
+    for start, end, travel_time in edges:
+        for pair in ((start, end), (end, start)):
+            distances[pair] = min(distances[pair], float(travel_time))
+    for middle in nodes:
+        for a in nodes:
+            for b in nodes:
+                if distances[a, middle] + distances[middle, b] < distances[a, b]:
+                    distances[a, b] = distances[a, middle] + distances[middle, b]
+    return distances
+
+
+@pytest.mark.parametrize("precompute_limit", [512, 0])
+def test_distances_match_floyd_warshall(precompute_limit):
+    rng = random.Random(31)
+    nodes = list(range(25))
+    # Arestas repetidas e uma localização isolada (24) fazem parte do caso
+    edges = [(rng.randrange(24), rng.randrange(24), rng.randint(1, 9)) for _ in range(45)]
+    network = RoadNetwork(edges, nodes, precompute_limit=precompute_limit, max_trees=4)
+    expected = floyd(nodes, edges)
+
+    for _ in range(300):
+        source, target, limit = rng.randrange(25), rng.randrange(25), rng.randint(0, 20)
+        assert network.distance(source, target) == expected[source, target]
+        within = network.within(source, limit)
+        assert set(within) == {other for other in nodes if expected[source, other] < limit}
+        assert [expected[source, other] for other in within] == sorted(expected[source, other] for other in within)
+
+    stats = network.stats()
+    assert stats["precomputed"] == (precompute_limit > 0)
+    assert stats["trees"] == (25 if precompute_limit else 4)
+
+
+def test_least_recently_used_trees_are_dropped():
+    network = RoadNetwork([(0, 1, 1), (1, 2, 1), (2, 3, 1)], precompute_limit=0, max_trees=2)
+    network.distance(0, 3)
+    network.distance(1, 3)
+    network.distance(0, 3)
+    network.distance(2, 3)
+    assert list(network.trees) == [0, 2]
+    assert (network.hits, network.misses) == (1, 3)
+
+
+def test_load_and_validation(tmp_path):
+    path = tmp_path / "malha.json"
+    path.write_text(json.dumps({"nodes": [7], "edges": [[1, 2, 2.5]]}))
+    network = RoadNetwork.load(str(path))
+    assert len(network) == 3
+    assert network.distance(2, 1) == 2.5
+    assert network.distance(1, 7) == INF
+    assert network.within(7, 100) == [7]
+    with pytest.raises(ValueError):
+        RoadNetwork([(1, 2, -1)])
@@ -0,0 +1,132 @@
+import random
+
+from central_server import CentralServer
+from road_network import RoadNetwork
+from route_cache import RouteCache
+from station_index import StationIndex
+
+
+def route(cache, index, location, reach):
+    found, best = cache.get(location, reach)
+    if not found:
+        candidates, bound = index.bestEntries(location, reach, cache.keep)
+        cache.put(location, reach, candidates, bound)
+        best = candidates[0] if candidates else None
+    return best
+
+
+def test_repeated_requests_are_served_from_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    central = CentralServer(cloud_host="127.0.0.1")
+    for i in range(50):
+        central.applyStation(str(i), 10 + i % 5, i % 7)
+
+    codes = [central.chooseBestStation({"car": str(car), "location": "8", "time left": "30"}).get("code")
+             for car in range(300)]
+
+    stats = central.route_cache.stats()
+    assert stats["hits"] > 250
+    assert stats["updates"] > 0
+    # As reservas distribuem os carros entre os postos de menor fila
+    assert len(set(codes)) > 1
+
+
+def test_winner_queue_increase_updates_entry_in_place():
+    index, cache = StationIndex(), RouteCache(keep=1)
+    index.update("a", 2, 0)
+    index.update("b", 3, 3)
+    assert route(cache, index, 1, 5) == (0, "a")
+
+    for queue in (1, 2):
+        index.update("a", 2, queue)
+        cache.invalidate(2, queue, "a")
+        assert cache.get(1, 5) == (True, (queue, "a"))
+
+    # Com fila 4, o posto "a" passa do limite dos demais e a resposta é recalculada
+    index.update("a", 2, 4)
+    cache.invalidate(2, 4, "a")
+    assert cache.get(1, 5) == (False, None)
+    assert route(cache, index, 1, 5) == (3, "b")
+
+
+def test_reservations_reorder_kept_candidates():
+    index, cache = StationIndex(), RouteCache()
+    for code in "abc":
+        index.update(code, 2, 0)
+    assert route(cache, index, 1, 5) == (0, "a")
+
+    index.update("a", 2, 1)
+    cache.invalidate(2, 1, "a")
+    assert cache.get(1, 5) == (True, (0, "b"))
+
+
+def test_better_station_and_removed_winner_update_entry():
+    index, cache = StationIndex(), RouteCache()
+    index.update("a", 2, 5)
+    route(cache, index, 1, 5)
+
+    index.update("b", 3, 1)
+    cache.invalidate(3, 1, "b")
+    assert cache.get(1, 5) == (True, (1, "b"))
+
+    index.remove("b")
+    cache.invalidate(3, None, "b")
+    assert cache.get(1, 5) == (True, (5, "a"))
+
+    # Sem nenhum posto guardado e com outros postos ainda alcançáveis, a resposta é descartada
+    index.remove("a")
+    cache.invalidate(2, None, "a")
+    assert route(cache, index, 1, 5) is None
+    index.update("c", 4, 30)
+    cache.invalidate(4, 30, "c")
+    assert cache.get(1, 5) == (True, None)
+
+
+def test_station_out_of_reach_keeps_entry():
+    index, cache = StationIndex(), RouteCache()
+    index.update("a", 2, 5)
+    route(cache, index, 1, 2)
+
+    index.update("far", 20, 0)
+    cache.invalidate(20, 0, "far")
+    assert cache.get(1, 2) == (True, (5, "a"))
+
+
+def test_matches_index_under_random_updates():
+    rng = random.Random(7)
+    index, cache = StationIndex(), RouteCache(max_size=64, keep=3)
+    for step in range(5000):
+        if rng.random() < 0.4:
+            code, location, queue = str(rng.randrange(30)), rng.randrange(40), rng.randrange(30)
+            old = index.entries.get(code)
+            if old and old[0] != location:
+                cache.invalidate(old[0], None, code)
+            index.update(code, location, queue)
+            cache.invalidate(location, queue, code)
+        else:
+            location, reach = rng.randrange(40), rng.randrange(1, 8)
+            assert route(cache, index, location, reach) == index.bestEntry(location, reach)
+    assert cache.stats()["hits"] > 0
+
+
+def test_matches_index_on_road_network():
+    rng = random.Random(3)
+    network = RoadNetwork([(rng.randrange(40), rng.randrange(40), rng.randint(1, 9)) for _ in range(70)], range(40))
+    index, cache = StationIndex(), RouteCache(max_size=64, keep=3, network=network)
+    for step in range(5000):
+        if rng.random() < 0.4:
+            code, location, queue = str(rng.randrange(30)), rng.randrange(40), rng.randrange(30)
+            old = index.entries.get(code)
+            if old and old[0] != location:
+                cache.invalidate(old[0], None, code)
+            index.update(code, location, queue)
+            cache.invalidate(location, queue, code)
+        else:
+            location, time_left = rng.randrange(40), rng.randrange(1, 30)
+            found, best = cache.get(location, time_left)
+            if not found:
+                candidates, bound = index.bestEntriesWithin(location, network, time_left, cache.keep)
+                cache.put(location, time_left, candidates, bound)
+                best = candidates[0] if candidates else None
+            assert best == index.bestWithin(location, network, time_left)
+    assert cache.stats()["hits"] > 0
@@ -0,0 +1,65 @@
+import random
+
+from slot_scheduler import SlotScheduler
+
+
+def lane_ends(scheduler):
+    return [scheduler.sessions[cars[-1]][2] if cars else scheduler.free_at[lane]
+            for lane, cars in enumerate(scheduler.lanes)]
+
+
+def test_eta_follows_sessions():
+    scheduler = SlotScheduler(chargers=2, charge_rate=2.5)
+    assert scheduler.eta(0.0) == 0
+    assert scheduler.start("a", 0, now=0.0) == 0.0    # 40 s
+    assert scheduler.start("b", 50, now=0.0) == 0.0   # 20 s
+    assert scheduler.eta(0.0) == 20
+
+    # O terceiro carro espera o carregador que libera primeiro
+    assert scheduler.start("c", 75, now=5.0) == 20.0  # 10 s
+    assert scheduler.eta(5.0) == 25
+
+    # A saída antecipada de "b" adianta a sessão de "c"
+    assert scheduler.finish("b", now=10.0)
+    assert scheduler.sessions["c"][1:] == [10.0, 20.0]
+    assert scheduler.eta(10.0) == 10
+
+    assert scheduler.finish("a", now=15.0)
+    assert scheduler.eta(15.0) == 0
+    assert not scheduler.finish("a", now=15.0)
+
+
+def test_unfinished_sessions_are_pruned():
+    scheduler = SlotScheduler(chargers=1, charge_rate=10)
+    scheduler.start("a", 0, now=0.0)
+    assert scheduler.earliestStart(3.0) == 10.0
+    # "a" nunca avisou a saída; a sessão é descartada quando o carregador é reutilizado
+    assert scheduler.start("b", 50, now=12.0) == 12.0
+    assert len(scheduler) == 1
+    assert scheduler.eta(12.0) == 5.0
+
+
+def test_random_traffic_keeps_lanes_consistent():
+    rng = random.Random(19)
+    scheduler = SlotScheduler(chargers=3, charge_rate=2.5)
+    now = 0.0
+    for _ in range(3000):
+        now += rng.random() * 4
+        car = str(rng.randrange(15))
+        if rng.random() < 0.55:
+            # Um carro que volta sem avisar a saída tem a sessão anterior encerrada antes
+            scheduler.finish(car, now=now)
+            ends = lane_ends(scheduler)
+            start = scheduler.start(car, rng.randrange(100), now=now)
+            # A sessão começa quando o carregador mais livre termina, ou agora
+            assert start == max(now, min(ends))
+        else:
+            scheduler.finish(car, now=now)
+
+        ends = lane_ends(scheduler)
+        assert scheduler.eta(now) == max(0.0, min(ends) - now)
+        for cars in scheduler.lanes:
+            sessions = [scheduler.sessions[car] for car in cars]
+            assert all(session[1] <= session[2] for session in sessions)
+            assert all(previous[2] <= following[1] for previous, following in zip(sessions, sessions[1:]))
+        assert len(scheduler.heap) <= 4 * len(scheduler.lanes)
@@ -0,0 +1,47 @@
+import random
+
+from station_heap import StationHeap
+
+
+def check(heap, queues):
+    assert len(heap) == len(queues)
+    assert heap.top() == (min((queue, code) for code, queue in queues.items()) if queues else None)
+    for position, (queue, code) in enumerate(heap.heap):
+        assert heap.positions[code] == position
+        assert queues[code] == queue
+
+
+def test_matches_brute_force_minimum():
+    rng = random.Random(11)
+    heap, queues = StationHeap(), {}
+    for _ in range(3000):
+        code = str(rng.randrange(50))
+        if rng.random() < 0.25:
+            assert heap.remove(code) == (code in queues)
+            queues.pop(code, None)
+        else:
+            queue = rng.randrange(30)
+            heap.update(code, queue)
+            queues[code] = queue
+        check(heap, queues)
+
+
+def test_tuple_keys_break_ties():
+    # O servidor local ordena por (fila efetiva, instante em que o posto fica livre)
+    heap = StationHeap()
+    heap.update("a", (2, 100.0))
+    heap.update("b", (2, 50.0))
+    heap.update("c", (3, 0.0))
+    assert heap.top() == ((2, 50.0), "b")
+    heap.update("b", (2, 150.0))
+    assert heap.top() == ((2, 100.0), "a")
+    heap.remove("a")
+    heap.remove("b")
+    assert heap.top() == ((3, 0.0), "c")
+    assert "a" not in heap and "c" in heap
+
+
+def test_empty_heap():
+    heap = StationHeap()
+    assert heap.top() is None
+    assert not heap.remove("x")
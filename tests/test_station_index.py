@@ -0,0 +1,79 @@
+import random
+
+from road_network import RoadNetwork
+from station_index import EMPTY, StationIndex
+
+
+def brute(stations, location, reachable, max_queue=25):
+    return sorted(
+        (queue, code) for code, (other, queue) in stations.items()
+        if other != location and reachable(other) and queue < max_queue)
+
+
+def shuffle(index, stations, rng, locations):
+    operation = rng.random()
+    code = str(rng.randrange(60))
+    if operation < 0.15:
+        index.remove(code)
+        stations.pop(code, None)
+    else:
+        location = rng.randrange(locations) if operation < 0.4 or code not in stations else stations[code][0]
+        queue = rng.randrange(30)
+        index.update(code, location, queue)
+        stations[code] = (location, queue)
+
+
+def test_best_entry_matches_brute_force():
+    rng = random.Random(3)
+    index, stations = StationIndex(), {}
+    for _ in range(2000):
+        shuffle(index, stations, rng, 40)
+        location, reach = rng.randrange(40), rng.randrange(12)
+        expected = brute(stations, location, lambda other: abs(other - location) <= reach) if reach >= 1 else []
+        assert index.bestEntry(location, reach) == (expected[0] if expected else None)
+        assert index.best(location, reach) == (expected[0][1] if expected else None)
+    assert len(index) == len(stations)
+
+
+def test_best_entries_returns_sorted_top_and_bound():
+    rng = random.Random(5)
+    index, stations = StationIndex(), {}
+    for _ in range(1000):
+        shuffle(index, stations, rng, 40)
+        location, reach, count = rng.randrange(40), rng.randint(1, 15), rng.randint(1, 6)
+        expected = brute(stations, location, lambda other: abs(other - location) <= reach)
+        entries, bound = index.bestEntries(location, reach, count)
+        assert entries == expected[:count]
+        # O limite nunca passa do melhor posto deixado de fora
+        rest = expected[count:]
+        assert bound <= (rest[0] if rest else EMPTY)
+
+
+def test_best_within_matches_dijkstra():
+    rng = random.Random(7)
+    side = 6
+    edges = []
+    for node in range(side * side):
+        if node % side + 1 < side:
+            edges.append((node, node + 1, rng.randint(3, 7)))
+        if node + side < side * side:
+            edges.append((node, node + side, rng.randint(3, 7)))
+    network = RoadNetwork(edges)
+
+    index, stations = StationIndex(), {}
+    for _ in range(600):
+        shuffle(index, stations, rng, side * side)
+        location, time_left, count = rng.randrange(side * side), rng.randint(5, 30), rng.randint(1, 5)
+        distances = network.shortestPaths(location)[2]
+        expected = brute(stations, location, lambda other: distances.get(other, time_left) < time_left)
+        assert index.bestWithin(location, network, time_left) == (expected[0] if expected else None)
+        assert index.bestEntriesWithin(location, network, time_left, count)[0] == expected[:count]
+
+
+def test_full_stations_are_skipped():
+    index = StationIndex()
+    index.update("cheio", 5, 25)
+    assert index.bestEntry(4, 3) is None
+    index.update("livre", 6, 24)
+    assert index.bestEntry(4, 3) == (24, "livre")
+    assert index.bestEntry(4, 0) is None
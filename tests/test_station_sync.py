@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import Future
+from time import monotonic, sleep
+
+from station_sync import StationSync
+
+
+def answer(result=None, exception=None):
+    future = Future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return future
+
+
+def info(code, queue):
+    return {"code": code, "location": "1", "queue": str(queue)}
+
+
+def test_pending_keeps_only_latest_state():
+    sync = StationSync(lambda message: answer({"result": "1"}))
+    sync.push(info("a", 1))
+    sync.push(info("b", 1))
+    sync.push(info("a", 2))
+    assert sync.pending == {"a": info("a", 2), "b": info("b", 1)}
+    assert sync.stats()["coalesced"] == 1
+
+
+def test_transport_failure_requeues_without_overwriting_newer_state():
+    sync = StationSync(lambda message: answer(exception=ConnectionError()))
+    sync.push(info("a", 1))
+    sync.push(info("b", 1))
+    updates, sync.pending = sync.pending, {}
+    sync.push(info("a", 5))
+    sync.flush(updates)
+
+    assert sync.pending == {"a": info("a", 5), "b": info("b", 1)}
+    assert sync.stats()["failed"] == 1 and not sync.splits
+
+
+def test_rejected_batch_isolates_the_invalid_update():
+    delivered = {}
+    done = threading.Event()
+
+    def send(message):
+        # O servidor central recusa o lote inteiro quando um posto é inválido
+        if any(update["code"] == "ruim" for update in message["updates"]):
+            return answer({"result": "0"})
+        for update in message["updates"]:
+            delivered[update["code"]] = update
+        if len(delivered) == 15:
+            done.set()
+        return answer({"result": "1"})
+
+    sync = StationSync(send, interval=0.01)
+    for index in range(15):
+        sync.push(info(str(index), index))
+    sync.push(info("ruim", 0))
+    sync.start()
+
+    assert done.wait(5)
+    # A última atualização recusada pode ser descartada logo depois da última entrega
+    deadline = monotonic() + 5
+    while sync.stats()["rejected"] == 0 and monotonic() < deadline:
+        sleep(0.01)
+    assert delivered == {str(index): info(str(index), index) for index in range(15)}
+    stats = sync.stats()
+    assert stats["rejected"] == 1 and stats["failed"] == 0
+    # 16 atualizações: o lote inteiro e mais duas metades a cada um dos quatro níveis
+    assert stats["frames"] == 9
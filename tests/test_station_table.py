@@ -0,0 +1,40 @@
+import json
+import random
+
+from station import StationTable
+
+
+def test_matches_dict_after_swap_removals():
+    rng = random.Random(37)
+    table, stations = StationTable(), {}
+    for _ in range(3000):
+        code = f"posto-{rng.randrange(60)}"
+        operation = rng.random()
+        if operation < 0.25:
+            assert table.remove(code) == (code in stations)
+            stations.pop(code, None)
+        elif operation < 0.4 and code in stations:
+            queue = rng.randrange(30)
+            table.setQueue(code, queue)
+            stations[code] = (stations[code][0], queue)
+        else:
+            location, queue = rng.randrange(-100, 100), rng.randrange(30)
+            table.upsert(code, location, queue)
+            stations[code] = (location, queue)
+
+        assert len(table) == len(stations)
+        assert {code: (location, queue) for code, location, queue in table.items()} == stations
+        assert all(table.codes[row] == code for code, row in table.rows.items())
+    assert len(table.locations) == len(table.queues) == len(table.codes)
+
+
+def test_row_views():
+    table = StationTable()
+    table.upsertMany([("a", 5, 1), ("b", -3, 0), ("c", 10, 4)])
+    table.remove("a")
+    assert table.distances(4) == [abs(location - 4) for location in table.locations]
+    assert table.distance("b", 4) == 7
+    assert json.loads(table.getJson("c")) == table.getInfo("c") == {"code": "c", "location": "10", "queue": "4"}
+    station = table.get("b")
+    assert (station.code, station.location, station.queue) == ("b", -3, 0)
+    assert table.get("a") is None and "a" not in table
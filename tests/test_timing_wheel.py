@@ -0,0 +1,50 @@
+import random
+
+from timing_wheel import TimingWheel
+
+
+def test_expiry_matches_last_touch():
+    rng = random.Random(13)
+    ttl, resolution = 5.0, 0.5
+    wheel = TimingWheel(ttl, resolution, now=0.0)
+    touched = {}
+    now = 0.0
+    for _ in range(5000):
+        # Passos curtos, com saltos longos de vez em quando para o caminho esparso
+        now += rng.choice([0.01, 0.1, 0.3, 0.7]) if rng.random() > 0.01 else 40.0
+        code = str(rng.randrange(100))
+        operation = rng.random()
+        if operation < 0.6:
+            wheel.touch(code, now)
+            touched[code] = now
+        elif operation < 0.65:
+            wheel.discard(code)
+            touched.pop(code, None)
+        else:
+            for expired in wheel.expire(now):
+                # Um posto só expira depois do prazo contado da última notícia
+                assert touched.pop(expired) + ttl < now
+            # E nenhum posto fica além do prazo somado a um intervalo
+            assert all(last + ttl + resolution > now for last in touched.values())
+        assert len(wheel) == len(touched)
+
+
+def test_touch_renews_deadline():
+    wheel = TimingWheel(10, 1.0, now=0.0)
+    wheel.touch("a", 0.0)
+    wheel.touch("b", 0.0)
+    wheel.touch("a", 8.0)
+    assert wheel.expire(9.0) == []
+    assert wheel.expire(12.0) == ["b"]
+    assert wheel.expire(12.5) == []
+    assert wheel.expire(19.0) == ["a"]
+    assert not wheel.buckets and not wheel.deadlines
+
+
+def test_discarded_station_never_expires():
+    wheel = TimingWheel(1, 1.0, now=0.0)
+    wheel.touch("a", 0.0)
+    wheel.discard("a")
+    wheel.discard("a")
+    assert wheel.expire(100.0) == []
+    assert len(wheel) == 0